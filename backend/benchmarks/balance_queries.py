@@ -0,0 +1,81 @@
+"""
+Point-in-time balance and date-range totals over long histories: the
+running-total lookups (get_balance_at / get_totals) against a naive walk
+over every transaction, on both storage backends.
+
+Run from the backend directory:
+    python -m benchmarks.balance_queries --history 20000 --queries 50
+"""
+import argparse
+import copy
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.dataset import make_accounts
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+
+def naive_totals(storage, user_id: int, since: str, until: str):
+    credit = debit = 0
+    for row in storage.get_transactions(user_id):
+        if since <= row["timestamp"] <= until:
+            if row["type"] == "credit":
+                credit += row["amount"]
+            else:
+                debit += row["amount"]
+    return {"credit": credit, "debit": debit}
+
+
+def naive_balance_at(storage, user_id: int, at: str):
+    balance = None
+    for row in storage.get_transactions(user_id):
+        if row["timestamp"] > at:
+            break
+        balance = row["balance_after"]
+    return balance
+
+
+def timed(label: str, queries, fn):
+    start = time.perf_counter()
+    results = [fn(*query) for query in queries]
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {len(queries)} queries in {elapsed:8.3f}s  {elapsed / len(queries) * 1e6:10.1f} us/query")
+    return results
+
+
+def run(name: str, storage, args, timestamps):
+    rng = random.Random(args.seed)
+    ranges = [tuple(sorted(rng.sample(timestamps, 2))) for _ in range(args.queries)]
+    moments = [rng.choice(timestamps) for _ in range(args.queries)]
+
+    print(f"{name} ({args.history} transactions per account)")
+    fast = timed("totals (running sums)", [(1, *r) for r in ranges], storage.get_totals)
+    slow = timed("totals (naive scan)", [(storage, 1, *r) for r in ranges], naive_totals)
+    assert fast == slow, "running totals disagree with the scan"
+
+    fast = timed("balance at (bisect)", [(1, at) for at in moments], storage.get_balance_at)
+    slow = timed("balance at (naive scan)", [(storage, 1, at) for at in moments], naive_balance_at)
+    assert [f["balance"] for f in fast] == slow, "point-in-time balance disagrees with the scan"
+    storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--history", type=int, default=20000, help="transactions per account")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    seed = make_accounts(2, transactions=args.history, seed=args.seed)
+    timestamps = [t["timestamp"] for t in seed[1]["transactions"]]
+    run("memory", MemoryStorage(copy.deepcopy(seed)), args, timestamps)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run("sqlite", SQLiteStorage(os.path.join(tmp, "bench.db"), seed=seed), args, timestamps)
+
+
+if __name__ == "__main__":
+    main()
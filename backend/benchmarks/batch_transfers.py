@@ -0,0 +1,80 @@
+"""
+Batch payouts against one transfer per recipient.
+
+Pays the same set of recipients from one account twice on each backend:
+once as a loop of single transfers and once through send_batch, for
+several batch sizes. Checks that money is conserved and that every leg
+wrote exactly one debit and one credit row.
+
+Run from the backend directory:
+    python -m benchmarks.batch_transfers --sizes 10,100,1000,10000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.dataset import make_accounts
+from database import set_storage
+from services.transfer_service import send_batch
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+
+def ledger_rows(storage, accounts: int):
+    return sum(len(storage.get_transactions(u)) for u in range(1, accounts + 1))
+
+
+def run(storage, size: int, args):
+    set_storage(storage)
+    rng = random.Random(args.seed)
+    receivers = [rng.randint(2, args.accounts) for _ in range(size)]
+    legs = [(receiver, rng.randint(1, 100)) for receiver in receivers]
+    rows_before = ledger_rows(storage, args.accounts)
+
+    start = time.perf_counter()
+    for receiver, amount in legs:
+        assert storage.transfer(1, receiver, amount)["success"]
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = send_batch(1, legs, "pass1")
+    batch = time.perf_counter() - start
+    assert result["success"], result["message"]
+
+    rows = ledger_rows(storage, args.accounts) - rows_before
+    assert rows == 4 * size, f"ledger grew by {rows}, expected {4 * size}"
+    total = sum(storage.get_balance(u) for u in range(1, args.accounts + 1))
+    assert total == args.accounts * args.balance, f"money not conserved: {total}"
+    return loop, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="comma-separated batch sizes")
+    parser.add_argument("--accounts", type=int, default=2000)
+    parser.add_argument("--balance", type=int, default=10 ** 7)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # First password check starts the KDF executor; keep it out of the timings
+    set_storage(MemoryStorage(make_accounts(2)))
+    send_batch(1, [(2, 1)], "pass1")
+
+    print(f"{'backend':<8} {'size':>6} {'loop ms':>10} {'batch ms':>10} {'loop tx/s':>11} {'batch tx/s':>11} {'speedup':>8}")
+    for name in ("memory", "sqlite"):
+        for size in (int(s) for s in args.sizes.split(",")):
+            accounts = make_accounts(args.accounts, balance=args.balance, seed=args.seed)
+            if name == "memory":
+                storage = MemoryStorage(accounts)
+            else:
+                storage = SQLiteStorage(os.path.join(tempfile.mkdtemp(), "batch.db"), seed=accounts)
+            loop, batch = run(storage, size, args)
+            storage.close()
+            print(f"{name:<8} {size:6d} {loop * 1000:10.1f} {batch * 1000:10.1f} "
+                  f"{size / loop:11.0f} {size / batch:11.0f} {loop / batch:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
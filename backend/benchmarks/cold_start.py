@@ -0,0 +1,75 @@
+"""
+Cold start of a fresh API process: time to import main, time to answer
+the first /assistant message, and the slowest imports. Each run is a new
+interpreter so nothing is cached in memory.
+
+Run from the backend directory:
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --max-import-ms 1500   # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.process_text(main.Query(user_id=1, message="check my balance")))
+answered = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_request_ms": (answered - imported) * 1000}))
+"""
+
+
+def probe(env):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top: int):
+    """Cumulative time of each module main imports directly, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], env=env, capture_output=True, text=True, check=True
+    ).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nesting is shown as two spaces per level; main's own imports sit one level down
+        if len(name) - len(name.lstrip()) != 3 or not cumulative.strip().isdigit():
+            continue
+        totals[name.strip()] = int(cumulative) / 1000
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import is slower")
+    args = parser.parse_args()
+
+    env = {**os.environ, "DEEPSEEK_API_KEY": "", "BANK_STORAGE": "memory"}
+    runs = [probe(env) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in runs)
+    first_ms = statistics.median(r["first_request_ms"] for r in runs)
+    print(f"import main          median {import_ms:8.1f} ms over {args.runs} runs")
+    print(f"first /assistant     median {first_ms:8.1f} ms (lazy components built here)")
+    print("slowest imports made by main:")
+    for name, ms in slowest_imports(env, args.top):
+        print(f"  {name:<30} {ms:8.1f} ms")
+
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        print(f"import time regression: {import_ms:.1f} ms > {args.max_import_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Synthetic account data in the database.db shape for benchmarks.
+
+Write a dataset a server can be started on, from the backend directory:
+    python -m benchmarks.dataset --users 1000 --transactions 50 --contacts 5 --sqlite bench.db
+    BANK_STORAGE=sqlite BANK_SQLITE_PATH=bench.db uvicorn main:app
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+# Contact aliases the local classifier's templates accept as receivers
+CONTACT_ALIASES = ("ravi", "jane", "mike", "anita", "sam", "priya", "tom", "lee", "maya", "omar")
+
+
+def make_accounts(count: int, balance: int = 10000, transactions: int = 0, seed: int = 7, contacts: int = 0):
+    """
+    Build count accounts named "User <id>" with password "pass<id>", each
+    opening with the given balance followed by that many historical
+    transactions, oldest first, and up to contacts aliases for other accounts.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    accounts = {}
+    for user_id in range(1, count + 1):
+        history = []
+        running = balance
+        for i in range(transactions):
+            amount = rng.randint(1, 500)
+            txn_type = "credit" if rng.random() < 0.5 or amount > running else "debit"
+            running += amount if txn_type == "credit" else -amount
+            history.append({
+                "type": txn_type,
+                "amount": amount,
+                "description": (
+                    f"Received ₹{amount} from Salary" if txn_type == "credit"
+                    else f"Paid ₹{amount} for groceries"
+                ),
+                "timestamp": (start + timedelta(minutes=37 * i)).strftime("%Y-%m-%d %H:%M"),
+                "balance_after": running,
+            })
+        # Sample among the other accounts by skipping over this one
+        picks = rng.sample(range(1, count), min(contacts, len(CONTACT_ALIASES), count - 1)) if contacts else []
+        targets = [other + 1 if other >= user_id else other for other in picks]
+        accounts[user_id] = {
+            "name": f"User {user_id}",
+            "email": f"user{user_id}@example.com",
+            "password": f"pass{user_id}",
+            "balance": running,
+            "contacts": dict(zip(CONTACT_ALIASES, targets)),
+            "transactions": history,
+        }
+    return accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=50, help="history per account")
+    parser.add_argument("--contacts", type=int, default=5, help="contacts per account")
+    parser.add_argument("--balance", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the accounts as JSON")
+    parser.add_argument("--sqlite", help="seed a SQLite database at this path")
+    args = parser.parse_args()
+
+    accounts = make_accounts(args.users, args.balance, args.transactions, args.seed, args.contacts)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(accounts, f, ensure_ascii=False)
+    if args.sqlite:
+        from storage.sqlite import SQLiteStorage
+        SQLiteStorage(args.sqlite, seed=accounts).close()
+    print(f"{args.users} users, {args.transactions} transactions and {args.contacts} contacts each")
+
+
+if __name__ == "__main__":
+    main()
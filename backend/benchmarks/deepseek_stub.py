@@ -0,0 +1,104 @@
+"""
+Local stand-in for the DeepSeek chat completions API.
+
+Answers with the rule-based classification of the user message after a
+configurable delay, and fails a configurable share of calls with HTTP 500.
+
+Run standalone from the backend directory:
+    python -m benchmarks.deepseek_stub --port 8089 --latency-ms 300
+then point the service at it with
+    DEEPSEEK_API_URL=http://127.0.0.1:8089/v1/chat/completions DEEPSEEK_API_KEY=stub
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from nlu.deepseek_service import DeepSeekNLU
+
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        self.lock = threading.Lock()
+
+
+class StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections under concurrent load
+    request_queue_size = 1024
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+
+def make_handler(config: StubConfig):
+    classifier = DeepSeekNLU()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with config.lock:
+                config.calls += 1
+            delay = config.latency_ms + random.uniform(0, config.jitter_ms)
+            time.sleep(delay / 1000)
+
+            if random.random() < config.error_rate:
+                self._send(500, {"error": {"message": "stub failure"}})
+                return
+
+            user_text = json.loads(body)["messages"][-1]["content"]
+            result = classifier._rule_based_fallback(user_text)
+            result["confidence"] = 0.9 if result["intent"] != "unknown" else 0.3
+            self._send(200, {"choices": [{"message": {"content": json.dumps(result)}}]})
+
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(latency_ms: float = 300, jitter_ms: float = 0, error_rate: float = 0.0, port: int = 0):
+    """
+    Serve the stub from a background thread.
+    Returns: (server, config, chat completions url); call server.shutdown() when done
+    """
+    config = StubConfig(latency_ms, jitter_ms, error_rate)
+    server = StubServer(("127.0.0.1", port), make_handler(config))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    return server, config, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.error_rate)
+    server = StubServer(("127.0.0.1", args.port), make_handler(config))
+    print(f"DeepSeek stub on http://127.0.0.1:{args.port}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
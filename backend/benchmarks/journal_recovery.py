@@ -0,0 +1,102 @@
+"""
+Journal write throughput and crash recovery time of the memory backend.
+
+Runs --transfers random transfers from --threads threads without a
+journal, then with the group-committed journal, and reports transfers
+per second and records per fsync. It then recovers a copy of the journal
+directory twice: replaying every transfer from the journal, and loading
+a fresh snapshot. Recovered state is checked by tests/test_journal_recovery.py.
+
+Run from the backend directory:
+    python -m benchmarks.journal_recovery --transfers 1000000 --threads 16
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.dataset import make_accounts
+from storage.memory import MemoryStorage
+
+
+def run_transfers(storage, args):
+    per_thread = args.transfers // args.threads
+
+    def work(seed: int):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            sender, receiver = rng.sample(range(1, args.accounts + 1), 2)
+            storage.transfer(sender, receiver, rng.randint(1, 100))
+
+    threads = [threading.Thread(target=work, args=(args.seed + i,)) for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return per_thread * args.threads / (time.perf_counter() - start)
+
+
+def directory_size(directory: str):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def recover(directory: str):
+    """Recover from a copy of directory, as a restart after a crash would"""
+    copy = tempfile.mkdtemp()
+    shutil.rmtree(copy)
+    shutil.copytree(directory, copy)
+    start = time.perf_counter()
+    storage = MemoryStorage({}, journal_dir=copy, fsync=False, snapshot_interval=3600)
+    elapsed = time.perf_counter() - start
+    recovery = storage.recovery
+    storage.close()
+    shutil.rmtree(copy)
+    return elapsed, recovery
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transfers", type=int, default=1000000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--no-fsync", action="store_true", help="write the journal without fsync")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    plain = MemoryStorage(make_accounts(args.accounts, balance=10 ** 6))
+    rate = run_transfers(plain, args)
+    print(f"no journal:        {rate:10.0f} transfers/s")
+
+    directory = tempfile.mkdtemp()
+    storage = MemoryStorage(
+        make_accounts(args.accounts, balance=10 ** 6), journal_dir=directory,
+        fsync=not args.no_fsync, snapshot_interval=3600,
+    )
+    rate = run_transfers(storage, args)
+    stats = storage.journal.stats()
+    label = "journal:" if args.no_fsync else "journal + fsync:"
+    print(f"{label:<18} {rate:10.0f} transfers/s, "
+          f"{stats['records_per_sync']} records per write, {stats['bytes'] / 2 ** 20:.1f} MiB")
+    rows = sum(len(user_data["transactions"]) for user_data in storage.accounts.values())
+
+    elapsed, recovery = recover(directory)
+    print(f"replay journal:    {elapsed:10.2f} s for {recovery['records']} records, "
+          f"{recovery['rows_applied'] / elapsed:.0f} rows/s")
+
+    start = time.perf_counter()
+    storage.snapshot()
+    written = time.perf_counter() - start
+    print(f"write snapshot:    {written:10.2f} s, {directory_size(directory) / 2 ** 20:.1f} MiB for {rows} rows")
+    elapsed, recovery = recover(directory)
+    print(f"load snapshot:     {elapsed:10.2f} s")
+
+    storage.close()
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Memory footprint and scan speed of the columnar Ledger against the
+list-of-dicts transaction history it replaced.
+
+Run from the backend directory:
+    python -m benchmarks.ledger_memory --rows 200000
+"""
+import argparse
+import time
+import tracemalloc
+from bisect import bisect_left
+
+from benchmarks.dataset import make_accounts
+from storage.ledger import LabelTable, Ledger, to_epoch
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def best_of(fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    records = make_accounts(1, transactions=args.rows)[1]["transactions"]
+    # Range covering the middle tenth of the history
+    lo = records[args.rows * 45 // 100]["timestamp"]
+    hi = records[args.rows * 55 // 100]["timestamp"]
+
+    def copy_rows():
+        # Fresh strings per row, as rows built by send_money would have
+        return [
+            {
+                "type": r["type"],
+                "amount": r["amount"],
+                "description": r["description"].encode().decode(),
+                "timestamp": r["timestamp"].encode().decode(),
+                "balance_after": r["balance_after"],
+            }
+            for r in records
+        ]
+
+    dicts, dict_bytes = measure(copy_rows)
+    ledger, ledger_bytes = measure(
+        lambda: Ledger.from_records(records, LabelTable(), lambda name: None)
+    )
+    print(f"rows              {args.rows:,}")
+    print(f"list of dicts     {dict_bytes / args.rows:8.1f} bytes/row")
+    print(f"columnar ledger   {ledger_bytes / args.rows:8.1f} bytes/row")
+
+    def dict_range_debits():
+        return sum(
+            r["amount"] for r in dicts
+            if r["type"] == "debit" and lo <= r["timestamp"] < hi
+        )
+
+    def ledger_range_debits():
+        start = bisect_left(ledger.ts, to_epoch(lo))
+        stop = bisect_left(ledger.ts, to_epoch(hi))
+        kinds, amounts = ledger.kind, ledger.amount
+        # Even kinds are debits
+        return sum(amounts[i] for i in range(start, stop) if not kinds[i] & 1)
+
+    dict_time, dict_total = best_of(dict_range_debits)
+    ledger_time, ledger_total = best_of(ledger_range_debits)
+    assert dict_total == ledger_total
+    print(f"range scan dicts  {dict_time * 1000:8.2f} ms")
+    print(f"range scan ledger {ledger_time * 1000:8.2f} ms")
+
+    render_time, _ = best_of(lambda: ledger.rows(len(ledger) - 10, len(ledger), str))
+    print(f"render last 10    {render_time * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
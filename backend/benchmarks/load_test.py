@@ -0,0 +1,332 @@
+"""
+Load test for the API with a realistic mix of requests.
+
+Virtual users run a weighted mix of scenarios (balance checks, two-step
+transfers, history, spending summaries, /test-nlu) for a fixed time, either
+calling the route handlers in-process or over HTTP. Reports p50/p95/p99
+latency and throughput per request type and can write the results as JSON
+and compare them with an earlier run.
+
+Without --target the test builds a synthetic dataset, points the NLU at the
+local DeepSeek stub and, in http mode, serves the app with uvicorn on a
+background thread. With --target it drives an already running server,
+which should be started on a dataset from benchmarks.dataset, with
+ASSISTANT_RATE_LIMIT=0 ASSISTANT_COALESCE_KEYS=0 so virtual users are not
+throttled.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --mode inprocess --duration 20 --concurrency 32
+    python -m benchmarks.load_test --mode http --output after.json --compare before.json
+    python -m benchmarks.load_test --target http://127.0.0.1:8000 --users 1000 --mix balance=70,history=30
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.dataset import CONTACT_ALIASES, make_accounts
+from benchmarks.deepseek_stub import start_stub
+
+CORPUS = Path(__file__).parent / "fixtures" / "utterances.txt"
+
+# Phrasings the local classifier answers, and ones that escalate to DeepSeek
+BALANCE = (["check my balance", "what is my balance", "how much money do i have"],
+           ["could you check how much money i have left in my account", "balance status for me"])
+HISTORY = (["show last 5 transactions", "show my transaction history", "show me my recent transactions"],
+           ["i would like to see what went through my account lately"])
+SPENDING = (["how much did i spend last month", "how much did i spend this week", "show my spending this month"],
+            ["what did i end up spending during the last 7 days"])
+TRANSFER = ("send {amount} to {alias}", "please transfer {amount} rupees over to {alias} right now")
+
+DEFAULT_MIX = "balance=40,transfer=20,history=20,spending=10,nlu=10"
+
+
+def phrase(rng, pools, remote_share: float):
+    local, remote = pools
+    return rng.choice(remote if rng.random() < remote_share else local)
+
+
+class InProcessDriver:
+    """Calls the route handlers directly: app logic without the HTTP layer"""
+
+    def __init__(self, main):
+        self.routes = {
+            "/assistant": (main.process_text, main.Query),
+            "/test-nlu": (main.test_nlu, main.TestQuery),
+        }
+
+    async def post(self, path: str, payload: dict):
+        handler, model = self.routes[path]
+        return 200, await handler(model(**payload))
+
+    async def close(self):
+        pass
+
+
+class HTTPDriver:
+    def __init__(self, base_url: str, concurrency: int):
+        import aiohttp
+        self.base_url = base_url.rstrip("/")
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency))
+
+    async def post(self, path: str, payload: dict):
+        async with self.session.post(self.base_url + path, json=payload) as response:
+            return response.status, await response.json(content_type=None)
+
+    async def close(self):
+        await self.session.close()
+
+
+class LoadTest:
+    def __init__(self, driver, args):
+        self.driver = driver
+        self.args = args
+        self.samples = {}
+        self.errors = {}
+        self.corpus = [line.strip() for line in CORPUS.read_text().splitlines() if line.strip()]
+        self.aliases = CONTACT_ALIASES[:args.contacts]
+        self.scenarios = {
+            "balance": self.balance,
+            "transfer": self.transfer,
+            "history": self.history,
+            "spending": self.spending,
+            "nlu": self.nlu,
+        }
+
+    async def request(self, label: str, path: str, payload: dict, check=None):
+        """Time one request; a non-200 status, an exception or a failed check counts as an error"""
+        start = time.perf_counter()
+        try:
+            status, body = await self.driver.post(path, payload)
+            ok = status == 200 and (check is None or check(body))
+        except Exception:
+            status, body, ok = None, None, False
+        self.samples.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return body if ok else None
+
+    async def balance(self, rng, user_id: int):
+        message = phrase(rng, BALANCE, self.args.remote_share)
+        await self.request("balance", "/assistant", {"user_id": user_id, "message": message})
+
+    async def history(self, rng, user_id: int):
+        message = phrase(rng, HISTORY, self.args.remote_share)
+        await self.request("history", "/assistant", {"user_id": user_id, "message": message})
+
+    async def spending(self, rng, user_id: int):
+        message = phrase(rng, SPENDING, self.args.remote_share)
+        await self.request("spending", "/assistant", {"user_id": user_id, "message": message})
+
+    async def nlu(self, rng, user_id: int):
+        await self.request("nlu", "/test-nlu", {"message": rng.choice(self.corpus)})
+
+    async def transfer(self, rng, user_id: int):
+        """Ask, then confirm with the password and the confirmation token"""
+        template = TRANSFER[1] if rng.random() < self.args.remote_share else TRANSFER[0]
+        message = template.format(amount=rng.randint(1, 50), alias=rng.choice(self.aliases))
+        asked = await self.request(
+            "transfer_ask", "/assistant", {"user_id": user_id, "message": message},
+            check=lambda body: body.get("data", {}).get("confirmation_token"),
+        )
+        if asked is None:
+            return
+        await self.request(
+            "transfer_confirm", "/assistant",
+            {"user_id": user_id, "message": message, "password": f"pass{user_id}",
+             "confirmation_token": asked["data"]["confirmation_token"]},
+            check=lambda body: body.get("data", {}).get("success"),
+        )
+
+    async def worker(self, seed: int, mix, deadline: float):
+        rng = random.Random(seed)
+        names, weights = zip(*mix)
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(names, weights)[0]
+            await self.scenarios[scenario](rng, rng.randint(1, self.args.users))
+
+    async def run(self, mix):
+        # One pass of each scenario first, so lazily built components are not measured
+        warm = random.Random(0)
+        for name, _ in mix:
+            await self.scenarios[name](warm, 1)
+        self.samples.clear()
+        self.errors.clear()
+
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        await asyncio.gather(*(
+            self.worker(self.args.seed + i, mix, deadline) for i in range(self.args.concurrency)
+        ))
+        return time.perf_counter() - started
+
+
+def percentile(ordered, p: float):
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(samples: list, errors: int, elapsed: float):
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(percentile(ordered, 50), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "p99_ms": round(percentile(ordered, 99), 3),
+    }
+
+
+def parse_mix(text: str):
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict):
+    print(f"{'request':<18} {'count':>7} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in results.items():
+        print(f"{label:<18} {row['count']:7d} {row['errors']:6d} {row['throughput_rps']:9.1f} "
+              f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f}")
+
+
+def print_comparison(results: dict, previous: dict):
+    print(f"\ncompared with {previous['meta'].get('commit')} ({previous['meta'].get('started')}):")
+    print(f"{'request':<18} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    for label, row in results.items():
+        before = previous["results"].get(label)
+        if before is None:
+            continue
+        cells = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            cells.append(f"{row[key]:9.2f} {change:+5.0f}%")
+        print(f"{label:<18} " + " ".join(cells))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_background(app):
+    """Run the app under uvicorn on a background thread; returns (server, base url)"""
+    import uvicorn
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def local_app(args):
+    """Import the app on a synthetic dataset with DeepSeek served by the stub"""
+    stub, _, url = start_stub(latency_ms=args.latency_ms, error_rate=args.error_rate)
+    os.environ.update({
+        "DEEPSEEK_API_URL": url, "DEEPSEEK_API_KEY": "stub", "BANK_STORAGE": "memory",
+        # Virtual users outpace a person; measure the request path, not the rate limit
+        "ASSISTANT_RATE_LIMIT": "0", "ASSISTANT_COALESCE_KEYS": "0",
+    })
+    import main
+    from database import set_storage
+    from storage.memory import MemoryStorage
+    set_storage(MemoryStorage(make_accounts(
+        args.users, balance=10 ** 7, transactions=args.transactions, seed=args.seed, contacts=args.contacts,
+    )))
+    return main, stub
+
+
+async def run(args):
+    stub = server = None
+    if args.target:
+        driver = HTTPDriver(args.target, args.concurrency)
+    else:
+        main, stub = local_app(args)
+        if args.mode == "http":
+            server, base_url = serve_in_background(main.app)
+            driver = HTTPDriver(base_url, args.concurrency)
+        else:
+            driver = InProcessDriver(main)
+
+    test = LoadTest(driver, args)
+    try:
+        elapsed = await test.run(parse_mix(args.mix))
+    finally:
+        await driver.close()
+        if server is not None:
+            server.should_exit = True
+        if stub is not None:
+            stub.shutdown()
+
+    results = {
+        label: summarize(samples, test.errors.get(label, 0), elapsed)
+        for label, samples in sorted(test.samples.items())
+    }
+    results["total"] = summarize(
+        [ms for samples in test.samples.values() for ms in samples], sum(test.errors.values()), elapsed,
+    )
+    return elapsed, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--target", help="base URL of a running server (implies http mode)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight list")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--users", type=int, default=1000, help="accounts in the dataset")
+    parser.add_argument("--transactions", type=int, default=50, help="history per account")
+    parser.add_argument("--contacts", type=int, default=5, help="contacts per account")
+    parser.add_argument("--remote-share", type=float, default=0.1, help="share of phrasings that need DeepSeek")
+    parser.add_argument("--latency-ms", type=float, default=200, help="DeepSeek stub latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="DeepSeek stub error rate")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+    if args.target:
+        args.mode = "http"
+
+    logging.getLogger("banking-assistant").setLevel(logging.WARNING)
+    started = datetime.now().isoformat(timespec="seconds")
+    elapsed, results = asyncio.run(run(args))
+
+    print(f"{args.mode}, {args.concurrency} virtual users for {elapsed:.1f}s, mix {args.mix}")
+    print_results(results)
+    report = {
+        "meta": {**vars(args), "started": started, "elapsed_s": round(elapsed, 3), "commit": git_commit()},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Cost of the always-on request instrumentation: a histogram observation, a
+full request timer (five stages and finish) and rendering /metrics.
+
+Run from the backend directory:
+    python -m benchmarks.metrics_overhead --requests 100000
+"""
+import argparse
+import time
+
+from metrics import Histogram, RequestTimer, registry
+
+STAGES = ("validate", "threadpool_wait", "nlu", "lookup", "transfer")
+INTENTS = ("check_balance", "send_money", "transaction_history", "spending_summary")
+
+
+def per_call(label: str, count: int, fn):
+    start = time.perf_counter()
+    for i in range(count):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / count * 1e6:8.2f} us/call")
+
+
+def timed_request(i: int):
+    timer = RequestTimer()
+    for stage in STAGES:
+        with timer.stage(stage):
+            pass
+    timer.finish(INTENTS[i % len(INTENTS)], "local", 0.9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "benchmark", ("stage",))
+    per_call("Histogram.observe", args.requests, lambda i: histogram.observe(i * 1e-6, "nlu"))
+    per_call("request timer (5 stages)", args.requests, timed_request)
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"{'render /metrics':<28} {(time.perf_counter() - start) * 1000:8.2f} ms "
+          f"for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Offline classification throughput on the utterance corpus: one
+classify_intent call per line against classify_batch and aclassify_batch.
+
+Runs against the local DeepSeek stub with the intent cache disabled, so
+only deduplication and the local rules save remote round trips.
+
+Run from the backend directory:
+    python -m benchmarks.nlu_batch --repeat 25 --latency-ms 100
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from benchmarks.deepseek_stub import start_stub
+from nlu.deepseek_service import DeepSeekNLU
+from nlu.intent_cache import IntentCache
+
+CORPUS = Path(__file__).parent / "fixtures" / "utterances.txt"
+
+
+def load_corpus(repeat: int):
+    lines = [line.strip() for line in CORPUS.read_text().splitlines() if line.strip()]
+    return lines * repeat
+
+
+def make_nlu(url: str):
+    nlu = DeepSeekNLU()
+    nlu.api_url = url
+    nlu.api_key = "stub"
+    nlu.cache = IntentCache(max_size=0)
+    return nlu
+
+
+def report(label: str, count: int, elapsed: float, remote_calls: int):
+    print(f"{label:<22} {count} messages in {elapsed:7.2f}s  {count / elapsed:9.1f} msg/s  ({remote_calls} DeepSeek calls)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=25, help="copies of the corpus to classify")
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    messages = load_corpus(args.repeat)
+    server, config, url = start_stub(latency_ms=args.latency_ms)
+    try:
+        if not args.skip_sequential:
+            nlu = make_nlu(url)
+            start = time.perf_counter()
+            for message in messages:
+                nlu.classify_intent(message)
+            report("sequential", len(messages), time.perf_counter() - start, config.calls)
+
+        config.calls = 0
+        nlu = make_nlu(url)
+        start = time.perf_counter()
+        nlu.classify_batch(messages, max_workers=args.workers)
+        report(f"batch, {args.workers} threads", len(messages), time.perf_counter() - start, config.calls)
+
+        async def run_async():
+            nlu = make_nlu(url)
+            start = time.perf_counter()
+            await nlu.aclassify_batch(messages)
+            elapsed = time.perf_counter() - start
+            await nlu.aclose()
+            return elapsed
+
+        config.calls = 0
+        report("async batch", len(messages), asyncio.run(run_async()), config.calls)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
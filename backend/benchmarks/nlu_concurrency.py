@@ -0,0 +1,76 @@
+"""
+Concurrent DeepSeek calls: blocking classify_intent on a 40-thread pool
+(the FastAPI/anyio default) against aclassify_intent on one event loop.
+
+Both run against the local DeepSeek stub with simulated LLM latency and
+the intent cache disabled, so every message pays the remote round trip.
+
+Run from the backend directory:
+    python -m benchmarks.nlu_concurrency --requests 400 --latency-ms 200
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.deepseek_stub import start_stub
+from nlu.deepseek_service import DeepSeekNLU
+from nlu.intent_cache import IntentCache
+
+MESSAGES = [
+    "could you check how much money i have left in my account",
+    "please transfer 250 rupees over to jane right now",
+    "i would like to see my recent history",
+]
+
+
+def make_nlu(url: str, max_inflight: int):
+    nlu = DeepSeekNLU()
+    nlu.api_url = url
+    nlu.api_key = "stub"
+    nlu.max_inflight = max_inflight
+    nlu.cache = IntentCache(max_size=0)
+    return nlu
+
+
+def report(label: str, count: int, elapsed: float, results):
+    remote = sum(1 for r in results if r["tier"] == "remote")
+    print(f"{label:<22} {count} calls in {elapsed:6.2f}s  {count / elapsed:8.1f} req/s  ({remote} answered remotely)")
+
+
+def run_threaded(url: str, count: int, threads: int):
+    nlu = make_nlu(url, threads)
+    messages = [MESSAGES[i % len(MESSAGES)] for i in range(count)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(nlu.classify_intent, messages))
+    report(f"sync, {threads} threads", count, time.perf_counter() - start, results)
+
+
+async def run_async(url: str, count: int, max_inflight: int):
+    nlu = make_nlu(url, max_inflight)
+    messages = [MESSAGES[i % len(MESSAGES)] for i in range(count)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(nlu.aclassify_intent(m) for m in messages))
+    report(f"async, {max_inflight} in flight", count, time.perf_counter() - start, results)
+    await nlu.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--max-inflight", type=int, default=200)
+    args = parser.parse_args()
+
+    server, _, url = start_stub(latency_ms=args.latency_ms)
+    try:
+        run_threaded(url, args.requests, args.threads)
+        asyncio.run(run_async(url, args.requests, args.max_inflight))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
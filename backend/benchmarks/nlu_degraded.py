@@ -0,0 +1,72 @@
+"""
+Tail latency of escalated messages while DeepSeek is degraded: the stub
+answers slower than the client timeout, so every call that reaches it
+fails. Compares no breaker, the circuit breaker, and breaker plus hedging.
+
+Run from the backend directory:
+    python -m benchmarks.nlu_degraded --requests 200 --timeout-ms 500
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.deepseek_stub import start_stub
+from nlu.circuit_breaker import CircuitBreaker
+from nlu.deepseek_service import DeepSeekNLU
+from nlu.intent_cache import IntentCache
+
+
+def percentile(samples, pct: float):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(label: str, url: str, args, breaker: CircuitBreaker, hedge_ms: float):
+    nlu = DeepSeekNLU()
+    nlu.api_url = url
+    nlu.api_key = "stub"
+    nlu.timeout = args.timeout_ms / 1000
+    nlu.cache = IntentCache(max_size=0)
+    nlu.breaker = breaker
+    nlu.hedge_seconds = hedge_ms / 1000
+
+    async def one():
+        start = time.perf_counter()
+        await nlu.aclassify_intent("i would like to see my recent history")
+        return (time.perf_counter() - start) * 1000
+
+    samples = []
+    # The failure messages are expected; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.requests // args.concurrency):
+            samples += await asyncio.gather(*(one() for _ in range(args.concurrency)))
+        # Hedged calls are still running in the background
+        await asyncio.gather(*nlu._background, return_exceptions=True)
+    await nlu.aclose()
+    print(
+        f"{label:<18} p50 {percentile(samples, 0.5):8.1f} ms   p99 {percentile(samples, 0.99):8.1f} ms   "
+        f"upstream calls rejected by breaker: {breaker.rejected}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout-ms", type=float, default=500)
+    parser.add_argument("--hedge-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    server, _, url = start_stub(latency_ms=args.timeout_ms * 2)
+    try:
+        asyncio.run(run("no breaker", url, args, CircuitBreaker(failure_threshold=10 ** 9), 0))
+        asyncio.run(run("breaker", url, args, CircuitBreaker(), 0))
+        asyncio.run(run("breaker + hedge", url, args, CircuitBreaker(), args.hedge_ms))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Latency of each NLU tier: local classifier, intent cache, DeepSeek (against
+the local stub with simulated latency) and the rule-based fallback.
+
+Run from the backend directory:
+    python -m benchmarks.nlu_tiers --latency-ms 300
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.deepseek_stub import start_stub
+from nlu.deepseek_service import DeepSeekNLU
+
+# Phrasings the local templates answer on their own
+LOCAL_MESSAGES = ["check my balance", "send 500 to ravi", "show last 5 transactions"]
+# Phrasings that need escalation
+REMOTE_MESSAGES = [
+    "could you check how much money i have left in my account",
+    "please transfer 250 rupees over to jane right now",
+    "i would like to see my recent history",
+]
+
+
+def measure(label: str, nlu: DeepSeekNLU, messages, rounds: int, expect_tier: str):
+    samples = []
+    tiers = {}
+    for _ in range(rounds):
+        for message in messages:
+            start = time.perf_counter()
+            result = nlu.classify_intent(message)
+            samples.append((time.perf_counter() - start) * 1000)
+            tiers[result["tier"]] = tiers.get(result["tier"], 0) + 1
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{label:<9} p50 {statistics.median(samples):9.3f} ms   p95 {p95:9.3f} ms   "
+        f"tiers {tiers}"
+    )
+    assert expect_tier in tiers, f"{label} answered by {tiers}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    server, _, url = start_stub(latency_ms=args.latency_ms)
+    try:
+        nlu = DeepSeekNLU()
+        nlu.api_url = url
+        nlu.api_key = "stub"
+
+        measure("local", nlu, LOCAL_MESSAGES, args.rounds, "local")
+
+        nlu.cache.clear()
+        measure("remote", nlu, REMOTE_MESSAGES, 1, "remote")
+        # The remote answers above are now cached
+        measure("cache", nlu, REMOTE_MESSAGES, args.rounds, "cache")
+
+        nlu.api_key = None
+        measure("fallback", nlu, REMOTE_MESSAGES, args.rounds, "fallback")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Transfer-confirmation throughput with hashed passwords.
+
+Sends a burst of password confirmations mixed with cheap requests (balance
+checks answered by the local classifier) through /assistant's handler and
+reports confirmations per second, confirmation latency and the latency of
+the cheap requests caught in the same burst, for:
+  plaintext           the old plaintext comparison
+  scrypt, unbounded   one KDF thread per request thread, no admission cap
+  scrypt, bounded     KDF on a per-core executor, capped request threads
+  scrypt, cached      bounded, with retried confirmations hitting the cache
+
+Run from the backend directory:
+    python -m benchmarks.password_confirmations --confirmations 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from benchmarks.dataset import make_accounts
+from database import set_storage
+from services.credentials import CredentialService, PasswordHasher, set_credentials
+from storage.memory import MemoryStorage
+
+# Starlette runs sync work on anyio's default pool of 40 threads
+REQUEST_THREADS = 40
+
+
+class PlaintextHasher(PasswordHasher):
+    def needs_rehash(self, credential: str):
+        return False
+
+
+def p95(samples):
+    samples = sorted(samples)
+    return samples[max(int(len(samples) * 0.95) - 1, 0)]
+
+
+async def run(main, label: str, service: CredentialService, hashed: bool, repeat: int, args):
+    accounts = make_accounts(args.accounts, balance=10 ** 9)
+    if hashed:
+        # Hash up front so the run measures steady state, not the first-login migration
+        for record in accounts.values():
+            record["password"] = service.hasher.hash(record["password"])
+    set_storage(MemoryStorage(accounts))
+    set_credentials(service)
+
+    rng = random.Random(args.seed)
+    senders = [rng.randint(1, args.accounts) for _ in range(args.confirmations // repeat)]
+    jobs = [("confirm", sender_id) for sender_id in senders for _ in range(repeat)]
+    jobs += [("cheap", rng.randint(1, args.accounts)) for _ in range(args.confirmations * args.cheap_ratio)]
+    rng.shuffle(jobs)
+
+    async def request(kind: str, user_id: int):
+        if kind == "confirm":
+            receiver_id = user_id % args.accounts + 1
+            token = main.pending_transfers.create(user_id, 1, f"User {receiver_id}", receiver_id)
+            query = main.Query(user_id=user_id, message="confirm", password=f"pass{user_id}", confirmation_token=token)
+        else:
+            query = main.Query(user_id=user_id, message="check my balance")
+        start = time.perf_counter()
+        response = await main.process_text(query)
+        if kind == "confirm":
+            assert response["data"]["success"], response["reply"]
+        return kind, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    samples = await asyncio.gather(*(request(*job) for job in jobs))
+    elapsed = time.perf_counter() - start
+
+    confirm = [ms for kind, ms in samples if kind == "confirm"]
+    cheap = [ms for kind, ms in samples if kind == "cheap"]
+    print(
+        f"{label:<18} {len(confirm) / elapsed:8.1f} confirmations/s   "
+        f"confirm p50 {statistics.median(confirm):7.0f} ms p95 {p95(confirm):7.0f} ms   "
+        f"cheap p50 {statistics.median(cheap):7.1f} ms p95 {p95(cheap):7.1f} ms   "
+        f"cache hits {service.cache_hits}"
+    )
+    service.shutdown()
+
+
+async def run_all(args):
+    import main
+
+    cores = os.cpu_count() or 1
+    hasher = PasswordHasher(n=args.scrypt_n)
+    unlimited = args.confirmations * (args.cheap_ratio + 1)
+    print(f"{cores} cores, scrypt n={args.scrypt_n}, {args.cheap_ratio} cheap requests per confirmation")
+    await run(main, "plaintext", CredentialService(PlaintextHasher(), cache_ttl=0), False, 1, args)
+    await run(main, "scrypt, unbounded", CredentialService(
+        hasher, workers=REQUEST_THREADS, cache_ttl=0, max_pending=unlimited, max_threads=unlimited,
+    ), True, 1, args)
+    await run(main, "scrypt, bounded", CredentialService(
+        hasher, workers=cores, cache_ttl=0, max_pending=unlimited,
+    ), True, 1, args)
+    await run(main, "scrypt, cached", CredentialService(
+        hasher, workers=cores, max_pending=unlimited,
+    ), True, args.retries, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--confirmations", type=int, default=200)
+    parser.add_argument("--cheap-ratio", type=int, default=4, help="cheap requests per confirmation")
+    parser.add_argument("--retries", type=int, default=4, help="confirmations per sender in the cached run")
+    parser.add_argument("--scrypt-n", type=int, default=2 ** 14)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Retried confirmations must each reach the credential cache, not share one answer
+    os.environ.update({
+        "DEEPSEEK_API_KEY": "", "BANK_STORAGE": "memory", "ASSISTANT_RATE_LIMIT": "0", "ASSISTANT_COALESCE_KEYS": "0",
+    })
+    asyncio.run(run_all(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Fuzzy receiver matching latency over a large account base.
+
+Builds the name matcher over --accounts synthetic "<first> <surname>"
+names, then times match() for queries of each kind: a full name, a first
+name shared by thousands of accounts (ambiguous), a surname prefix, and
+surnames with one or two typos. Reports build time and per-kind latency
+percentiles; on a busy or single-core machine the p99 also catches
+scheduler preemptions of a few milliseconds that have nothing to do with
+the lookup.
+
+Run from the backend directory:
+    python -m benchmarks.receiver_matching --accounts 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from storage.name_matcher import NameMatcher
+
+FIRST_NAMES = (
+    "aarav", "aditi", "akash", "amit", "ananya", "anita", "arjun", "deepa", "divya", "gaurav", "ishaan",
+    "jane", "john", "kavya", "kiran", "lakshmi", "maya", "meera", "mike", "neha", "nikhil", "omar",
+    "pooja", "priya", "rahul", "rajesh", "ravi", "rohan", "sam", "sanjay", "sara", "sneha", "suresh",
+    "tanvi", "tom", "varun", "vikram", "vivek", "yash", "zara",
+)
+SYLLABLES = (
+    "ba", "cha", "da", "dev", "ga", "har", "ja", "ka", "kar", "la", "ma", "man", "na", "nath", "pa",
+    "pra", "ra", "ram", "sa", "sha", "ta", "tha", "va", "var", "ya", "mi", "ri", "ni", "shi", "ku",
+)
+
+
+def make_names(count: int, seed: int):
+    rng = random.Random(seed)
+    surnames = sorted({"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(count // 20)})
+    return {user_id: f"{rng.choice(FIRST_NAMES)} {rng.choice(surnames)}" for user_id in range(1, count + 1)}
+
+
+def typo(word: str, rng, edits: int):
+    for _ in range(edits):
+        i = rng.randrange(len(word) - 1)
+        word = word[:i] + word[i + 1] + word[i] + word[i + 2:] if rng.random() < 0.5 else word[:i] + word[i + 1:]
+    return word
+
+
+def queries(names: dict, rng, count: int):
+    sample = [names[rng.randint(1, len(names))].split() for _ in range(count)]
+    return {
+        "full name": [f"{first} {surname}" for first, surname in sample],
+        "first name": [first for first, _ in sample],
+        "prefix": [surname[:3] for _, surname in sample],
+        "one typo": [typo(surname, rng, 1) for _, surname in sample],
+        "two typos": [typo(surname, rng, 2) for _, surname in sample if len(surname) >= 5],
+        "first + typo": [f"{first} {typo(surname, rng, 1)}" for first, surname in sample],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    names = make_names(args.accounts, args.seed)
+    matcher = NameMatcher()
+    start = time.perf_counter()
+    for user_id, name in names.items():
+        matcher.add(user_id, name)
+    print(f"indexed {args.accounts} names ({matcher.stats()['words']} distinct words) "
+          f"in {time.perf_counter() - start:.1f} s")
+
+    rng = random.Random(args.seed)
+    for kind, batch in queries(names, rng, args.queries).items():
+        timings, found, ambiguous = [], 0, 0
+        for query in batch:
+            start = time.perf_counter()
+            ranked = matcher.match(query)
+            timings.append((time.perf_counter() - start) * 1000)
+            found += bool(ranked)
+            ambiguous += len(ranked) > 1
+        timings.sort()
+        p90, p99 = timings[int(len(timings) * 0.9)], timings[int(len(timings) * 0.99)]
+        print(f"{kind:<13} p50 {statistics.median(timings):.3f} ms  p90 {p90:.3f} ms  p99 {p99:.3f} ms  "
+              f"matched {found / len(batch):.0%}, ambiguous {ambiguous / len(batch):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Balance and "last 5 transactions" replies with and without the render cache.
+
+A voice session asks for the same replies several times between writes.
+Each round picks an account, asks for its balance and last transactions
+--repeats times, and every --write-every rounds a transfer moves the
+version of two accounts on. Runs each backend with the cache off and on
+and reports replies per second and the hit rate.
+
+Run from the backend directory:
+    python -m benchmarks.reply_cache --accounts 1000 --rounds 20000 --repeats 3
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.dataset import make_accounts
+from database import set_storage
+from services.balance_services import get_account_balance
+from services.history_service import get_history_reply
+from services.render_cache import render_cache
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+LOCALES = (None, "hi-IN")
+
+
+def run(storage, enabled: bool, args):
+    set_storage(storage)
+    render_cache.clear()
+    render_cache.max_accounts = 10000 if enabled else 0
+    before = render_cache.stats()
+
+    rng = random.Random(args.seed)
+    replies = 0
+    start = time.perf_counter()
+    for round_ in range(args.rounds):
+        user_id = rng.randint(1, args.hot_accounts)
+        locale = rng.choice(LOCALES)
+        for _ in range(args.repeats):
+            assert get_account_balance(user_id, locale=locale) is not None
+            assert get_history_reply(user_id, 5, limit=5, locale=locale)["reply"]
+            replies += 2
+        if args.write_every and round_ % args.write_every == 0:
+            sender, receiver = rng.sample(range(1, args.hot_accounts + 1), 2)
+            storage.transfer(sender, receiver, 1)
+    elapsed = time.perf_counter() - start
+    after = render_cache.stats()
+    hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+    hit_rate = f"{hits / (hits + misses):.1%}" if hits + misses else "-"
+    return replies / elapsed, hit_rate, after["invalidations"] - before["invalidations"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--hot-accounts", type=int, default=200, help="accounts the rounds pick from")
+    parser.add_argument("--transactions", type=int, default=50, help="history per account")
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3, help="replies per account per round")
+    parser.add_argument("--write-every", type=int, default=10, help="rounds between transfers (0: none)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'cache':<5} {'replies/s':>11} {'hit rate':>9} {'invalidations':>14}")
+    for name in ("memory", "sqlite"):
+        for enabled in (False, True):
+            accounts = make_accounts(args.accounts, balance=10 ** 6, transactions=args.transactions, seed=args.seed)
+            if name == "memory":
+                storage = MemoryStorage(accounts)
+            else:
+                storage = SQLiteStorage(os.path.join(tempfile.mkdtemp(), "replies.db"), seed=accounts)
+            rate, hit_rate, invalidations = run(storage, enabled, args)
+            storage.close()
+            print(f"{name:<8} {'on' if enabled else 'off':<5} {rate:11.0f} {hit_rate:>9} {invalidations:14d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+One flooding client against everyone else on /assistant.
+
+A stuck voice loop resends the same message for one user every
+--interval-ms for --seconds while --users other users each ask a
+different question once a second; every message escalates to DeepSeek,
+served by the local stub. Reports the DeepSeek calls made, what happened
+to the flood (answered, coalesced, rate limited) and the other users'
+latency, for:
+  unguarded       no rate limit, no coalescing
+  coalescing      identical in-flight requests share one answer
+  guarded         coalescing plus the per-user token bucket
+
+Run from the backend directory:
+    python -m benchmarks.request_flooding --latency-ms 300 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import string
+import time
+
+from benchmarks.dataset import make_accounts
+from benchmarks.deepseek_stub import start_stub
+
+FLOOD = "could you tell me how much money i have left in my account"
+
+
+def phrase(n: int):
+    # Digits are masked in the intent cache key, so make each question differ in words
+    word = "".join(string.ascii_lowercase[int(d)] for d in str(n))
+    return f"what is the balance i have in my account {word}"
+
+
+async def run(main, mode: str, stub, args):
+    from services.rate_limiter import RateLimiter
+    from services.single_flight import SingleFlight
+
+    nlu = main.get_deepseek_nlu()
+    nlu.cache.clear()
+    main.assistant_limiter = RateLimiter("assistant", rate=args.rate if mode == "guarded" else 0, burst=args.burst)
+    main.assistant_requests = SingleFlight("assistant", max_keys=0 if mode == "unguarded" else 10000)
+    calls = stub.calls
+    flood = {"answered": 0, "limited": 0}
+    latencies = []
+    deadline = time.perf_counter() + args.seconds
+
+    async def flood_request():
+        response = await main.process_text(main.Query(user_id=1, message=FLOOD))
+        flood["limited" if getattr(response, "status_code", 200) == 429 else "answered"] += 1
+
+    async def flooder():
+        tasks = []
+        while time.perf_counter() < deadline:
+            tasks.append(asyncio.ensure_future(flood_request()))
+            await asyncio.sleep(args.interval_ms / 1000)
+        await asyncio.gather(*tasks)
+
+    async def user(user_id: int):
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await main.process_text(main.Query(user_id=user_id, message=phrase(user_id * 1000 + n)))
+            latencies.append((time.perf_counter() - start) * 1000)
+            n += 1
+            await asyncio.sleep(max(0.0, 1 - (time.perf_counter() - start)))
+
+    await asyncio.gather(flooder(), *(user(user_id) for user_id in range(2, args.users + 2)))
+    latencies.sort()
+    print(
+        f"{mode:<11} deepseek calls {stub.calls - calls:5d}   flood answered {flood['answered']:4d} "
+        f"coalesced {main.assistant_requests.stats()['coalesced']:4d} limited {flood['limited']:4d}   "
+        f"others p50 {statistics.median(latencies):7.1f} ms  p95 {latencies[int(len(latencies) * 0.95)]:7.1f} ms"
+    )
+
+
+async def run_all(args, stub):
+    import main
+    from database import set_storage
+    from storage.memory import MemoryStorage
+
+    set_storage(MemoryStorage(make_accounts(args.users + 1)))
+    nlu = main.get_deepseek_nlu()
+    # Force the phrasings past the local templates so each classification is a remote call
+    nlu.local_threshold = 1.01
+    for mode in ("unguarded", "coalescing", "guarded"):
+        await run(main, mode, stub, args)
+    await nlu.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=5)
+    parser.add_argument("--burst", type=int, default=10)
+    args = parser.parse_args()
+
+    server, stub, url = start_stub(latency_ms=args.latency_ms)
+    os.environ.update({"DEEPSEEK_API_URL": url, "DEEPSEEK_API_KEY": "stub", "BANK_STORAGE": "memory"})
+    try:
+        asyncio.run(run_all(args, stub))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
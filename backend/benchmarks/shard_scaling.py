@@ -0,0 +1,86 @@
+"""
+Transfer throughput of the sharded backend as the shard count grows.
+
+For each --shards count, starts that many shard processes and --clients
+client processes (stand-ins for API workers), each running random
+transfers through ShardedStorage for --seconds. Reports transfers per
+second and the share that crossed shards; tests/test_sharding.py checks
+that no money is created or lost. Scaling needs as many cores as shards
+plus clients; on fewer cores the shards share them.
+
+Run from the backend directory:
+    python -m benchmarks.shard_scaling --shards 1 2 4 --clients 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.dataset import make_accounts
+from storage.shard_server import launch
+from storage.sharded import ShardedStorage, shard_of
+
+
+def client(socket_dir: str, shard_count: int, accounts: int, seconds: float, seed: int, results):
+    storage = ShardedStorage(socket_dir, shard_count)
+    rng = random.Random(seed)
+    done = crossed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sender, receiver = rng.sample(range(1, accounts + 1), 2)
+        if storage.transfer(sender, receiver, rng.randint(1, 100))["success"]:
+            done += 1
+            crossed += shard_of(sender, shard_count) != shard_of(receiver, shard_count)
+    storage.close()
+    results.put((done, crossed))
+
+
+def run(shard_count: int, args):
+    socket_dir = tempfile.mkdtemp()
+    processes = launch(shard_count, make_accounts(args.accounts, balance=10 ** 6), socket_dir)
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(
+            target=client, args=(socket_dir, shard_count, args.accounts, args.seconds, args.seed + i, results)
+        )
+        for i in range(args.clients)
+    ]
+    for process in clients:
+        process.start()
+    counts = [results.get() for _ in clients]
+    for process in clients:
+        process.join()
+
+    for process in processes:
+        process.terminate()
+        process.join()
+    shutil.rmtree(socket_dir)
+
+    done = sum(count for count, _ in counts)
+    crossed = sum(count for _, count in counts)
+    return done / args.seconds, crossed / done if done else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes")
+    baseline = None
+    for shard_count in args.shards:
+        rate, crossed = run(shard_count, args)
+        baseline = baseline or rate
+        print(f"{shard_count} shards: {rate:10.0f} transfers/s  x{rate / baseline:.2f}  "
+              f"{crossed:.0%} cross-shard")
+
+
+if __name__ == "__main__":
+    main()
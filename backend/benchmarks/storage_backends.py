@@ -0,0 +1,61 @@
+"""
+Transfer and history throughput of the memory and SQLite storage backends.
+
+Run from the backend directory:
+    python -m benchmarks.storage_backends --accounts 1000 --history 200 --ops 5000
+"""
+import argparse
+import copy
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.dataset import make_accounts
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+
+def timed(label: str, storage, jobs, fn, threads: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda job: fn(storage, job), jobs))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<10} {len(jobs)} ops in {elapsed:.3f}s ({len(jobs) / elapsed:,.0f}/s)")
+
+
+def run(name: str, storage, args):
+    rng = random.Random(args.seed)
+    transfers = [
+        (*rng.sample(range(1, args.accounts + 1), 2), rng.randint(1, 100))
+        for _ in range(args.ops)
+    ]
+    reads = [rng.randint(1, args.accounts) for _ in range(args.ops)]
+
+    print(name)
+    timed("transfer", storage, transfers, lambda s, job: s.transfer(*job), args.threads)
+    timed("history", storage, reads, lambda s, user_id: s.get_transactions(user_id, 10), args.threads)
+    timed("balance", storage, reads, lambda s, user_id: s.get_balance(user_id), args.threads)
+    storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=200, help="transactions per account")
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    seed = make_accounts(args.accounts, transactions=args.history, seed=args.seed)
+    run("memory", MemoryStorage(copy.deepcopy(seed)), args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        run("sqlite", SQLiteStorage(path, pool_size=args.threads, seed=seed), args)
+
+
+if __name__ == "__main__":
+    main()
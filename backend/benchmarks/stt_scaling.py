@@ -0,0 +1,86 @@
+"""
+Scaling of concurrent audio streams over STT worker processes: for each
+worker count, sessions_per_worker streams per worker replay the WAV
+fixtures (or synthesized recordings, see stt_throughput) and the aggregate speed is compared with a single worker.
+Throughput should grow roughly linearly until workers exceed the cores.
+
+Run from the backend directory (needs the Vosk model, see VOSK_MODEL_PATH):
+    python -m benchmarks.stt_scaling --max-workers 8 --sessions 2 --rounds 2
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stt_throughput import FIXTURES, load_or_synthesize
+from stt_workers import STTWorkerPool
+from vosk_stt import SAMPLE_RATE
+
+
+def replay(pool: STTWorkerPool, pcm: bytes, chunk_bytes: int):
+    """Stream one recording through a pinned session, one chunk in flight at a time"""
+    session = pool.open_session()
+    try:
+        for offset in range(0, len(pcm), chunk_bytes):
+            session.feed(pcm[offset:offset + chunk_bytes], timeout=30).result()
+        session.finish(timeout=30).result()
+    finally:
+        session.close()
+    return len(pcm) / (2 * SAMPLE_RATE)
+
+
+def run(workers: int, fixtures, args, chunk_bytes: int):
+    pool = STTWorkerPool(workers=workers, sessions_per_worker=args.sessions)
+    pool.start()
+    streams = workers * args.sessions
+    # Work grows with the stream count, so ideal scaling keeps elapsed time flat
+    jobs = [pcm for _ in range(args.rounds * streams) for _, pcm in fixtures]
+
+    peak_depth = 0
+    done = threading.Event()
+
+    def sample_depth():
+        nonlocal peak_depth
+        while not done.wait(0.05):
+            peak_depth = max(peak_depth, pool.stats()["queue_depth"])
+
+    threading.Thread(target=sample_depth, daemon=True).start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=streams) as executor:
+            audio = sum(executor.map(lambda pcm: replay(pool, pcm, chunk_bytes), jobs))
+        elapsed = time.perf_counter() - start
+    finally:
+        done.set()
+        stats = pool.stats()
+        pool.shutdown()
+    return audio / elapsed, stats["real_time_factor"], peak_depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="*", default=[str(FIXTURES)])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sessions", type=int, default=2, help="concurrent streams per worker")
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--chunk-ms", type=int, default=250)
+    args = parser.parse_args()
+
+    fixtures = load_or_synthesize(args.paths)
+    chunk_bytes = SAMPLE_RATE * 2 * args.chunk_ms // 1000
+
+    counts = sorted({1, *[2 ** i for i in range(1, args.max_workers.bit_length())], args.max_workers})
+    baseline = None
+    print(f"{os.cpu_count()} cores, {args.sessions} streams per worker")
+    for workers in counts:
+        speed, rtf, peak_depth = run(workers, fixtures, args, chunk_bytes)
+        baseline = baseline or speed
+        print(
+            f"{workers:>3} workers  {speed:8.1f}x real time   scaling {speed / baseline:5.2f}x "
+            f"(efficiency {speed / baseline / workers:4.0%})   worker RTF {rtf}   peak queue depth {peak_depth}"
+        )
+
+
+if __name__ == "__main__":
+    main()
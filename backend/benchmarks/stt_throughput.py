@@ -0,0 +1,173 @@
+"""
+Streaming speech recognition throughput on recorded WAV fixtures: every
+file is streamed through a pooled recognizer in real-time-sized chunks,
+first on one stream and then on several concurrent streams.
+
+Fixtures are 16 kHz mono 16-bit WAV files, by default read from
+benchmarks/fixtures/audio. Record new ones with a microphone via --record;
+without any, speech-like recordings are synthesized, which cost about as
+much to decode as speech but transcribe to nothing meaningful.
+
+Run from the backend directory (needs the Vosk model, see VOSK_MODEL_PATH):
+    python -m benchmarks.stt_throughput --streams 4 --rounds 3
+    python -m benchmarks.stt_throughput --record benchmarks/fixtures/audio/balance.wav --seconds 3
+"""
+import argparse
+import math
+import random
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from vosk_stt import SAMPLE_RATE, RecognizerPool, StreamingSession
+
+FIXTURES = Path(__file__).parent / "fixtures" / "audio"
+# (name, seconds) of the recordings synthesized when there are no fixtures
+SYNTHETIC = (("synthetic-short", 2.0), ("synthetic-medium", 3.5), ("synthetic-long", 5.0))
+# F1, F2, F3 in Hz of the vowels the synthetic syllables cycle through
+VOWELS = ((730, 1090, 2440), (530, 1840, 2480), (270, 2290, 3010), (570, 840, 2410), (300, 870, 2240))
+
+
+def load_fixtures(paths):
+    """Return [(name, pcm bytes)] for the WAV files under the given paths"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files += sorted(path.glob("*.wav"))
+        elif path.exists():
+            files.append(path)
+    fixtures = []
+    for path in files:
+        with wave.open(str(path), "rb") as wav:
+            if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+                raise SystemExit(f"{path}: expected 16 kHz mono 16-bit PCM")
+            fixtures.append((path.name, wav.readframes(wav.getnframes())))
+    return fixtures
+
+
+def synthesize(seconds: float, seed: int):
+    """
+    Speech-like PCM: syllables of a pulse train at a wandering pitch through
+    three vowel formant resonators, each after a short noise burst for its
+    consonant, with pauses between words
+    """
+    rng = random.Random(seed)
+    samples = []
+    while len(samples) < seconds * SAMPLE_RATE:
+        for _ in range(rng.randint(1, 3)):
+            samples += [rng.uniform(-0.3, 0.3) for _ in range(int(SAMPLE_RATE * rng.uniform(0.02, 0.06)))]
+            samples += _vowel(rng.choice(VOWELS), rng.uniform(0.12, 0.25), rng.uniform(100, 180), rng)
+        samples += [rng.gauss(0, 0.003) for _ in range(int(SAMPLE_RATE * rng.uniform(0.08, 0.3)))]
+    samples = samples[:int(seconds * SAMPLE_RATE)]
+    scale = 16000 / max(abs(sample) for sample in samples)
+    return b"".join(int(sample * scale).to_bytes(2, "little", signed=True) for sample in samples)
+
+
+def _vowel(formants, seconds: float, pitch: float, rng):
+    count = int(seconds * SAMPLE_RATE)
+    phase, source = 0.0, []
+    for i in range(count):
+        phase += pitch * (1 + 0.1 * math.sin(2 * math.pi * 3 * i / SAMPLE_RATE)) / SAMPLE_RATE
+        pulse = phase >= 1
+        phase -= pulse
+        source.append(float(pulse) + rng.gauss(0, 0.01))
+    for frequency in formants:
+        # Two-pole resonator with an 80 Hz bandwidth
+        r = math.exp(-math.pi * 80 / SAMPLE_RATE)
+        b, c = 2 * r * math.cos(2 * math.pi * frequency / SAMPLE_RATE), -r * r
+        y1 = y2 = 0.0
+        for i, x in enumerate(source):
+            y1, y2 = (1 - r) * x + b * y1 + c * y2, y1
+            source[i] = y1
+    # Rise and fall over the syllable
+    return [x * math.sin(math.pi * i / count) for i, x in enumerate(source)]
+
+
+def load_or_synthesize(paths):
+    """The WAV fixtures under paths, or synthesized recordings when there are none"""
+    fixtures = load_fixtures(paths)
+    if fixtures:
+        return fixtures
+    print(f"No WAV fixtures under {' '.join(map(str, paths))}; using {len(SYNTHETIC)} synthesized recordings")
+    return [(name, synthesize(seconds, seed)) for seed, (name, seconds) in enumerate(SYNTHETIC)]
+
+
+def stream(pool: RecognizerPool, pcm: bytes, chunk_bytes: int):
+    """Feed one recording; returns (audio seconds, first partial latency, final texts)"""
+    session = StreamingSession(pool, timeout=60)
+    start = time.perf_counter()
+    first_partial = None
+    finals = []
+    try:
+        for offset in range(0, len(pcm), chunk_bytes):
+            event = session.feed(pcm[offset:offset + chunk_bytes])
+            if event and first_partial is None:
+                first_partial = time.perf_counter() - start
+            if event and event["type"] == "final":
+                finals.append(event["text"])
+        event = session.finish()
+        if event:
+            finals.append(event["text"])
+        return session.audio_seconds, first_partial, finals
+    finally:
+        session.close()
+
+
+def run(label: str, fixtures, streams: int, rounds: int, chunk_bytes: int):
+    pool = RecognizerPool(size=streams)
+    jobs = [pcm for _ in range(rounds) for _, pcm in fixtures]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        results = list(executor.map(lambda pcm: stream(pool, pcm, chunk_bytes), jobs))
+    elapsed = time.perf_counter() - start
+    audio = sum(r[0] for r in results)
+    partials = sorted(r[1] for r in results if r[1] is not None)
+    first = f"{partials[len(partials) // 2] * 1000:7.1f} ms" if partials else "      n/a"
+    print(
+        f"{label:<12} {len(jobs)} recordings, {audio:7.1f}s audio in {elapsed:6.2f}s  "
+        f"{audio / elapsed:6.1f}x real time   median first event {first}"
+    )
+    return results
+
+
+def record(path: str, seconds: float):
+    import sounddevice as sd
+
+    print(f"Recording {seconds}s to {path} ...")
+    pcm = sd.rec(int(seconds * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1, dtype="int16")
+    sd.wait()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("paths", nargs="*", default=[str(FIXTURES)])
+    parser.add_argument("--streams", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--chunk-ms", type=int, default=250)
+    parser.add_argument("--record", metavar="WAV", help="record a fixture from the microphone and exit")
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.seconds)
+        return
+
+    fixtures = load_or_synthesize(args.paths)
+    chunk_bytes = SAMPLE_RATE * 2 * args.chunk_ms // 1000
+
+    results = run("1 stream", fixtures, 1, args.rounds, chunk_bytes)
+    for (name, _), (_, _, finals) in zip(fixtures, results):
+        print(f"  {name}: {' / '.join(finals) or '(no speech)'}")
+    if args.streams > 1:
+        run(f"{args.streams} streams", fixtures, args.streams, args.rounds, chunk_bytes)
+
+
+if __name__ == "__main__":
+    main()
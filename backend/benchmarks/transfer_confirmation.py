@@ -0,0 +1,78 @@
+"""
+Latency of the two-step transfer: the request that asks for the password
+and the confirmation that commits it, with DeepSeek served by the local stub.
+
+Compares resending the message with the password (classified again, with
+the intent cache cold or warm) against confirming with the token returned
+by the first step, which skips NLU.
+
+Run from the backend directory:
+    python -m benchmarks.transfer_confirmation --latency-ms 300 --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.deepseek_stub import start_stub
+
+MESSAGE = "please transfer 10 rupees over to jane right now"
+
+
+async def two_step(main, mode: str):
+    nlu = main.get_deepseek_nlu()
+    nlu.cache.clear()
+    start = time.perf_counter()
+    first = await main.process_text(main.Query(user_id=1, message=MESSAGE))
+    asked = time.perf_counter()
+    assert first["data"]["require_password"], first["reply"]
+
+    if mode == "token":
+        query = main.Query(user_id=1, message=MESSAGE, password="password123",
+                           confirmation_token=first["data"]["confirmation_token"])
+    else:
+        if mode == "resend, cache cold":
+            nlu.cache.clear()
+        query = main.Query(user_id=1, message=MESSAGE, password="password123")
+    second = await main.process_text(query)
+    done = time.perf_counter()
+    assert second["data"]["success"], second["reply"]
+    return (asked - start) * 1000, (done - asked) * 1000, second["tier"]
+
+
+async def run(args):
+    import main
+
+    nlu = main.get_deepseek_nlu()
+    # Force the phrasing past the local templates so each classification is a remote call
+    nlu.local_threshold = 1.01
+    for mode in ("resend, cache cold", "resend, cache warm", "token"):
+        samples = [await two_step(main, mode) for _ in range(args.rounds)]
+        ask = statistics.median(s[0] for s in samples)
+        confirm = statistics.median(s[1] for s in samples)
+        print(
+            f"{mode:<20} ask {ask:8.1f} ms   confirm {confirm:8.1f} ms   "
+            f"total {ask + confirm:8.1f} ms   confirm tier {samples[-1][2]}"
+        )
+    await nlu.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    server, _, url = start_stub(latency_ms=args.latency_ms)
+    os.environ.update({
+        "DEEPSEEK_API_URL": url, "DEEPSEEK_API_KEY": "stub", "BANK_STORAGE": "memory", "ASSISTANT_RATE_LIMIT": "0",
+    })
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Concurrent retries of keyed transfers.
+
+Fires the same transfer many times at once under one idempotency key, the
+way a client retrying on timeouts would, and times it on each backend.
+Also times the dedup store on its own. That each key moves money exactly
+once is covered by tests/test_idempotency.py.
+
+Run from the backend directory:
+    python -m benchmarks.transfer_retries --keys 200 --retries 8 --threads 32
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.dataset import make_accounts
+from database import set_storage
+from services.idempotency import IdempotencyStore, transfer_requests
+from services.transfer_service import send_money
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+
+def run(name: str, storage, args):
+    set_storage(storage)
+    rng = random.Random(args.seed)
+    keyed = []
+    for i in range(args.keys):
+        sender_id, receiver_id = rng.sample(range(1, args.accounts + 1), 2)
+        keyed.append((f"{name}-{i}", sender_id, receiver_id, rng.randint(1, args.max_amount)))
+    jobs = [job for job in keyed for _ in range(args.retries)]
+    rng.shuffle(jobs)
+
+    def attempt(job):
+        key, sender_id, receiver_id, amount = job
+        return key, send_money(sender_id, amount, f"User {receiver_id}", f"pass{sender_id}", idempotency_key=key)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        outcomes = list(pool.map(attempt, jobs))
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(1 for _, result in outcomes if result["success"] and not result.get("replayed"))
+    replayed = sum(1 for _, result in outcomes if result.get("replayed"))
+
+    print(
+        f"{name:<7} {len(jobs)} requests for {args.keys} keys in {elapsed:.3f}s, "
+        f"{succeeded} transfers, {replayed} replayed"
+    )
+    storage.close()
+
+
+def store_overhead(args):
+    store = IdempotencyStore(max_size=args.keys)
+    count = 100000
+    start = time.perf_counter()
+    for i in range(count):
+        claim, _ = store.claim((1, i), (100, "ravi"))
+        store.complete(claim, {"success": True})
+    elapsed = time.perf_counter() - start
+    print(f"store   claim + complete {elapsed / count * 1e6:.2f} us/request, {store.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--keys", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--balance", type=int, default=10000)
+    parser.add_argument("--max-amount", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    run("memory", MemoryStorage(make_accounts(args.accounts, args.balance)), args)
+    with tempfile.TemporaryDirectory() as tmp:
+        run("sqlite", SQLiteStorage(os.path.join(tmp, "bench.db"), seed=make_accounts(args.accounts, args.balance)), args)
+    print(f"shared  {transfer_requests.stats()}")
+    store_overhead(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Concurrent transfer stress benchmark.
+
+Runs thousands of random transfers from a thread pool against a fresh set
+of accounts, with per-account locks and behind one global lock.
+Correctness is covered by tests/test_transfer_engine.py.
+
+Run from the backend directory:
+    python -m benchmarks.transfer_stress --accounts 200 --transfers 20000 --threads 32
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.dataset import make_accounts
+from storage.memory import MemoryStorage
+from storage.transfer_engine import TransferEngine
+
+
+class GlobalLockEngine(TransferEngine):
+    """Baseline that serializes every transfer behind one lock"""
+
+    def __init__(self, accounts: dict):
+        super().__init__(accounts)
+        self._global = threading.Lock()
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        with self._global:
+            return super().transfer(sender_id, receiver_id, amount)
+
+
+def run(engine_cls, args):
+    accounts = MemoryStorage(make_accounts(args.accounts, args.balance)).accounts
+    engine = engine_cls(accounts)
+    rng = random.Random(args.seed)
+    jobs = []
+    for _ in range(args.transfers):
+        sender_id, receiver_id = rng.sample(range(1, args.accounts + 1), 2)
+        jobs.append((sender_id, receiver_id, rng.randint(1, args.max_amount)))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        outcomes = list(pool.map(lambda job: engine.transfer(*job), jobs))
+    elapsed = time.perf_counter() - start
+
+    succeeded = sum(1 for o in outcomes if o["success"])
+
+    print(
+        f"{engine_cls.__name__:<18} {args.transfers} transfers in {elapsed:.3f}s "
+        f"({args.transfers / elapsed:,.0f}/s), {succeeded} succeeded"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--transfers", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--balance", type=int, default=10000)
+    parser.add_argument("--max-amount", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for engine_cls in (TransferEngine, GlobalLockEngine):
+        run(engine_cls, args)
+
+
+if __name__ == "__main__":
+    main()
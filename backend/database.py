@@ -1,5 +1,8 @@
 # backend/database.py
-from datetime import datetime
+import os
+import threading
+
+from settings import load_env
 
 db = {
     1: {
@@ -146,4 +149,67 @@ db = {
             }
         ]
     }
-}
\ No newline at end of file
+}
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend: str = None):
+    """
+    Build the storage backend selected by BANK_STORAGE ("memory", "sqlite" or "sharded").
+    The SQLite database lives at BANK_SQLITE_PATH and is seeded from db when empty.
+    """
+    load_env()
+    backend = backend or os.getenv("BANK_STORAGE", "memory")
+    if backend == "memory":
+        from storage.memory import MemoryStorage
+        # With a journal directory, transfers survive restarts
+        return MemoryStorage(
+            db,
+            journal_dir=os.getenv("BANK_JOURNAL_DIR") or None,
+            fsync=os.getenv("BANK_JOURNAL_FSYNC", "1") != "0",
+            snapshot_interval=float(os.getenv("BANK_SNAPSHOT_INTERVAL", "60")),
+        )
+    if backend == "sqlite":
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(
+            os.getenv("BANK_SQLITE_PATH", "bank.db"),
+            pool_size=int(os.getenv("BANK_SQLITE_POOL_SIZE", "8")),
+            seed=db,
+        )
+    if backend == "sharded":
+        from storage.sharded import ShardedStorage
+        # Shard processes are started separately: python -m storage.shard_server
+        return ShardedStorage(
+            os.getenv("BANK_SHARD_DIR", "shards"),
+            int(os.getenv("BANK_SHARDS", "4")),
+            authkey=os.getenv("BANK_SHARD_KEY", "").encode() or None,
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def get_storage():
+    """Return the process-wide storage backend, creating it on first use"""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage()
+    return _storage
+
+
+def close_storage():
+    """Close the storage backend if one was created"""
+    global _storage
+    with _storage_lock:
+        if _storage is not None:
+            _storage.close()
+            _storage = None
+
+
+def set_storage(storage):
+    """Swap the process-wide storage backend (tests and benchmarks)"""
+    global _storage
+    with _storage_lock:
+        _storage = storage
@@ -1,13 +1,32 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query as QueryParam, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import Optional
-from nlu.deepseek_service import deepseek_nlu
-from services.balance_services import get_account_balance
-from services.transfer_service import send_money, verify_receiver_exists
-from services.history_service import get_transaction_history, format_transactions
+from datetime import datetime
+from typing import List, Optional, Union
+from nlu.deepseek_service import get_deepseek_nlu
+from database import close_storage, get_storage
+from services.balance_services import get_account_balance, get_balance_at
+from services.credentials import get_credentials
+from services.idempotency import transfer_requests
+from services.pending_transfers import pending_transfers
+from services.rate_limiter import assistant_limiter
+from services.render_cache import render_cache
+from services.scheduler import scheduler
+from services.single_flight import assistant_requests
+from services.transfer_service import MAX_BATCH_TRANSFERS, find_receiver, get_user_contacts, send_batch, send_money
+from services.history_service import get_history_reply, get_transaction_page, get_transaction_totals
+from nlu.time_periods import extract_period
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from stt_workers import STTOverloaded, STTWorkerLost, get_stt_pool, shutdown_stt_pool, stt_pool_stats
+from metrics import RequestTimer, registry
+from warmup import warmup
+import anyio
+import asyncio
 import logging
+import math
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("banking-assistant")
@@ -27,23 +46,87 @@ class Query(BaseModel):
     user_id: int
     message: str
     password: Optional[str] = None
+    cursor: Optional[str] = None
+    page_size: Optional[int] = None
+    # Client-generated ID that makes retrying a transfer safe
+    idempotency_key: Optional[str] = None
+    # Returned with the password prompt; confirms that transfer without re-running NLU
+    confirmation_token: Optional[str] = None
+    # Reply language and money format, e.g. "hi-IN" (see services/reply_templates.py)
+    locale: Optional[str] = None
 
 
 class TestQuery(BaseModel):
     message: str
 
 
+class BatchQuery(BaseModel):
+    messages: List[str]
+    concurrency: Optional[int] = None
+
+
+class BatchPayment(BaseModel):
+    # Account id, or a name or contact alias as in /assistant
+    receiver: Union[int, str]
+    amount: int
+
+
+class BatchTransfer(BaseModel):
+    user_id: int
+    password: str
+    payments: List[BatchPayment]
+    # Run the batch later in this process instead of now
+    run_at: Optional[datetime] = None
+    idempotency_key: Optional[str] = None
+
+
 CONFIDENCE_THRESHOLD = 0.6
+MAX_BATCH_SIZE = 10000
 
 
 @app.post("/assistant")
-def process_text(data: Query):
+async def process_text(data: Query):
+    limited = rate_limited(data.user_id)
+    if limited:
+        retry_after = math.ceil(limited["data"]["retry_after"])
+        return JSONResponse(limited, status_code=429, headers={"Retry-After": str(retry_after)})
+    return await answer_once(data)
+
+
+def rate_limited(user_id: int):
+    """The reply for a user over the /assistant rate limit, or None"""
+    wait = assistant_limiter.acquire(user_id)
+    if not wait:
+        return None
+    return {
+        "reply": "You're sending requests too quickly. Please wait a moment and try again.",
+        "confidence": 0,
+        "source": "system",
+        "page": None,
+        "data": {"require_password": False, "retry_after": round(wait, 2)},
+    }
+
+
+async def answer_once(data: Query):
+    """
+    Identical requests from a user already in flight (client retries, a
+    stuck voice loop) share one answer instead of each running NLU again
+    """
+    if data.password is not None:
+        # Its answer depends on the password being right, and the password must
+        # not be held as a key: confirmations are deduplicated by their idempotency key
+        return await answer_message(data)
+    key = tuple(data.model_dump(exclude={"password"}).items())
+    return await assistant_requests.do(key, lambda: answer_message(data))
+
+
+async def answer_message(data: Query):
     logger.info("User %d: %s", data.user_id, data.message)
+    timer = RequestTimer()
 
     # Validate user exists
-    from database import db
-
-    if data.user_id not in db:
+    if not await in_threadpool(timer, "validate", get_storage().account_exists, data.user_id):
+        timer.finish("invalid_user", None)
         return {
             "reply": "User not found. Please log in again.",
             "confidence": 0,
@@ -51,17 +134,107 @@ def process_text(data: Query):
             "page": None,
         }
 
-    # Process with DeepSeek
-    nlu_result = deepseek_nlu.classify_intent(data.message)
+    # Password confirmation of a transfer resolved by an earlier message
+    if data.confirmation_token and data.password is not None:
+        async with get_credentials().slot():
+            response = await in_threadpool(timer, None, confirm_transfer, data, timer)
+        response["tier"] = "pending"
+        timer.finish("send_money", "pending")
+        return response
+
+    # Process with the tiered NLU (local rules, cache, DeepSeek, fallback)
+    with timer.stage("nlu"):
+        nlu_result = await get_deepseek_nlu().aclassify_intent(data.message)
+
+    logger.info(
+        "NLU result: %s (conf: %s, tier: %s)",
+        nlu_result.get("intent"), nlu_result.get("confidence", 0), nlu_result.get("tier"),
+    )
+
+    # Storage work can block (SQLite, account locks), so keep it off the event loop
+    if data.password is not None:
+        # Password checks wait on the KDF; cap the request threads they can hold
+        async with get_credentials().slot():
+            response = await in_threadpool(timer, None, handle_intent, data, nlu_result, timer)
+    else:
+        response = await in_threadpool(timer, None, handle_intent, data, nlu_result, timer)
+    response["tier"] = nlu_result.get("tier")
+    timer.finish(nlu_result.get("intent"), nlu_result.get("tier"), nlu_result.get("confidence", 0))
+    return response
+
+
+async def in_threadpool(timer: RequestTimer, stage: Optional[str], fn, *args):
+    """
+    run_in_threadpool that records how long fn waited for a free thread,
+    and how long it ran under stage if one is given
+    """
+    queued = time.perf_counter()
+
+    def run():
+        started = time.perf_counter()
+        timer.add("threadpool_wait", started - queued)
+        if stage is None:
+            return fn(*args)
+        try:
+            return fn(*args)
+        finally:
+            timer.add(stage, time.perf_counter() - started)
+
+    return await run_in_threadpool(run)
+
+
+def transfer_response(transfer_result: dict, confidence: float, source: str = "deepseek"):
+    return {
+        "reply": transfer_result["message"],
+        "confidence": confidence,
+        "source": source,
+        "page": transfer_result["page"],
+        "data": {
+            "require_password": transfer_result["require_password"],
+            "success": transfer_result["success"],
+            "balance": transfer_result.get("balance"),
+            "replayed": transfer_result.get("replayed", False),
+        },
+    }
+
+
+def confirm_transfer(data: Query, timer: RequestTimer):
+    """Commit a transfer held for password confirmation, skipping NLU and receiver lookup"""
+    # Keyed on the token alone: a client-chosen key must not run the held transfer again
+    idempotency_key = f"confirm:{data.confirmation_token}"
+    pending = pending_transfers.get(data.confirmation_token, data.user_id)
+    if pending is None:
+        # Used up: a retried confirmation gets the first outcome back
+        replay = transfer_requests.outcome((data.user_id, idempotency_key))
+        if replay is not None:
+            return transfer_response({**replay, "replayed": True}, 1.0, source="system")
+        return {
+            "reply": "This transfer request has expired. Please say it again.",
+            "confidence": 0,
+            "source": "system",
+            "page": None,
+            "data": {"require_password": False},
+        }
+
+    # The token doubles as the idempotency key, so concurrent confirmations run the transfer once
+    with timer.stage("transfer"):
+        transfer_result = send_money(
+            data.user_id, pending["amount"], pending["receiver_name"], data.password, pending["receiver_id"],
+            idempotency_key=idempotency_key,
+        )
+    pending_transfers.discard(data.confirmation_token)
+    return transfer_response(transfer_result, 1.0, source="system")
+
 
+def handle_intent(data: Query, nlu_result: dict, timer: RequestTimer = None):
+    """Build the assistant response for a classified message"""
+    timer = timer or RequestTimer()
     intent_name = nlu_result.get("intent")
     confidence = nlu_result.get("confidence", 0)
     amount = nlu_result.get("amount")
     receiver = nlu_result.get("receiver")
     transaction_count = nlu_result.get("transaction_count")
 
-    logger.info("DeepSeek result: %s (conf: %s)", intent_name, confidence)
-
     # Low confidence handling
     if intent_name == "unknown" or confidence < CONFIDENCE_THRESHOLD:
         return {
@@ -72,9 +245,14 @@ def process_text(data: Query):
             "data": {"require_password": False},
         }
 
+    if intent_name == "balance_at_date" and not nlu_result.get("until"):
+        # No usable date: answer with the current balance
+        intent_name = "check_balance"
+
     # Handle intents
     if intent_name == "check_balance":
-        balance_data = get_account_balance(data.user_id)
+        with timer.stage("query"):
+            balance_data = get_account_balance(data.user_id, locale=data.locale)
         if not balance_data:
             return {
                 "reply": "Unable to retrieve balance.",
@@ -120,43 +298,122 @@ def process_text(data: Query):
                 }
 
             # Check if receiver exists first
-            if not verify_receiver_exists(receiver):
+            with timer.stage("lookup"):
+                found = find_receiver(receiver, data.user_id)
+            receiver_id, matches = found["receiver_id"], found["matches"]
+            if receiver_id is None and matches:
+                names = [match["name"] for match in matches]
+                question = (
+                    f"Did you mean {names[0]}?" if len(names) == 1
+                    else f"Which {receiver} do you mean: {', '.join(names[:-1])} or {names[-1]}?"
+                )
                 return {
-                    "reply": f"I can't find '{receiver}' in the system. Available contacts: Ravi, Jane, John, Mom, Mike.",
+                    "reply": f"{question} Please say the full name.",
+                    "confidence": confidence,
+                    "source": "deepseek",
+                    "page": None,
+                    "data": {"require_password": False, "candidates": matches},
+                }
+            if receiver_id is None:
+                contacts = ", ".join(alias.title() for alias in get_user_contacts(data.user_id) or {})
+                return {
+                    "reply": f"I can't find '{receiver}' in the system. Available contacts: {contacts or 'none'}.",
                     "confidence": confidence,
                     "source": "deepseek",
                     "page": None,
                     "data": {"require_password": False},
                 }
+            # Confirm with the name of the account being paid, not the one heard
+            receiver = found["name"]
 
             # Process transaction
-            transfer_result = send_money(
-                data.user_id, amount_val, receiver, data.password
-            )
+            with timer.stage("transfer"):
+                transfer_result = send_money(
+                    data.user_id, amount_val, receiver, data.password, receiver_id,
+                    idempotency_key=data.idempotency_key,
+                )
+            response = transfer_response(transfer_result, confidence)
+            if transfer_result["require_password"]:
+                response["data"]["confirmation_token"] = pending_transfers.create(
+                    data.user_id, amount_val, receiver, receiver_id
+                )
+            return response
 
+        except ValueError:
             return {
-                "reply": transfer_result["message"],
+                "reply": f"Invalid amount: {amount}. Please use numbers only.",
                 "confidence": confidence,
                 "source": "deepseek",
-                "page": transfer_result["page"],
-                "data": {
-                    "require_password": transfer_result["require_password"],
-                    "success": transfer_result["success"],
-                    "balance": transfer_result.get("balance"),
-                },
+                "page": None,
+                "data": {"require_password": False},
             }
 
+    elif intent_name == "balance_at_date":
+        with timer.stage("query"):
+            balance_data = get_balance_at(data.user_id, nlu_result["until"])
+        if not balance_data:
+            return {
+                "reply": "Unable to retrieve balance.",
+                "confidence": 0,
+                "source": "system",
+                "page": None,
+                "data": {"require_password": False},
+            }
+
+        return {
+            "reply": balance_data["message"],
+            "confidence": confidence,
+            "source": "deepseek",
+            "page": "home",
+            "data": {"require_password": False, "balance": balance_data["balance"], "as_of": balance_data["as_of"]},
+        }
+
+    elif intent_name == "spending_summary":
+        since, until = nlu_result.get("since"), nlu_result.get("until")
+        if not since and not until:
+            since, until = extract_period("this month")
+        with timer.stage("query"):
+            summary = get_transaction_totals(data.user_id, since, until)
+        if not summary:
+            return {
+                "reply": "Unable to retrieve your spending.",
+                "confidence": 0,
+                "source": "system",
+                "page": None,
+                "data": {"require_password": False},
+            }
+
+        return {
+            "reply": summary["message"],
+            "confidence": confidence,
+            "source": "deepseek",
+            "page": "statements",
+            "data": {
+                "require_password": False,
+                "credit": summary["credit"],
+                "debit": summary["debit"],
+                "net": summary["net"],
+                "since": summary["since"],
+                "until": summary["until"],
+            },
+        }
+
+    elif intent_name == "transaction_history":
+        try:
+            with timer.stage("query"):
+                page = get_history_reply(
+                    data.user_id, transaction_count, cursor=data.cursor,
+                    limit=transaction_count or data.page_size, locale=data.locale,
+                )
         except ValueError:
             return {
-                "reply": f"Invalid amount: {amount}. Please use numbers only.",
+                "reply": "That page of transactions is no longer available. Please ask again.",
                 "confidence": confidence,
                 "source": "deepseek",
                 "page": None,
                 "data": {"require_password": False},
             }
-
-    elif intent_name == "transaction_history":
-        transactions = get_transaction_history(data.user_id, transaction_count)
+        transactions = page["transactions"] if page else None
 
         if not transactions:
             return {
@@ -167,11 +424,8 @@ def process_text(data: Query):
                 "data": {"require_password": False},
             }
 
-        # Format for voice output
-        formatted_reply = format_transactions(transactions, transaction_count)
-
         return {
-            "reply": formatted_reply,
+            "reply": page["reply"],
             "confidence": confidence,
             "source": "deepseek",
             "page": "statements",
@@ -179,6 +433,7 @@ def process_text(data: Query):
                 "require_password": False,
                 "transaction_count": len(transactions),
                 "transactions": transactions,
+                "next_cursor": page["next_cursor"],
             },
         }
 
@@ -192,23 +447,229 @@ def process_text(data: Query):
         }
 
 
+@app.websocket("/ws/stt/{user_id}")
+async def stream_speech(websocket: WebSocket, user_id: int):
+    """
+    Streaming speech input. Binary frames carry 16 kHz mono int16 PCM; the
+    text frame "end" flushes the current utterance. Partial transcripts are
+    sent as they change and each final transcript is answered like an
+    /assistant message. Decoding runs on the STT worker processes; a stream
+    waits for each chunk before reading the next, so a busy worker slows
+    the client down instead of queueing audio without bound.
+    """
+    await websocket.accept()
+    if not await run_in_threadpool(get_storage().account_exists, user_id):
+        await websocket.send_json({"type": "error", "detail": "User not found"})
+        await websocket.close(code=1008)
+        return
+
+    try:
+        session = await run_in_threadpool(get_stt_pool().open_session)
+    except STTOverloaded:
+        await websocket.send_json({"type": "error", "detail": "Speech recognition is busy, try again shortly"})
+        await websocket.close(code=1013)
+        return
+    except Exception as e:
+        logger.warning("Speech recognizer unavailable: %s", e)
+        await websocket.send_json({"type": "error", "detail": "Speech recognition is unavailable"})
+        await websocket.close(code=1013)
+        return
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                event = await asyncio.wrap_future(session.feed(message["bytes"], timeout=0))
+            elif message.get("text") == "end":
+                event = await asyncio.wrap_future(session.finish(timeout=0))
+            else:
+                continue
+
+            if event and event["type"] == "final":
+                query = Query(user_id=user_id, message=event["text"])
+                event["response"] = rate_limited(user_id) or await answer_once(query)
+            if event:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    except STTOverloaded:
+        await websocket.send_json({"type": "error", "detail": "Speech recognition is busy, try again shortly"})
+        await websocket.close(code=1013)
+    except STTWorkerLost:
+        await websocket.send_json({"type": "error", "detail": "Speech recognition stopped, please start again"})
+        await websocket.close(code=1011)
+    finally:
+        await run_in_threadpool(session.close)
+
+
+@app.get("/transactions/{user_id}")
+def list_transactions(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    from_: Optional[str] = QueryParam(None, alias="from"),
+    to: Optional[str] = None,
+    type: Optional[str] = None,
+):
+    """Paginated statement: newest page first, follow next_cursor for older rows"""
+    try:
+        page = get_transaction_page(
+            user_id, cursor=cursor, limit=limit, since=from_, until=to, txn_type=type
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return page
+
+
+@app.get("/transactions/{user_id}/summary")
+def transaction_summary(
+    user_id: int,
+    from_: Optional[str] = QueryParam(None, alias="from"),
+    to: Optional[str] = None,
+):
+    """Money received and spent in a date range"""
+    try:
+        summary = get_transaction_totals(user_id, since=from_, until=to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return summary
+
+
+@app.get("/balance/{user_id}")
+def balance_at(user_id: int, at: Optional[str] = None):
+    """Current balance, or the balance at a past date or time"""
+    try:
+        balance_data = get_balance_at(user_id, at) if at else get_account_balance(user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if balance_data is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return balance_data
+
+
 @app.post("/test-nlu")
-def test_nlu(data: TestQuery):
+async def test_nlu(data: TestQuery):
     """Test DeepSeek NLU processing"""
-    result = deepseek_nlu.classify_intent(data.message)
+    result = await get_deepseek_nlu().aclassify_intent(data.message)
     return {"input": data.message, "result": result}
 
 
 @app.get("/test-nlu-get")
-def test_nlu_get(message: str = "check my balance"):
+async def test_nlu_get(message: str = "check my balance"):
     """GET endpoint for quick testing"""
-    result = deepseek_nlu.classify_intent(message)
+    result = await get_deepseek_nlu().aclassify_intent(message)
     return {"input": message, "result": result}
 
 
+@app.post("/test-nlu-batch")
+async def test_nlu_batch(data: BatchQuery):
+    """Classify a batch of messages in order, for offline evaluation"""
+    if len(data.messages) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} messages per batch")
+    nlu = get_deepseek_nlu()
+    concurrency = min(data.concurrency, nlu.max_inflight) if data.concurrency else None
+    return await nlu.aclassify_batch(data.messages, concurrency)
+
+
+@app.post("/transfers/batch")
+async def transfer_batch(data: BatchTransfer):
+    """Pay many receivers from one account, all or nothing, now or at run_at"""
+    if len(data.payments) > MAX_BATCH_TRANSFERS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_TRANSFERS} payments per batch")
+    run_at = data.run_at
+    if run_at is not None and run_at.tzinfo is not None:
+        # The scheduler runs on local wall-clock time
+        run_at = run_at.astimezone().replace(tzinfo=None)
+    payments = [(payment.receiver, payment.amount) for payment in data.payments]
+    async with get_credentials().slot():
+        return await run_in_threadpool(
+            send_batch, data.user_id, payments, data.password, run_at, data.idempotency_key
+        )
+
+
+@app.get("/transfers/batch/{job_id}")
+def scheduled_batch(job_id: str, user_id: int):
+    """State and outcome of a scheduled batch"""
+    job = scheduler.status(job_id, owner=user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Scheduled batch not found")
+    return job
+
+
+@app.delete("/transfers/batch/{job_id}")
+def cancel_scheduled_batch(job_id: str, user_id: int):
+    """Cancel a scheduled batch that has not started"""
+    if not scheduler.cancel(job_id, owner=user_id):
+        raise HTTPException(status_code=409, detail="Batch not found or already started")
+    return {"id": job_id, "state": "cancelled"}
+
+
+@app.on_event("startup")
+def start_warmup():
+    # Returns at once; the components load in the background
+    warmup.start()
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    await get_deepseek_nlu().aclose()
+    await run_in_threadpool(shutdown_stt_pool)
+    get_credentials().shutdown()
+    scheduler.shutdown()
+    await run_in_threadpool(close_storage)
+
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "deepseek-banking-assistant"}
+    return {
+        "status": "healthy",
+        "service": "deepseek-banking-assistant",
+        "nlu": get_deepseek_nlu().health(),
+        "stt": stt_pool_stats(),
+        "idempotency": transfer_requests.stats(),
+        "pending_transfers": pending_transfers.stats(),
+        "credentials": get_credentials().stats(),
+        "scheduler": scheduler.stats(),
+        "render_cache": render_cache.stats(),
+        "rate_limit": assistant_limiter.stats(),
+        "coalescing": assistant_requests.stats(),
+        "storage": get_storage().stats(),
+    }
+
+
+def _threadpool_stats():
+    # Only valid on the event loop; /metrics renders there
+    return anyio.to_thread.current_default_thread_limiter().statistics()
+
+
+registry.gauge("threadpool_busy_threads", "Request threadpool threads in use",
+               lambda: _threadpool_stats().borrowed_tokens)
+registry.gauge("threadpool_size", "Request threadpool size", lambda: _threadpool_stats().total_tokens)
+registry.gauge("threadpool_waiting_tasks", "Calls waiting for a free request thread",
+               lambda: _threadpool_stats().tasks_waiting)
+registry.gauge("kdf_pending_checks", "Password checks queued or running on the KDF executor",
+               lambda: get_credentials().stats()["pending"])
+registry.gauge("deepseek_circuit_open", "1 while the DeepSeek circuit breaker is open",
+               lambda: int(get_deepseek_nlu().health()["status"] == "degraded"))
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness for load balancers: 503 until the BANK_WARMUP components are loaded"""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
 
 
 @app.get("/")
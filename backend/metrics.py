@@ -0,0 +1,202 @@
+# backend/metrics.py
+import threading
+import time
+from bisect import bisect_left
+
+# Request and stage latencies (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. observe() is a bisect and three additions under
+    a lock, cheap enough to leave on for every request.
+    """
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series is not None else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """A value read when metrics are rendered: fn returns a number or {label tuple: number}"""
+
+    def __init__(self, name: str, help: str, fn, labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        values = self.fn()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn, labelnames=()):
+        return self.register(Gauge(name, help, fn, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    "assistant_requests_total", "Messages answered by /assistant", ("intent", "tier"))
+REQUEST_SECONDS = registry.histogram(
+    "assistant_request_seconds", "End-to-end /assistant latency", ("intent",))
+STAGE_SECONDS = registry.histogram(
+    "assistant_stage_seconds", "Time spent in each stage of an /assistant request", ("stage", "intent"))
+NLU_CONFIDENCE = registry.histogram(
+    "nlu_confidence", "Confidence of the classified intent", ("tier",), buckets=CONFIDENCE_BUCKETS)
+DEEPSEEK_CALLS = registry.counter(
+    "deepseek_calls_total", "DeepSeek API calls by HTTP status or error", ("status",))
+DEEPSEEK_SECONDS = registry.histogram(
+    "deepseek_call_seconds", "DeepSeek API call latency")
+RENDER_CACHE = registry.counter(
+    "reply_render_cache_total", "Render cache lookups for balance and history replies", ("kind", "result"))
+RATE_LIMITED = registry.counter(
+    "rate_limited_requests_total", "Requests rejected by the per-user rate limit", ("endpoint",))
+COALESCED = registry.counter(
+    "coalesced_requests_total", "Requests answered by an identical request already in flight", ("endpoint",))
+
+# Intent label values; anything else (a stray LLM answer) is recorded as "unknown"
+INTENT_LABELS = frozenset({
+    "check_balance", "send_money", "transaction_history", "balance_at_date", "spending_summary",
+    "unknown", "invalid_user",
+})
+
+
+class RequestTimer:
+    """
+    Stage timings of one request, recorded under its intent by finish().
+    Time not covered by a stage (response formatting, glue) is reported
+    as the "other" stage.
+    """
+
+    __slots__ = ("started", "stages", "_name", "_start")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def stage(self, name: str):
+        """Time a block: with timer.stage("lookup"): ..."""
+        self._name = name
+        return self
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.add(self._name, time.perf_counter() - self._start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self, intent: str, tier: str, confidence: float = None):
+        total = time.perf_counter() - self.started
+        intent = intent if intent in INTENT_LABELS else "unknown"
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, name, intent)
+        STAGE_SECONDS.observe(max(total - sum(self.stages.values()), 0.0), "other", intent)
+        REQUEST_SECONDS.observe(total, intent)
+        REQUESTS.inc(intent, tier or "none")
+        if confidence is not None:
+            NLU_CONFIDENCE.observe(confidence, tier or "none")
@@ -0,0 +1,96 @@
+# backend/nlu/circuit_breaker.py
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Trips open after failure_threshold consecutive failed or slow calls.
+    While open every call is refused until reset_timeout has passed; then a
+    single half-open probe is let through and its outcome closes the circuit
+    or opens it again. Calls admitted before the circuit opened finish
+    without moving it: only the probe decides.
+    """
+
+    def __init__(self, failure_threshold: int = 5, slow_call_seconds: float = 3.0, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def allow_request(self):
+        """
+        Whether a call may go to the upstream now. Returns: None if not, else
+        the state it was admitted in (HALF_OPEN for the probe), to pass back
+        with its outcome
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return CLOSED
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return HALF_OPEN
+            self.rejected += 1
+            return None
+
+    def record_success(self, duration: float, admitted: str = CLOSED):
+        """Record a completed call; a slow success still counts as a failure"""
+        if duration > self.slow_call_seconds:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure(admitted)
+            return
+        with self._lock:
+            self.successes += 1
+            if admitted == HALF_OPEN:
+                self._probe_in_flight = False
+                self.state = CLOSED
+            if self.state == CLOSED:
+                self.consecutive_failures = 0
+
+    def record_failure(self, admitted: str = CLOSED):
+        with self._lock:
+            self.failures += 1
+            if admitted == HALF_OPEN:
+                self._probe_in_flight = False
+            elif self.state != CLOSED:
+                # Started before the circuit opened; the open circuit already accounts for it
+                return
+            self.consecutive_failures += 1
+            if admitted == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.trips += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self, admitted: str):
+        """A call abandoned without an outcome (cancelled); frees the probe slot if it held it"""
+        if admitted == HALF_OPEN:
+            with self._lock:
+                self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+                "trips": self.trips,
+            }
@@ -1,29 +1,32 @@
 # backend/nlu/deepseek_service.py
-import requests
+import asyncio
+import logging
 import os
 import json
 import re
-from dotenv import load_dotenv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from nlu.circuit_breaker import OPEN, CircuitBreaker
+from nlu.intent_cache import IntentCache, normalize_text
+from nlu.local_classifier import (
+    PERIOD_INTENTS,
+    LocalIntentClassifier,
+    extract_amount,
+    extract_entities,
+    extract_receiver,
+    extract_transaction_count,
+)
+from metrics import DEEPSEEK_CALLS, DEEPSEEK_SECONDS
+from settings import load_env
 
-load_dotenv()
+logger = logging.getLogger("banking-assistant")
 
-class DeepSeekNLU:
-    def __init__(self):
-        self.api_key = os.getenv("DEEPSEEK_API_KEY")
-        self.api_url = "https://api.deepseek.com/v1/chat/completions"
-        
-    def classify_intent(self, user_text: str):
-        """
-        Use DeepSeek API for banking intent classification and entity extraction
-        """
-        if not self.api_key:
-            return self._rule_based_fallback(user_text)
-        
-        system_prompt = """You are a banking intent classifier. Analyze the user's message and return ONLY valid JSON.
+SYSTEM_PROMPT = """You are a banking intent classifier. Analyze the user's message and return ONLY valid JSON.
 
 Response format:
 {
-    "intent": "check_balance", "send_money", "transaction_history", or "unknown",
+    "intent": "check_balance", "send_money", "transaction_history", "balance_at_date", "spending_summary", or "unknown",
     "amount": number or null,
     "receiver": string or null,
     "transaction_count": number or null,
@@ -39,13 +42,165 @@ Examples:
 - "what's my balance" -> {"intent": "check_balance", "amount": null, "receiver": null, "transaction_count": null, "confidence": 0.93}
 - "transfer 1000 to john" -> {"intent": "send_money", "amount": 1000, "receiver": "john", "transaction_count": null, "confidence": 0.94}
 - "transaction history" -> {"intent": "transaction_history", "amount": null, "receiver": null, "transaction_count": null, "confidence": 0.91}
+- "what was my balance on 5 november" -> {"intent": "balance_at_date", "amount": null, "receiver": null, "transaction_count": null, "confidence": 0.92}
+- "how much did i spend last month" -> {"intent": "spending_summary", "amount": null, "receiver": null, "transaction_count": null, "confidence": 0.92}
+
+Use balance_at_date for a balance at a past date and spending_summary for money spent or received over a period.
+Leave dates out; they are read from the message separately.
 
 Return ONLY the JSON, no other text."""
+
+
+class DeepSeekNLU:
+    def __init__(self):
+        self.api_key = os.getenv("DEEPSEEK_API_KEY")
+        self.api_url = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+        self.local = LocalIntentClassifier()
+        self.local_threshold = float(os.getenv("NLU_LOCAL_THRESHOLD", "0.9"))
+        self.cache = IntentCache(
+            max_size=int(os.getenv("NLU_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("NLU_CACHE_TTL", "3600")),
+        )
+        self.timeout = float(os.getenv("DEEPSEEK_TIMEOUT", "10"))
+        self.max_inflight = int(os.getenv("NLU_MAX_INFLIGHT", "64"))
+        # Keep-alive connection pools, built on first use: requests for sync
+        # callers, aiohttp for async
+        self._session = None
+        self._client = None
+        self._client_loop = None
+        self._semaphore = None
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("NLU_BREAKER_FAILURES", "5")),
+            slow_call_seconds=float(os.getenv("NLU_BREAKER_SLOW_MS", "3000")) / 1000,
+            reset_timeout=float(os.getenv("NLU_BREAKER_RESET_S", "30")),
+        )
+        # Hedging: answer locally if DeepSeek has not replied within this deadline (0 = off)
+        self.hedge_seconds = float(os.getenv("NLU_HEDGE_MS", "0")) / 1000
+        self.hedged = 0
+        self._background = set()
         
+    def classify_intent(self, user_text: str):
+        """
+        Classify a banking message through tiers: the local classifier, the
+        intent cache, the DeepSeek API and finally the rule-based fallback.
+        The tier that answered is reported under "tier".
+        """
+        result = self._classify_without_remote(user_text)
+        if result is not None:
+            return result
+        return self._classify_remote(user_text)
+    
+    async def aclassify_intent(self, user_text: str):
+        """
+        Async classify_intent for the event loop. The DeepSeek call goes through
+        a shared keep-alive client and at most NLU_MAX_INFLIGHT calls run at once.
+        """
+        result = self._classify_without_remote(user_text)
+        if result is not None:
+            return result
+        if not self.hedge_seconds:
+            return await self._aclassify_remote(user_text)
+        
+        remote = asyncio.ensure_future(self._aclassify_remote(user_text))
+        try:
+            return await asyncio.wait_for(asyncio.shield(remote), self.hedge_seconds)
+        except asyncio.TimeoutError:
+            # Let the slow call finish in the background so it still fills
+            # the cache and reports its outcome to the breaker
+            self._background.add(remote)
+            remote.add_done_callback(self._background.discard)
+            self.hedged += 1
+            return {**self._rule_based_fallback(user_text), "tier": "hedge"}
+    
+    def classify_batch(self, messages: list, max_workers: int = 16):
+        """
+        Classify many messages at once. Duplicates are classified once, local
+        tiers answer what they can and the rest go to DeepSeek on a bounded
+        thread pool. Results come back in input order with per-item timing.
+        """
+        started = time.perf_counter()
+        unique = list(dict.fromkeys(messages))
+        answers = {}
+        remote = []
+        for message in unique:
+            item_started = time.perf_counter()
+            result = self._classify_without_remote(message)
+            if result is None:
+                remote.append(message)
+            else:
+                answers[message] = (result, (time.perf_counter() - item_started) * 1000)
+        
+        def timed_remote(message):
+            item_started = time.perf_counter()
+            return message, self._classify_remote(message), (time.perf_counter() - item_started) * 1000
+        
+        if remote:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(remote)))) as pool:
+                for message, result, elapsed_ms in pool.map(timed_remote, remote):
+                    answers[message] = (result, elapsed_ms)
+        return self._batch_response(messages, answers, len(unique), len(remote), started)
+    
+    async def aclassify_batch(self, messages: list, concurrency: int = None):
+        """Async classify_batch; remote calls run concurrently on the event loop"""
+        started = time.perf_counter()
+        unique = list(dict.fromkeys(messages))
+        answers = {}
+        remote = []
+        for message in unique:
+            item_started = time.perf_counter()
+            result = self._classify_without_remote(message)
+            if result is None:
+                remote.append(message)
+            else:
+                answers[message] = (result, (time.perf_counter() - item_started) * 1000)
+        
+        # Bounded on top of the shared in-flight limit so one batch cannot
+        # take every upstream slot from live traffic
+        semaphore = asyncio.Semaphore(concurrency or max(1, self.max_inflight // 2))
+        
+        async def timed_remote(message):
+            async with semaphore:
+                item_started = time.perf_counter()
+                result = await self._aclassify_remote(message)
+                answers[message] = (result, (time.perf_counter() - item_started) * 1000)
+        
+        await asyncio.gather(*(timed_remote(message) for message in remote))
+        return self._batch_response(messages, answers, len(unique), len(remote), started)
+    
+    def _batch_response(self, messages: list, answers: dict, unique: int, remote: int, started: float):
+        results = []
+        for message in messages:
+            result, elapsed_ms = answers[message]
+            results.append({"input": message, "result": result, "elapsed_ms": round(elapsed_ms, 3)})
+        return {
+            "count": len(messages),
+            "unique": unique,
+            "remote": remote,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+            "results": results,
+        }
+    
+    def _classify_without_remote(self, user_text: str):
+        """Answer from the local tiers, or return None to escalate to DeepSeek"""
+        local_result = self.local.classify(user_text)
+        if local_result["confidence"] >= self.local_threshold:
+            return {**local_result, "tier": "local"}
+        
+        if not self.api_key:
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
+        
+        # Repeated phrasings reuse the cached intent; entities always come
+        # from this message so nothing carries over between users
+        template = self.cache.get(normalize_text(user_text))
+        if template is not None:
+            return {**template, **extract_entities(template["intent"], user_text), "tier": "cache"}
+        return None
+    
+    def _build_request(self, user_text: str):
         payload = {
             "model": "deepseek-chat",
             "messages": [
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_text}
             ],
             "temperature": 0.1,
@@ -56,33 +211,148 @@ Return ONLY the JSON, no other text."""
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        return payload, headers
+    
+    def _classify_remote(self, user_text: str):
+        """
+        Use DeepSeek API for banking intent classification and entity extraction
+        """
+        # An open circuit skips the upstream and its timeout entirely
+        admitted = self.breaker.allow_request()
+        if not admitted:
+            DEEPSEEK_CALLS.inc("circuit_open")
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
         
+        payload, headers = self._build_request(user_text)
+        started = time.monotonic()
         try:
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=10)
-            
-            if response.status_code != 200:
-                print(f"DeepSeek API error: {response.status_code}")
-                return self._rule_based_fallback(user_text)
-            
-            result = response.json()
-            content = result['choices'][0]['message']['content'].strip()
-            
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
-            if json_match:
-                content = json_match.group(0)
-            
-            parsed_result = json.loads(content)
-            
-            # Validate result
-            if parsed_result.get("intent") and parsed_result.get("confidence", 0) > 0.5:
-                return parsed_result
-            else:
-                return self._rule_based_fallback(user_text)
-                
+            response = self._sync_session().post(self.api_url, json=payload, headers=headers, timeout=self.timeout)
+            body = response.json() if response.status_code == 200 else None
+            result = self._parse_response(response.status_code, body, user_text)
+        except Exception as e:
+            self._record_error(e, admitted)
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
+        self._record_outcome(response.status_code, time.monotonic() - started, admitted)
+        return result
+    
+    async def _aclassify_remote(self, user_text: str):
+        admitted = self.breaker.allow_request()
+        if not admitted:
+            DEEPSEEK_CALLS.inc("circuit_open")
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
+        
+        payload, headers = self._build_request(user_text)
+        try:
+            async with self._inflight_semaphore():
+                started = time.monotonic()
+                async with self._async_client().post(self.api_url, json=payload, headers=headers) as response:
+                    status = response.status
+                    body = await response.json(content_type=None) if status == 200 else None
+                duration = time.monotonic() - started
+            result = self._parse_response(status, body, user_text)
+        except asyncio.CancelledError:
+            # A lost hedge or a caller that went away says nothing about the
+            # upstream; only free a half-open probe slot
+            self.breaker.release(admitted)
+            DEEPSEEK_CALLS.inc("cancelled")
+            raise
         except Exception as e:
-            print(f"DeepSeek API exception: {e}")
-            return self._rule_based_fallback(user_text)
+            self._record_error(e, admitted)
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
+        self._record_outcome(status, duration, admitted)
+        return result
+    
+    def _record_outcome(self, status_code: int, duration: float, admitted: str):
+        DEEPSEEK_CALLS.inc(str(status_code))
+        DEEPSEEK_SECONDS.observe(duration)
+        if status_code == 200:
+            self.breaker.record_success(duration, admitted)
+        else:
+            self.breaker.record_failure(admitted)
+    
+    def _record_error(self, error: Exception, admitted: str):
+        """A call that failed without an HTTP status (timeout, connection error, bad JSON)"""
+        self.breaker.record_failure(admitted)
+        DEEPSEEK_CALLS.inc("timeout" if isinstance(error, (TimeoutError, asyncio.TimeoutError))
+                           or "Timeout" in type(error).__name__ else "error")
+        logger.warning("DeepSeek API exception: %r", error)
+
+    def health(self):
+        """Upstream health for the /health endpoint"""
+        circuit = self.breaker.snapshot()
+        return {
+            "status": "degraded" if circuit["state"] == OPEN else "ok",
+            "remote_enabled": bool(self.api_key),
+            "circuit": circuit,
+            "hedge_ms": self.hedge_seconds * 1000,
+            "hedged": self.hedged,
+            "cache": self.cache.stats(),
+        }
+    
+    def _parse_response(self, status_code: int, result, user_text: str):
+        """Turn a DeepSeek status code and JSON body into an NLU result"""
+        if status_code != 200:
+            logger.warning("DeepSeek API error: %s", status_code)
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
+        
+        content = result['choices'][0]['message']['content'].strip()
+        
+        # Extract JSON from response
+        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        if json_match:
+            content = json_match.group(0)
+        
+        parsed_result = json.loads(content)
+        
+        # Validate result
+        if parsed_result.get("intent") and parsed_result.get("confidence", 0) > 0.5:
+            if parsed_result["intent"] in PERIOD_INTENTS:
+                parsed_result.update(extract_entities(parsed_result["intent"], user_text))
+            if parsed_result["intent"] != "unknown":
+                self.cache.put(normalize_text(user_text), parsed_result["intent"], parsed_result["confidence"])
+            return {**parsed_result, "tier": "remote"}
+        else:
+            return {**self._rule_based_fallback(user_text), "tier": "fallback"}
+    
+    def _sync_session(self):
+        if self._session is None:
+            import requests
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=self.max_inflight))
+            session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=self.max_inflight))
+            self._session = session
+        return self._session
+    
+    def _async_client(self):
+        # The session and semaphore belong to the event loop that created them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.closed or self._client_loop is not loop:
+            import aiohttp
+            self._client = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_inflight, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._client_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_inflight)
+        return self._client
+    
+    def _inflight_semaphore(self):
+        self._async_client()
+        return self._semaphore
+    
+    async def aclose(self):
+        """Close the pooled HTTP clients"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    def warm_up(self):
+        """Import the HTTP clients and open the sync pool ahead of the first message"""
+        import aiohttp  # noqa: F401
+        self._sync_session()
     
     def _rule_based_fallback(self, user_text: str):
         """
@@ -90,32 +360,47 @@ Return ONLY the JSON, no other text."""
         """
         text_lower = user_text.lower()
         
-        # Balance check
+        # Spending or income over a period
+        if any(word in text_lower for word in ['spend', 'spent', 'spending', 'income', 'earned']):
+            return {"intent": "spending_summary", **extract_entities("spending_summary", text_lower), "confidence": 0.8}
+        
+        # Balance check, at a past date if one is mentioned
         if any(word in text_lower for word in ['balance', 'how much', 'money left', 'account']):
+            entities = extract_entities("balance_at_date", text_lower)
+            if entities["since"]:
+                return {"intent": "balance_at_date", **entities, "confidence": 0.8}
             return {"intent": "check_balance", "amount": None, "receiver": None, "transaction_count": None, "confidence": 0.8}
         
         # Send money
         send_words = ['send', 'transfer', 'pay', 'give']
         if any(word in text_lower for word in send_words):
             # Extract amount
-            amount_match = re.search(r'(\d+)', text_lower)
-            amount = int(amount_match.group(1)) if amount_match else None
+            amount = extract_amount(text_lower)
             
             # Extract receiver
-            receiver_match = re.search(r'to\s+(\w+)', text_lower)
-            receiver = receiver_match.group(1) if receiver_match else None
+            receiver = extract_receiver(text_lower)
             
             return {"intent": "send_money", "amount": amount, "receiver": receiver, "transaction_count": None, "confidence": 0.8}
         
         # Transaction history
         if any(word in text_lower for word in ['transaction', 'history', 'statement', 'recent']):
             # Extract transaction count if mentioned
-            count_match = re.search(r'(\d+)\s+(?:transaction|recent|last|previous)', text_lower)
-            count = int(count_match.group(1)) if count_match else None
+            count = extract_transaction_count(text_lower)
             
             return {"intent": "transaction_history", "amount": None, "receiver": None, "transaction_count": count, "confidence": 0.8}
         
         return {"intent": "unknown", "amount": None, "receiver": None, "transaction_count": None, "confidence": 0.3}
 
-# Global instance
-deepseek_nlu = DeepSeekNLU()
\ No newline at end of file
+_nlu = None
+_nlu_lock = threading.Lock()
+
+
+def get_deepseek_nlu():
+    """Return the process-wide classifier, creating it on first use"""
+    global _nlu
+    if _nlu is None:
+        with _nlu_lock:
+            if _nlu is None:
+                load_env()
+                _nlu = DeepSeekNLU()
+    return _nlu
\ No newline at end of file
@@ -0,0 +1,79 @@
+# backend/nlu/intent_cache.py
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_text(user_text: str):
+    """
+    Cache key for a message: lowercase, no punctuation, single spaces and
+    numbers masked, so "Send 500 to Ravi!" and "send 700 to ravi" share a key.
+    """
+    text = _PUNCTUATION.sub(" ", user_text.lower())
+    text = _DIGITS.sub("#", text)
+    return " ".join(text.split())
+
+
+class IntentCache:
+    """
+    Bounded LRU cache with a TTL for intent templates.
+    Only the intent and confidence are stored; entities such as amount and
+    receiver are always extracted from the live message by the caller.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, template = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(template)
+
+    def put(self, key: str, intent: str, confidence: float):
+        template = {"intent": intent, "confidence": confidence}
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, template)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
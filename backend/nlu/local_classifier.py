@@ -0,0 +1,138 @@
+# backend/nlu/local_classifier.py
+import re
+
+from nlu.time_periods import extract_period
+
+_PUNCTUATION = re.compile(r"[^\w\s'-]")
+
+# One compiled alternation finds every intent keyword in a single pass
+_KEYWORDS = re.compile(
+    r"\b(?:"
+    r"(?P<check_balance>balance|how much|money left)"
+    r"|(?P<send_money>send|transfer|pay|give)"
+    r"|(?P<transaction_history>transactions?|history|statements?|recent)"
+    r"|(?P<spending_summary>spen[dt]|spending|earned|income|receive[d]?)"
+    r")\b"
+)
+
+# Words that follow a receiver's name but are never part of it ("to jane please")
+_NOT_NAME = r"(?!(?:please|now|right|today|for|from|and|rs|rupees|inr)\b)"
+
+# Intents answered over a time period; "balance" plus a date means balance_at_date
+PERIOD_INTENTS = ("balance_at_date", "spending_summary")
+
+# Full-message templates for the common phrasings; a match means the
+# message says nothing beyond the intent and its entities
+_TEMPLATES = {
+    "check_balance": re.compile(
+        r"^(?:please\s+)?(?:(?:check|show|tell|get|what's|whats|what\s+is)\s+)?(?:me\s+)?"
+        r"(?:my\s+)?(?:current\s+|account\s+|available\s+)*balance(?:\s+please)?$"
+        r"|^how\s+much\s+money\s+(?:do\s+i\s+have|is\s+left|have\s+i\s+got)(?:\s+left)?$"
+    ),
+    "send_money": re.compile(
+        r"^(?:please\s+)?(?:send|transfer|pay|give)\s+(?:rs\s*|inr\s*|₹\s*)?(?P<amount>\d+)"
+        r"(?:\s*(?:rupees|rs|inr))?\s+to\s+(?P<receiver>" + _NOT_NAME + r"[a-z]+(?:\s+" + _NOT_NAME + r"[a-z]+)?)"
+        r"(?:\s+please)?$"
+    ),
+    "transaction_history": re.compile(
+        r"^(?:please\s+)?(?:(?:show|list|get|display|view|what\s+are)\s+)?(?:me\s+)?(?:my\s+)?"
+        r"(?:(?:last|previous|recent)\s+)?(?:(?P<count>\d+)\s+)?(?:recent\s+)?"
+        r"(?:transactions?|transaction\s+history|history|statements?)(?:\s+please)?$"
+    ),
+    "balance_at_date": re.compile(
+        r"^(?:what\s+(?:was|is)\s+|show\s+(?:me\s+)?|tell\s+me\s+)?(?:my\s+)?(?:account\s+)?balance\s+"
+        r"(?:on|at|as\s+of|at\s+the\s+end\s+of|for|in)?\s*[\w\s-]+?(?:\s+please)?$"
+    ),
+    "spending_summary": re.compile(
+        r"^how\s+much\s+(?:money\s+)?(?:did|have)\s+i\s+(?:spen[dt]|received?|earned?)(?:\s+[\w\s-]+?)?(?:\s+please)?$"
+        r"|^(?:show\s+(?:me\s+)?|what\s+(?:is|was)\s+)?(?:my\s+)?(?:spending|income)(?:\s+[\w\s-]+?)?(?:\s+please)?$"
+    ),
+}
+
+_AMOUNT = re.compile(r"(\d+)")
+# A one or two word receiver: "to john", "to john doe", but not "to john please"
+_RECEIVER = re.compile(r"\bto\s+(\w+(?:\s+" + _NOT_NAME + r"[a-z]+)?)")
+_COUNT = re.compile(r"(\d+)\s+(?:transaction|recent|last|previous)")
+
+TEMPLATE_CONFIDENCE = 0.95
+KEYWORD_CONFIDENCE = 0.8
+AMBIGUOUS_CONFIDENCE = 0.5
+UNKNOWN_CONFIDENCE = 0.3
+
+
+def normalize_message(user_text: str):
+    text = _PUNCTUATION.sub(" ", user_text.lower().replace("₹", " rs "))
+    return " ".join(text.split())
+
+
+def extract_amount(text_lower: str):
+    amount_match = _AMOUNT.search(text_lower)
+    return int(amount_match.group(1)) if amount_match else None
+
+
+def extract_receiver(text_lower: str):
+    receiver_match = _RECEIVER.search(text_lower)
+    return receiver_match.group(1) if receiver_match else None
+
+
+def extract_transaction_count(text_lower: str):
+    count_match = _COUNT.search(text_lower)
+    return int(count_match.group(1)) if count_match else None
+
+
+def extract_entities(intent: str, user_text: str):
+    """Extract the entities an intent needs from the message itself"""
+    text_lower = user_text.lower()
+    entities = {"amount": None, "receiver": None, "transaction_count": None}
+    if intent == "send_money":
+        entities["amount"] = extract_amount(text_lower)
+        entities["receiver"] = extract_receiver(text_lower)
+    elif intent == "transaction_history":
+        entities["transaction_count"] = extract_transaction_count(text_lower)
+    elif intent in PERIOD_INTENTS:
+        period = extract_period(text_lower)
+        entities["since"], entities["until"] = period if period else (None, None)
+    return entities
+
+
+class LocalIntentClassifier:
+    """
+    Precompiled keyword and template classifier.
+    Messages that match exactly one intent's full template score
+    TEMPLATE_CONFIDENCE; keyword-only matches score lower and messages
+    hitting several intents are marked ambiguous so the caller escalates.
+    """
+
+    def classify(self, user_text: str):
+        text = normalize_message(user_text)
+        intents = {match.lastgroup for match in _KEYWORDS.finditer(text)}
+
+        if not intents:
+            return {"intent": "unknown", "amount": None, "receiver": None,
+                    "transaction_count": None, "confidence": UNKNOWN_CONFIDENCE}
+
+        if "spending_summary" in intents:
+            # "how much did I spend" is not a balance question
+            intents.discard("check_balance")
+
+        if len(intents) > 1:
+            # Keep the old fallback priority but flag the conflict
+            intent = next(i for i in ("check_balance", "send_money", "transaction_history", "spending_summary") if i in intents)
+            return {"intent": intent, **extract_entities(intent, text), "confidence": AMBIGUOUS_CONFIDENCE}
+
+        intent = intents.pop()
+        if intent == "check_balance" and extract_period(text):
+            intent = "balance_at_date"
+        match = _TEMPLATES[intent].match(text)
+        if not match:
+            return {"intent": intent, **extract_entities(intent, text), "confidence": KEYWORD_CONFIDENCE}
+        if intent in PERIOD_INTENTS:
+            return {"intent": intent, **extract_entities(intent, text), "confidence": TEMPLATE_CONFIDENCE}
+
+        entities = {"amount": None, "receiver": None, "transaction_count": None}
+        if intent == "send_money":
+            entities["amount"] = int(match.group("amount"))
+            entities["receiver"] = match.group("receiver")
+        elif intent == "transaction_history" and match.group("count"):
+            entities["transaction_count"] = int(match.group("count"))
+        return {"intent": intent, **entities, "confidence": TEMPLATE_CONFIDENCE}
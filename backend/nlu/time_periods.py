@@ -0,0 +1,108 @@
+# backend/nlu/time_periods.py
+import re
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+_MONTHS = {
+    name: number
+    for number, names in enumerate(
+        [("january", "jan"), ("february", "feb"), ("march", "mar"), ("april", "apr"), ("may",),
+         ("june", "jun"), ("july", "jul"), ("august", "aug"), ("september", "sep", "sept"),
+         ("october", "oct"), ("november", "nov"), ("december", "dec")],
+        start=1,
+    )
+    for name in names
+}
+_MONTH = r"(?P<month>" + "|".join(sorted(_MONTHS, key=len, reverse=True)) + r")"
+
+_ISO_DATE = re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")
+_DAY_MONTH = re.compile(r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?" + _MONTH + r"\b(?:\s+(?P<year>\d{4}))?")
+_MONTH_DAY = re.compile(r"\b" + _MONTH + r"\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?\b(?:\s+(?P<year>\d{4}))?")
+# A bare month needs a preposition so "may" the verb is not read as a month
+_MONTH_ONLY = re.compile(r"\b(?:in|during|for|of|throughout)\s+" + _MONTH + r"\b(?:\s+(?P<year>\d{4}))?")
+_RELATIVE = re.compile(r"\b(?P<which>this|last|past|previous)\s+(?P<unit>week|month|year)\b")
+_LAST_DAYS = re.compile(r"\b(?:last|past|previous)\s+(?P<count>\d+)\s+days?\b")
+# "last N days" reaches back at most this far; anything longer means everything
+MAX_LAST_DAYS = 3660
+
+
+def _span(start: datetime, end: datetime):
+    """Inclusive (since, until) strings from a start and an exclusive end"""
+    return start.strftime(TIMESTAMP_FORMAT), (end - timedelta(minutes=1)).strftime(TIMESTAMP_FORMAT)
+
+
+def _month_span(year: int, month: int):
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return _span(datetime(year, month, 1), end)
+
+
+def _day_span(day: datetime):
+    return _span(day, day + timedelta(days=1))
+
+
+def _past_year(match, month: int, day: int, now: datetime):
+    """The year a date without one refers to: this year unless that is still ahead"""
+    if match.group("year"):
+        return int(match.group("year"))
+    return now.year if (month, day) <= (now.month, now.day) else now.year - 1
+
+
+def extract_period(text: str, now: datetime = None):
+    """
+    Find the time period a message refers to ("yesterday", "last month",
+    "on 5 november", "in october 2025", "2025-11-15").
+    Returns: inclusive ("YYYY-MM-DD HH:MM", "YYYY-MM-DD HH:MM") bounds, or None
+    """
+    now = now or datetime.now()
+    try:
+        return _find_period(text.lower(), now)
+    except (ValueError, OverflowError):
+        # Not a real calendar date ("31 february") or out of range ("in december 9999")
+        return None
+
+
+def _find_period(text: str, now: datetime):
+    today = datetime(now.year, now.month, now.day)
+    match = _ISO_DATE.search(text)
+    if match:
+        return _day_span(datetime(int(match.group("year")), int(match.group("month")), int(match.group("day"))))
+    for pattern in (_DAY_MONTH, _MONTH_DAY):
+        match = pattern.search(text)
+        if match:
+            month, day = _MONTHS[match.group("month")], int(match.group("day"))
+            return _day_span(datetime(_past_year(match, month, day, now), month, day))
+
+    if re.search(r"\btoday\b", text):
+        return _day_span(today)
+    if re.search(r"\byesterday\b", text):
+        return _day_span(today - timedelta(days=1))
+
+    match = _LAST_DAYS.search(text)
+    if match:
+        count = int(match.group("count"))
+        if count < 1:
+            return None
+        return _span(today - timedelta(days=min(count, MAX_LAST_DAYS) - 1), today + timedelta(days=1))
+
+    match = _RELATIVE.search(text)
+    if match:
+        previous = match.group("which") != "this"
+        unit = match.group("unit")
+        if unit == "week":
+            start = today - timedelta(days=today.weekday()) - timedelta(weeks=previous)
+            return _span(start, start + timedelta(weeks=1))
+        if unit == "month":
+            year, month = (now.year, now.month - 1) if previous else (now.year, now.month)
+            if month == 0:
+                year, month = year - 1, 12
+            return _month_span(year, month)
+        year = now.year - previous
+        return _span(datetime(year, 1, 1), datetime(year + 1, 1, 1))
+
+    match = _MONTH_ONLY.search(text)
+    if match:
+        month = _MONTHS[match.group("month")]
+        year = int(match.group("year")) if match.group("year") else (now.year if month <= now.month else now.year - 1)
+        return _month_span(year, month)
+    return None
@@ -1,24 +1,48 @@
-from database import db
+from database import get_storage
+from services.history_service import parse_time_bound
+from services.render_cache import render_cache
+from services.reply_templates import render_balance, resolve_locale
 
-def get_account_balance(user_id: int, raw: bool = False):
-    """Get account balance for a user"""
-    if user_id not in db:
-        return None
-    
-    balance = db[user_id]["balance"]
+def get_account_balance(user_id: int, raw: bool = False, locale: str = None):
+    """Get account balance for a user; the reply is cached until the account changes"""
+    storage = get_storage()
     if raw:
-        return balance
-    
-    user_name = db[user_id]["name"]
+        return storage.get_balance(user_id)
+
+    def render():
+        balance = storage.get_balance(user_id)
+        if balance is None:
+            return None
+        return {
+            "message": render_balance(balance, locale),
+            "balance": balance,
+            "user_id": user_id,
+            "page": "home"
+        }
+
+    return render_cache.get_or_render(user_id, storage.get_version(user_id), ("balance", resolve_locale(locale)), render)
+
+def get_balance_at(user_id: int, at: str):
+    """
+    Get the balance a user had at a past moment; a bare date means the end
+    of that day. Raises ValueError for a malformed timestamp.
+    """
+    at = parse_time_bound(at, end=True)
+    snapshot = get_storage().get_balance_at(user_id, at)
+    if snapshot is None:
+        return None
+
+    balance = snapshot["balance"]
+    day = at[:10] if at.endswith("23:59") else at
     return {
-        "message": f"Your current account balance is ₹{balance}",
+        "message": f"Your account balance on {day} was ₹{balance}",
         "balance": balance,
+        "at": at,
+        "as_of": snapshot["as_of"],
         "user_id": user_id,
         "page": "home"
     }
 
 def get_user_balance_raw(user_id: int):
     """Get raw balance value"""
-    if user_id not in db:
-        return None
-    return db[user_id]["balance"]
+    return get_storage().get_balance(user_id)
@@ -0,0 +1,234 @@
+# backend/services/credentials.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from database import get_storage
+from settings import load_env
+
+logger = logging.getLogger("banking-assistant")
+
+SCHEME = "scrypt"
+
+
+class CredentialsBusy(Exception):
+    """Too many password checks are already waiting for the KDF"""
+
+
+class PasswordHasher:
+    """
+    Salted scrypt hashes stored as "scrypt$n$r$p$salt$key" (base64 salt and key).
+    Anything else is taken as a plaintext password left over from the seed data.
+    """
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1, salt_size: int = 16, key_size: int = 32):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.salt_size = salt_size
+        self.key_size = key_size
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int, size: int):
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, dklen=size, maxmem=256 * n * r * p)
+
+    def hash(self, password: str):
+        salt = secrets.token_bytes(self.salt_size)
+        key = self._derive(password, salt, self.n, self.r, self.p, self.key_size)
+        return "$".join([
+            SCHEME, str(self.n), str(self.r), str(self.p),
+            base64.b64encode(salt).decode("ascii"), base64.b64encode(key).decode("ascii"),
+        ])
+
+    def verify(self, credential: str, password: str):
+        """Constant-time check of password against a stored hash or plaintext"""
+        if not credential.startswith(SCHEME + "$"):
+            return hmac.compare_digest(credential.encode(), password.encode())
+        _, n, r, p, salt, key = credential.split("$")
+        expected = base64.b64decode(key)
+        derived = self._derive(password, base64.b64decode(salt), int(n), int(r), int(p), len(expected))
+        return hmac.compare_digest(derived, expected)
+
+    def needs_rehash(self, credential: str):
+        """True for plaintext and for hashes made with other parameters"""
+        return not credential.startswith(f"{SCHEME}${self.n}${self.r}${self.p}$")
+
+
+class CredentialService:
+    """
+    Password checks for transfer confirmations.
+    The KDF runs on a small executor of its own (one thread per core by
+    default), so a burst of confirmations queues there instead of competing
+    with every other request for CPU; past max_pending queued checks new
+    ones are refused with CredentialsBusy. Successful checks are remembered
+    for cache_ttl seconds under a keyed digest, so a retried confirmation
+    skips the KDF. Plaintext or outdated hashes are replaced after a
+    successful check.
+
+    A check blocks the request thread that waits for it, so the API also
+    admits at most max_threads password-bearing requests into the request
+    threadpool at once (slot()); the rest wait on the event loop and leave
+    the threads to other requests.
+    """
+
+    def __init__(self, hasher: PasswordHasher = None, workers: int = None, max_pending: int = 64,
+                 cache_size: int = 10000, cache_ttl: float = 300, max_threads: int = None):
+        self.hasher = hasher or PasswordHasher()
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_threads = max_threads or 2 * self.workers
+        self._slots = asyncio.Semaphore(self.max_threads)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._cache_key = secrets.token_bytes(32)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.checks = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.rehashes = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the request threads set aside for password checks"""
+        async with self._slots:
+            yield
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise CredentialsBusy()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kdf")
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def _cached(self, token: bytes, credential: str):
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry is None:
+                return False
+            expires_at, cached_credential = entry
+            # A changed credential (new password or rehash) invalidates the entry
+            if expires_at <= time.monotonic() or cached_credential != credential:
+                del self._cache[token]
+                return False
+            self._cache.move_to_end(token)
+            self.cache_hits += 1
+            return True
+
+    def _remember(self, token: bytes, credential: str):
+        if self.cache_ttl <= 0:
+            return
+        with self._lock:
+            self._cache[token] = (time.monotonic() + self.cache_ttl, credential)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def verify(self, user_id: int, password: str):
+        """
+        Check a user's password. Blocks the calling thread until the KDF
+        executor has run the check.
+        Returns: True if it matches. Raises CredentialsBusy when overloaded
+        """
+        storage = get_storage()
+        credential = storage.get_password(user_id)
+        if credential is None or password is None:
+            return False
+        with self._lock:
+            self.checks += 1
+
+        token = hmac.new(self._cache_key, f"{user_id}:{password}".encode(), hashlib.sha256).digest()
+        if self._cached(token, credential):
+            return True
+        if not self._submit(self.hasher.verify, credential, password).result():
+            with self._lock:
+                self.failures += 1
+            return False
+
+        self._remember(token, credential)
+        if self.hasher.needs_rehash(credential):
+            self._rehash(storage, user_id, credential, password)
+        return True
+
+    def _rehash(self, storage, user_id: int, credential: str, password: str):
+        """Replace an outdated credential in the background; retried on the next login if skipped"""
+        def store(future):
+            try:
+                if storage.set_password(user_id, future.result(), expected=credential):
+                    with self._lock:
+                        self.rehashes += 1
+            except Exception as e:
+                logger.warning("Rehash of user %d failed: %s", user_id, e)
+
+        try:
+            self._submit(self.hasher.hash, password).add_done_callback(store)
+        except CredentialsBusy:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_threads": self.max_threads,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "checks": self.checks,
+                "cache_hits": self.cache_hits,
+                "failures": self.failures,
+                "rehashes": self.rehashes,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+
+def get_credentials():
+    """Return the process-wide credential service, building it on first use"""
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                load_env()
+                _credentials = CredentialService(
+                    hasher=PasswordHasher(n=int(os.getenv("SCRYPT_N", str(2 ** 14)))),
+                    workers=int(os.getenv("KDF_WORKERS", "0")) or None,
+                    max_pending=int(os.getenv("KDF_MAX_PENDING", "64")),
+                    max_threads=int(os.getenv("KDF_REQUEST_THREADS", "0")) or None,
+                    cache_ttl=float(os.getenv("CREDENTIAL_CACHE_TTL", "300")),
+                )
+    return _credentials
+
+
+def set_credentials(service: CredentialService):
+    """Swap the process-wide credential service (tests and benchmarks)"""
+    global _credentials
+    with _credentials_lock:
+        _credentials = service
@@ -1,35 +1,141 @@
-from database import db
+import base64
+from datetime import datetime
+
+from database import get_storage
+from services.render_cache import render_cache
+from services.reply_templates import render_history, resolve_locale
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+TRANSACTION_TYPES = ("credit", "debit")
+
 
 def get_transaction_history(user_id: int, count: int = None):
     """Get transaction history for a user with optional count limit"""
-    if user_id not in db:
+    # Returns the last 'count' transactions, or all of them without a count
+    return get_storage().get_transactions(user_id, count)
+
+
+def encode_cursor(before: int):
+    """Wrap a storage page key in an opaque cursor string"""
+    return base64.urlsafe_b64encode(f"v1:{before}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Unwrap a cursor from encode_cursor; raises ValueError if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, before = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        if version != "v1":
+            raise ValueError
+        return int(before)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def parse_time_bound(value: str, end: bool = False):
+    """
+    Normalize a "YYYY-MM-DD" or "YYYY-MM-DD HH:MM" bound to the stored
+    timestamp format. A bare date used as an end bound covers the whole day.
+    """
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d" and end:
+            parsed = parsed.replace(hour=23, minute=59)
+        return parsed.strftime("%Y-%m-%d %H:%M")
+    raise ValueError(f"Invalid timestamp: {value}. Use YYYY-MM-DD or YYYY-MM-DD HH:MM")
+
+
+def get_transaction_page(user_id: int, cursor: str = None, limit: int = None,
+                         since: str = None, until: str = None, txn_type: str = None):
+    """
+    Get one page of transaction history, newest page first.
+    Rows in a page are oldest first; pass next_cursor back to get older rows.
+    Raises ValueError for a malformed cursor, time bound or type.
+    Returns: dict with transactions and next_cursor, or None for an unknown user
+    """
+    if txn_type is not None and txn_type not in TRANSACTION_TYPES:
+        raise ValueError(f"Invalid transaction type: {txn_type}. Use credit or debit")
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+
+    page = get_storage().get_transaction_page(
+        user_id,
+        limit,
+        before=decode_cursor(cursor) if cursor else None,
+        since=parse_time_bound(since) if since else None,
+        until=parse_time_bound(until, end=True) if until else None,
+        txn_type=txn_type,
+    )
+    if page is None:
         return None
-    
-    transactions = db[user_id]["transactions"]
-    
-    if count and count > 0:
-        # Return last 'count' transactions
-        return transactions[-count:]
-    
-    # Return all transactions
-    return transactions
 
+    next_before = page["next_before"]
+    return {
+        "transactions": page["transactions"],
+        "next_cursor": encode_cursor(next_before) if next_before is not None else None,
+    }
+
+
+def get_transaction_totals(user_id: int, since: str = None, until: str = None):
+    """
+    Get money received and spent in the inclusive [since, until] range.
+    Raises ValueError for a malformed time bound.
+    Returns: dict with credit, debit, net and a spoken summary, or None for an unknown user
+    """
+    since = parse_time_bound(since) if since else None
+    until = parse_time_bound(until, end=True) if until else None
+    totals = get_storage().get_totals(user_id, since=since, until=until)
+    if totals is None:
+        return None
+
+    if since and until:
+        period = f" between {since[:10]} and {until[:10]}"
+    elif since:
+        period = f" since {since[:10]}"
+    elif until:
+        period = f" up to {until[:10]}"
+    else:
+        period = ""
+    return {
+        "credit": totals["credit"],
+        "debit": totals["debit"],
+        "net": totals["credit"] - totals["debit"],
+        "since": since,
+        "until": until,
+        "message": f"You spent ₹{totals['debit']} and received ₹{totals['credit']}{period}",
+    }
 
-def format_transactions(transactions, count: int = None):
+
+def format_transactions(transactions, count: int = None, locale: str = None):
     """Format transactions for voice output"""
-    if not transactions:
-        return "No transactions found."
-    
     if count and count > 0:
         transactions = transactions[-count:]
-    
-    formatted = []
-    for i, txn in enumerate(transactions, 1):
-        formatted.append(txn["description"])
-    
-    if len(formatted) == 1:
-        return formatted[0]
-    elif len(formatted) <= 5:
-        return "Your recent transactions: " + ". ".join(formatted)
-    else:
-        return "Your recent transactions: " + ". ".join(formatted[:5]) + f" (and {len(formatted) - 5} more)"
\ No newline at end of file
+    return render_history([txn["description"] for txn in transactions], locale)
+
+
+def get_history_reply(user_id: int, count: int = None, cursor: str = None, limit: int = None,
+                      locale: str = None):
+    """
+    A page of transactions with its spoken reply, cached until the account
+    changes. The page is shared by every locale's reply.
+    Raises ValueError for a malformed cursor.
+    Returns: dict with transactions, next_cursor and reply, or None for an unknown user
+    """
+    version = get_storage().get_version(user_id)
+    # Keyed on what the reply depends on, not the strings the client sent
+    before = decode_cursor(cursor) if cursor else None
+    size = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    page = render_cache.get_or_render(
+        user_id, version, ("page", before, size),
+        lambda: get_transaction_page(user_id, cursor=cursor, limit=limit),
+    )
+    if page is None:
+        return None
+    reply = render_cache.get_or_render(
+        user_id, version, ("history", before, size, count, resolve_locale(locale)),
+        lambda: format_transactions(page["transactions"], count, locale),
+    )
+    return {"transactions": page["transactions"], "next_cursor": page["next_cursor"], "reply": reply}
@@ -0,0 +1,132 @@
+# backend/services/idempotency.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a request with different parameters"""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with this key is still running"""
+
+
+class _Claim:
+    __slots__ = ("key", "fingerprint", "done", "result", "expires_at")
+
+    def __init__(self, key, fingerprint):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result = None
+        self.expires_at = None
+
+
+class IdempotencyStore:
+    """
+    Bounded LRU store with a TTL for the outcome of keyed requests.
+    The first request with a key claims it and runs; retries that arrive
+    while it runs wait for its outcome, and later retries get the stored
+    outcome back without running again. Claims still running are kept
+    apart from the LRU, so eviction never lets a retry run them twice.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 86400, wait_timeout: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._running = {}
+        self._lock = threading.Lock()
+        self.claims = 0
+        self.replays = 0
+        self.conflicts = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def claim(self, key, fingerprint):
+        """
+        Claim key for a request identified by fingerprint.
+        Returns: (claim, None) when the caller must run the request and then
+        call complete() or release(), or (None, stored result) for a replay.
+        Raises IdempotencyConflict or IdempotencyInProgress.
+        """
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._running.get(key)
+                if entry is None:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.expires_at <= now:
+                        del self._entries[key]
+                        self.expirations += 1
+                        entry = None
+                    elif entry is not None:
+                        self._entries.move_to_end(key)
+                if entry is None:
+                    entry = self._running[key] = _Claim(key, fingerprint)
+                    self.claims += 1
+                    return entry, None
+                if entry.fingerprint != fingerprint:
+                    self.conflicts += 1
+                    raise IdempotencyConflict(key)
+
+            if not entry.done.wait(self.wait_timeout):
+                raise IdempotencyInProgress(key)
+            if entry.result is not None:
+                with self._lock:
+                    self.replays += 1
+                return None, entry.result
+            # The first request gave up without an outcome; try to claim again
+
+    def outcome(self, key):
+        """The stored outcome for key, waiting while its request still runs; None if there is none"""
+        with self._lock:
+            entry = self._running.get(key) or self._entries.get(key)
+        if entry is None or not entry.done.wait(self.wait_timeout):
+            return None
+        if entry.expires_at is not None and entry.expires_at <= time.monotonic():
+            return None
+        return entry.result
+
+    def complete(self, claim: _Claim, result: dict):
+        """Store the outcome of a claimed request and wake its waiting retries"""
+        with self._lock:
+            claim.result = result
+            claim.expires_at = time.monotonic() + self.ttl
+            if self._running.get(claim.key) is claim:
+                del self._running[claim.key]
+            self._entries[claim.key] = claim
+            self._entries.move_to_end(claim.key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        claim.done.set()
+
+    def release(self, claim: _Claim):
+        """Drop a claim without an outcome so the next retry runs the request"""
+        with self._lock:
+            if self._running.get(claim.key) is claim:
+                del self._running[claim.key]
+        claim.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "in_flight": len(self._running),
+                "claims": self.claims,
+                "replays": self.replays,
+                "conflicts": self.conflicts,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+transfer_requests = IdempotencyStore(
+    max_size=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+    ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+)
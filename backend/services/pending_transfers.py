@@ -0,0 +1,78 @@
+# backend/services/pending_transfers.py
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class PendingTransferStore:
+    """
+    Transfers waiting for password confirmation, keyed by a random
+    short-lived token handed to the client with the password prompt, so
+    the confirmation commits without classifying the message again.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._pending = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self, user_id: int, amount: int, receiver_name: str, receiver_id: int):
+        """Remember a resolved transfer. Returns: the confirmation token"""
+        token = secrets.token_urlsafe(16)
+        pending = {
+            "user_id": user_id,
+            "amount": amount,
+            "receiver_name": receiver_name,
+            "receiver_id": receiver_id,
+        }
+        with self._lock:
+            self._pending[token] = (time.monotonic() + self.ttl, pending)
+            while len(self._pending) > self.max_size:
+                self._pending.popitem(last=False)
+                self.evictions += 1
+            self.created += 1
+        return token
+
+    def get(self, token: str, user_id: int):
+        """The pending transfer for token if it belongs to user_id and has not expired"""
+        with self._lock:
+            entry = self._pending.get(token)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._pending[token]
+                self.expirations += 1
+                entry = None
+            if entry is None or entry[1]["user_id"] != user_id:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(entry[1])
+
+    def discard(self, token: str):
+        with self._lock:
+            self._pending.pop(token, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._pending),
+                "max_size": self.max_size,
+                "created": self.created,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+pending_transfers = PendingTransferStore(
+    max_size=int(os.getenv("PENDING_TRANSFER_MAX", "10000")),
+    ttl=float(os.getenv("PENDING_TRANSFER_TTL", "300")),
+)
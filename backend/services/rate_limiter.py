@@ -0,0 +1,74 @@
+# backend/services/rate_limiter.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import RATE_LIMITED
+
+
+class RateLimiter:
+    """
+    Token bucket per user: burst requests at once, refilled at rate per
+    second. Buckets of the least recently seen users are evicted past
+    max_users; a user coming back after eviction starts with a full bucket,
+    which is what an idle user would have had anyway. rate 0 disables it.
+    """
+
+    def __init__(self, endpoint: str, rate: float = 5, burst: int = 10, max_users: int = 100000):
+        self.endpoint = endpoint
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def acquire(self, user_id: int):
+        """Take a token for user_id. Returns: 0 if allowed, else the seconds until one is available"""
+        if self.rate <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                self._buckets.move_to_end(user_id)
+            if tokens < 1:
+                self._buckets[user_id] = (tokens, now)
+                self.rejected += 1
+                wait = (1 - tokens) / self.rate
+            else:
+                self._buckets[user_id] = (tokens - 1, now)
+                self.allowed += 1
+                wait = 0
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        if wait:
+            RATE_LIMITED.inc(self.endpoint)
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._buckets),
+                "max_users": self.max_users,
+                "rate": self.rate,
+                "burst": self.burst,
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+                "evictions": self.evictions,
+            }
+
+
+assistant_limiter = RateLimiter(
+    "assistant",
+    rate=float(os.getenv("ASSISTANT_RATE_LIMIT", "5")),
+    burst=int(os.getenv("ASSISTANT_RATE_BURST", "10")),
+    max_users=int(os.getenv("ASSISTANT_RATE_USERS", "100000")),
+)
@@ -0,0 +1,97 @@
+# backend/services/render_cache.py
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import RENDER_CACHE
+
+_MISSING = object()
+
+
+class RenderCache:
+    """
+    Rendered replies per account, valid for one storage version
+    (StorageBackend.get_version). A write moves the version on, so
+    transfers invalidate without touching the cache and writes made by
+    other processes are noticed too; the stale entry is dropped on the next
+    lookup. Values are shared between requests and must not be mutated.
+    The least recently used accounts are evicted past max_accounts; 0
+    disables caching. An account keeps at most max_values values, oldest
+    dropped first, however many distinct keys its readers ask for.
+    """
+
+    def __init__(self, max_accounts: int = 10000, max_values: int = 64):
+        self.max_accounts = max_accounts
+        self.max_values = max_values
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get_or_render(self, user_id: int, version, key: tuple, render):
+        """
+        The value cached under key for this account version, or render() it.
+        key[0] names the kind of value for metrics. None is never cached.
+        """
+        if self.max_accounts <= 0:
+            return render()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] != version:
+                del self._entries[user_id]
+                self.invalidations += 1
+                entry = None
+            value = entry[1].get(key, _MISSING) if entry is not None else _MISSING
+            if value is not _MISSING:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+        if value is not _MISSING:
+            RENDER_CACHE.inc(key[0], "hit")
+            return value
+
+        value = render()
+        RENDER_CACHE.inc(key[0], "miss")
+        with self._lock:
+            self.misses += 1
+            if value is None:
+                return value
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                # Rendered from data at least as new as version: newer
+                # versions miss this entry and replace it
+                entry = self._entries[user_id] = (version, {})
+            values = entry[1]
+            values[key] = value
+            while len(values) > self.max_values:
+                del values[next(iter(values))]
+                self.evictions += 1
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_accounts:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "accounts": len(self._entries),
+                "max_accounts": self.max_accounts,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+render_cache = RenderCache(
+    max_accounts=int(os.getenv("RENDER_CACHE_ACCOUNTS", "10000")),
+    max_values=int(os.getenv("RENDER_CACHE_VALUES", "64")),
+)
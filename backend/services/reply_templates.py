@@ -0,0 +1,59 @@
+# backend/services/reply_templates.py
+DEFAULT_LOCALE = "en-IN"
+
+# Sentence frames and money format per locale. Transaction descriptions
+# are ledger data and are spoken as stored.
+REPLY_TEMPLATES = {
+    "en-IN": {
+        "money": "₹{amount}",
+        "balance": "Your current account balance is {money}",
+        "no_transactions": "No transactions found.",
+        "history": "Your recent transactions: {items}",
+        "history_more": "Your recent transactions: {items} (and {more} more)",
+    },
+    "en-US": {
+        "money": "INR {amount:,}",
+        "balance": "Your current account balance is {money}",
+        "no_transactions": "No transactions found.",
+        "history": "Your recent transactions: {items}",
+        "history_more": "Your recent transactions: {items} (and {more} more)",
+    },
+    "hi-IN": {
+        "money": "₹{amount}",
+        "balance": "आपके खाते में {money} शेष हैं",
+        "no_transactions": "कोई लेनदेन नहीं मिला।",
+        "history": "आपके हाल के लेनदेन: {items}",
+        "history_more": "आपके हाल के लेनदेन: {items} (और {more} अन्य)",
+    },
+}
+
+# Replies read out at most this many transactions
+SPOKEN_TRANSACTIONS = 5
+
+
+def resolve_locale(locale: str = None):
+    """The templates key a requested locale renders with; unknown locales get the default"""
+    return locale if locale in REPLY_TEMPLATES else DEFAULT_LOCALE
+
+
+def get_templates(locale: str = None):
+    """Templates for a locale such as "hi-IN"; unknown locales get the default"""
+    return REPLY_TEMPLATES[resolve_locale(locale)]
+
+
+def render_balance(balance: int, locale: str = None):
+    templates = get_templates(locale)
+    return templates["balance"].format(money=templates["money"].format(amount=balance))
+
+
+def render_history(descriptions: list, locale: str = None):
+    """Spoken list of transaction descriptions, oldest first"""
+    templates = get_templates(locale)
+    if not descriptions:
+        return templates["no_transactions"]
+    if len(descriptions) == 1:
+        return descriptions[0]
+    items = ". ".join(descriptions[:SPOKEN_TRANSACTIONS])
+    if len(descriptions) <= SPOKEN_TRANSACTIONS:
+        return templates["history"].format(items=items)
+    return templates["history_more"].format(items=items, more=len(descriptions) - SPOKEN_TRANSACTIONS)
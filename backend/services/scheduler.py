@@ -0,0 +1,111 @@
+# backend/services/scheduler.py
+import heapq
+import itertools
+import logging
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger("banking-assistant")
+
+SCHEDULED, RUNNING, DONE, FAILED, CANCELLED = "scheduled", "running", "done", "failed", "cancelled"
+
+
+class Scheduler:
+    """
+    Runs jobs at a given local time on one background thread, started on
+    first use. Jobs live in this process only: anything still scheduled
+    is lost on restart. The newest max_finished finished jobs are kept so
+    their outcome can be looked up.
+    """
+
+    def __init__(self, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._queue = []
+        self._jobs = OrderedDict()
+        self._order = itertools.count()
+        self._wakeup = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule(self, run_at: datetime, fn, *args, owner=None):
+        """Run fn(*args) at run_at. Returns: the job id"""
+        job_id = secrets.token_hex(8)
+        with self._wakeup:
+            self._jobs[job_id] = {
+                "id": job_id, "owner": owner, "run_at": run_at.isoformat(timespec="seconds"),
+                "state": SCHEDULED, "result": None, "error": None,
+            }
+            heapq.heappush(self._queue, (run_at, next(self._order), job_id, fn, args))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+        return job_id
+
+    def cancel(self, job_id: str, owner=None):
+        """Cancel a job that has not started. Returns: True if it was cancelled"""
+        with self._wakeup:
+            job = self._jobs.get(job_id)
+            if job is None or job["owner"] != owner or job["state"] != SCHEDULED:
+                return False
+            job["state"] = CANCELLED
+            self._trim()
+            return True
+
+    def status(self, job_id: str, owner=None):
+        """A copy of the job record, or None if unknown or owned by someone else"""
+        with self._wakeup:
+            job = self._jobs.get(job_id)
+            if job is None or job["owner"] != owner:
+                return None
+            return {key: value for key, value in job.items() if key != "owner"}
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._stopped:
+                    if self._queue:
+                        delay = (self._queue[0][0] - datetime.now()).total_seconds()
+                        if delay <= 0:
+                            break
+                        self._wakeup.wait(delay)
+                    else:
+                        self._wakeup.wait()
+                if self._stopped:
+                    return
+                _, _, job_id, fn, args = heapq.heappop(self._queue)
+                job = self._jobs.get(job_id)
+                if job is None or job["state"] != SCHEDULED:
+                    continue
+                job["state"] = RUNNING
+
+            try:
+                result, state, error = fn(*args), DONE, None
+            except Exception as e:
+                logger.warning("Scheduled job %s failed: %s", job_id, e)
+                result, state, error = None, FAILED, str(e)
+            with self._wakeup:
+                job.update(state=state, result=result, error=error)
+                self._trim()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["state"] in (DONE, FAILED, CANCELLED)]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._wakeup:
+            states = {}
+            for job in self._jobs.values():
+                states[job["state"]] = states.get(job["state"], 0) + 1
+            return {"jobs": states}
+
+    def shutdown(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+
+
+scheduler = Scheduler()
@@ -0,0 +1,63 @@
+# backend/services/single_flight.py
+import asyncio
+import os
+
+from metrics import COALESCED
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: while a call for a key runs, later
+    calls with the same key wait for it and get its result (or exception)
+    instead of running again. Only calls in flight are tracked, at most
+    max_keys of them; past that, calls run uncoalesced, and 0 disables
+    coalescing. The shared call runs
+    as its own task, so a caller that disconnects does not cancel it for the
+    others. Event loop only; results are shared and must not be mutated.
+    """
+
+    def __init__(self, endpoint: str, max_keys: int = 10000):
+        self.endpoint = endpoint
+        self.max_keys = max_keys
+        self._calls = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.overflows = 0
+
+    async def do(self, key, fn):
+        """Await fn(), or the result of the call already running under key"""
+        if self.max_keys <= 0:
+            return await fn()
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            COALESCED.inc(self.endpoint)
+            return await asyncio.shield(task)
+        if len(self._calls) >= self.max_keys:
+            self.overflows += 1
+            return await fn()
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        self.calls += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Retrieved here so an exception no caller waited for is not reported as lost
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            "max_keys": self.max_keys,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "overflows": self.overflows,
+        }
+
+
+assistant_requests = SingleFlight("assistant", max_keys=int(os.getenv("ASSISTANT_COALESCE_KEYS", "10000")))
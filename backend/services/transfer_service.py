@@ -1,12 +1,25 @@
-from database import db
 from datetime import datetime
 
-def send_money(user_id: int, amount: int, receiver_name: str, password: str = None):
+from database import get_storage
+from services.credentials import CredentialsBusy, get_credentials
+from services.idempotency import IdempotencyConflict, IdempotencyInProgress, transfer_requests
+from services.scheduler import scheduler
+
+MAX_BATCH_TRANSFERS = 10000
+# Words heard after a receiver's name that are never part of it ("to jane right now")
+FILLER_WORDS = frozenset({"right", "now", "please", "today", "immediately", "quickly", "asap", "away", "then"})
+
+def send_money(user_id: int, amount: int, receiver_name: str, password: str = None, receiver_id: int = None,
+               idempotency_key: str = None):
     """
     Send money from one user to another with optional password verification
+    Pass receiver_id when the receiver was already resolved to skip the lookup
+    Pass idempotency_key to make retries safe: a repeat with the same key gets
+    the first outcome back (marked "replayed") instead of a second transfer
     Returns: dict with message, success status, and page navigation
     """
-    sender = db.get(user_id)
+    storage = get_storage()
+    sender = storage.get_account(user_id)
     if not sender:
         return {
             "message": "Sender not found.",
@@ -25,16 +38,69 @@ def send_money(user_id: int, amount: int, receiver_name: str, password: str = No
             "page": None
         }
 
-    # Verify password
-    if sender.get("password") != password:
+    failure = _check_password(user_id, password)
+    if failure:
+        return failure
+
+    fingerprint = (amount, receiver_name.strip().lower())
+    return _run_once(user_id, idempotency_key, fingerprint,
+                     lambda: _execute_transfer(storage, user_id, sender, amount, receiver_name, receiver_id))
+
+def _check_password(user_id: int, password: str):
+    """Verify a password (scrypt on the bounded KDF executor). Returns: None, or the failure response"""
+    try:
+        verified = get_credentials().verify(user_id, password)
+    except CredentialsBusy:
+        return {
+            "message": "We're confirming a lot of payments right now. Please try again in a moment.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if not verified:
         return {
             "message": "Incorrect password. Transaction cancelled.",
             "success": False,
             "require_password": False,
             "page": None
         }
+    return None
 
-    # Check balance
+def _run_once(user_id: int, idempotency_key: str, fingerprint, execute):
+    """Run execute() once per idempotency key, replaying the stored outcome for retries"""
+    if not idempotency_key:
+        return execute()
+
+    try:
+        claim, replay = transfer_requests.claim((user_id, idempotency_key), fingerprint)
+    except IdempotencyConflict:
+        return {
+            "message": "This request ID was already used for a different transfer.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    except IdempotencyInProgress:
+        return {
+            "message": "This transfer is still being processed. Please check your transactions shortly.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if claim is None:
+        return {**replay, "replayed": True}
+
+    try:
+        result = execute()
+    except BaseException:
+        transfer_requests.release(claim)
+        raise
+    transfer_requests.complete(claim, result)
+    return result
+
+def _execute_transfer(storage, user_id: int, sender: dict, amount: int, receiver_name: str, receiver_id: int = None):
+    """Balance check, receiver lookup and the transfer itself for a verified sender"""
+    # Check balance (re-checked atomically by the transfer engine)
     if sender["balance"] < amount:
         return {
             "message": f"Insufficient balance. You have ₹{sender['balance']} but trying to send ₹{amount}.",
@@ -43,14 +109,10 @@ def send_money(user_id: int, amount: int, receiver_name: str, password: str = No
             "page": None
         }
 
-    # Find receiver by name (case-insensitive)
-    receiver_id = None
-    receiver = None
-    for r_id, r_data in db.items():
-        if r_data["name"].lower() == receiver_name.lower():
-            receiver_id = r_id
-            receiver = r_data
-            break
+    # Find receiver by contact alias or name (case-insensitive)
+    if receiver_id is None:
+        receiver_id = resolve_receiver(receiver_name, user_id)
+    receiver = storage.get_account(receiver_id) if receiver_id is not None else None
     
     if not receiver:
         return {
@@ -60,44 +122,193 @@ def send_money(user_id: int, amount: int, receiver_name: str, password: str = No
             "page": None
         }
 
-    # Perform transaction
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    sender["balance"] -= amount
-    sender["transactions"].append({
-        "type": "debit",
-        "amount": amount,
-        "description": f"Sent ₹{amount} to {receiver['name']}",
-        "timestamp": timestamp,
-        "balance_after": sender["balance"]
-    })
-    
-    receiver["balance"] += amount
-    receiver["transactions"].append({
-        "type": "credit",
-        "amount": amount,
-        "description": f"Received ₹{amount} from {sender['name']}",
-        "timestamp": timestamp,
-        "balance_after": receiver["balance"]
-    })
+    # Perform transaction under the sender and receiver locks
+    outcome = storage.transfer(user_id, receiver_id, amount)
+    if outcome["reason"] == "account_not_found":
+        return {
+            "message": f"Recipient '{receiver_name}' not found in your contacts.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if outcome["reason"] == "shard_unavailable":
+        return {
+            "message": "The recipient's account can't be reached right now. No money was sent; please try again.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if not outcome["success"]:
+        return {
+            "message": f"Insufficient balance. You have ₹{outcome['balance']} but trying to send ₹{amount}.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
 
     return {
-        "message": f"Successfully transferred ₹{amount} to {receiver['name']}. Your new balance is ₹{sender['balance']}.",
+        "message": f"Successfully transferred ₹{amount} to {receiver['name']}. Your new balance is ₹{outcome['balance']}.",
         "success": True,
         "require_password": False,
         "page": "transfer",
-        "balance": sender["balance"]
+        "balance": outcome["balance"]
     }
 
-def verify_receiver_exists(receiver_name: str):
+def send_batch(user_id: int, payments: list, password: str, run_at: datetime = None,
+               idempotency_key: str = None):
+    """
+    Pay many receivers from one account as a single all-or-nothing batch
+    payments: list of (receiver, amount); a receiver is an account id or a name/contact alias
+    Every receiver is resolved and the password checked up front; with run_at
+    in the future the batch is scheduled in this process and runs then
+    Returns: dict with message, success, count, total and balance, or job_id when scheduled
+    """
+    storage = get_storage()
+    if not storage.account_exists(user_id):
+        return {"message": "Sender not found.", "success": False, "require_password": False, "page": None}
+    if not payments or len(payments) > MAX_BATCH_TRANSFERS:
+        return {
+            "message": f"A batch needs between 1 and {MAX_BATCH_TRANSFERS} payments.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if any(not isinstance(amount, int) or amount <= 0 for _, amount in payments):
+        return {
+            "message": "Every payment amount must be a positive whole number.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+
+    failure = _check_password(user_id, password)
+    if failure:
+        return failure
+
+    legs, unresolved, resolved = [], [], {}
+    for receiver, amount in payments:
+        # Payroll lists repeat receivers; look each one up once
+        if receiver not in resolved:
+            resolved[receiver] = _resolve_leg(storage, receiver, user_id)
+        receiver_id = resolved[receiver]
+        if receiver_id is None or receiver_id == user_id:
+            unresolved.append(receiver)
+        else:
+            legs.append((receiver_id, amount))
+    if unresolved:
+        shown = ", ".join(str(receiver) for receiver in unresolved[:5])
+        return {
+            "message": f"{len(unresolved)} recipients not found ({shown}). No payments were made.",
+            "success": False,
+            "require_password": False,
+            "page": None,
+            "unresolved": unresolved
+        }
+
+    def execute():
+        if run_at is None or run_at <= datetime.now():
+            return _execute_batch(storage, user_id, legs)
+        job_id = scheduler.schedule(run_at, _execute_batch, storage, user_id, legs, owner=user_id)
+        return {
+            "message": f"Scheduled {len(legs)} payments totalling ₹{sum(a for _, a in legs)} for {run_at:%Y-%m-%d %H:%M}.",
+            "success": True,
+            "require_password": False,
+            "page": "transfer",
+            "scheduled": True,
+            "job_id": job_id,
+            "count": len(legs),
+            "total": sum(amount for _, amount in legs)
+        }
+
+    # Retrying a scheduling request replays its job id instead of scheduling twice
+    return _run_once(user_id, idempotency_key, ("batch", run_at, tuple(legs)), execute)
+
+def _resolve_leg(storage, receiver, sender_id: int):
+    if isinstance(receiver, int):
+        return receiver if storage.account_exists(receiver) else None
+    return storage.resolve_receiver(receiver, sender_id)
+
+def _execute_batch(storage, user_id: int, legs: list):
+    """Apply a validated batch under one set of account locks"""
+    total = sum(amount for _, amount in legs)
+    outcome = storage.transfer_batch(user_id, legs)
+    if outcome["reason"] in ("account_not_found", "invalid_receiver"):
+        return {
+            "message": "A recipient is no longer valid. No payments were made.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if outcome["reason"] == "shard_unavailable":
+        return {
+            "message": "Some recipients' accounts can't be reached right now. No payments were made.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    if not outcome["success"]:
+        return {
+            "message": f"Insufficient balance. You have ₹{outcome['balance']} but the batch totals ₹{total}. "
+                       "No payments were made.",
+            "success": False,
+            "require_password": False,
+            "page": None
+        }
+    return {
+        "message": f"Paid {len(legs)} recipients a total of ₹{total}. Your new balance is ₹{outcome['balance']}.",
+        "success": True,
+        "require_password": False,
+        "page": "transfer",
+        "count": len(legs),
+        "total": total,
+        "balance": outcome["balance"]
+    }
+
+def resolve_receiver(receiver_name: str, sender_id: int = None):
+    """Resolve a receiver name or the sender's contact alias to an account id"""
+    return get_storage().resolve_receiver(receiver_name, sender_id)
+
+def find_receiver(receiver_name: str, sender_id: int = None):
+    """
+    Resolve a spoken receiver: an exact contact alias or account name first,
+    then the sender's closest contacts and account names by prefix or typo.
+    Trailing filler words are dropped. When the full name matches nothing,
+    the accounts matching its first word are offered, never paid unasked
+    ("jane doe" must not silently become Jane Smith)
+    Returns: dict with receiver_id and name (None unless one account matched)
+    and matches, the {"id", "name"} candidates to ask about
+    """
+    storage = get_storage()
+    words = receiver_name.split()
+    while len(words) > 1 and words[-1].lower() in FILLER_WORDS:
+        words.pop()
+    found = _lookup(storage, " ".join(words), sender_id)
+    if found["receiver_id"] is None and not found["matches"] and len(words) > 1:
+        first = _lookup(storage, words[0], sender_id)
+        if first["receiver_id"] is not None:
+            return {"receiver_id": None, "name": None,
+                    "matches": [{"id": first["receiver_id"], "name": first["name"]}]}
+        return first
+    return found
+
+def _lookup(storage, spoken: str, sender_id: int = None):
+    receiver_id = storage.resolve_receiver(spoken, sender_id)
+    if receiver_id is not None:
+        account = storage.get_account(receiver_id)
+        return {"receiver_id": receiver_id, "name": account["name"] if account else spoken, "matches": []}
+    matches = [
+        {"id": user_id, "name": name}
+        for user_id, name in storage.match_receivers(spoken, sender_id)
+        if user_id != sender_id
+    ]
+    if len(matches) == 1:
+        return {"receiver_id": matches[0]["id"], "name": matches[0]["name"], "matches": matches}
+    return {"receiver_id": None, "name": None, "matches": matches}
+
+def verify_receiver_exists(receiver_name: str, sender_id: int = None):
     """Check if a receiver exists in the database"""
-    for user_data in db.values():
-        if user_data["name"].lower() == receiver_name.lower():
-            return True
-    return False
+    return resolve_receiver(receiver_name, sender_id) is not None
 
 def get_user_contacts(user_id: int):
     """Get all contacts for a user"""
-    if user_id not in db:
-        return None
-    return db[user_id].get("contacts", {})
+    return get_storage().get_contacts(user_id)
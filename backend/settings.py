@@ -0,0 +1,20 @@
+# backend/settings.py
+import threading
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
+
+def load_env():
+    """
+    Read backend/.env into os.environ once, on first use. Variables already
+    set in the environment win. Every lazily built component calls this
+    before reading its configuration.
+    """
+    global _env_loaded
+    if not _env_loaded:
+        with _env_lock:
+            if not _env_loaded:
+                from dotenv import load_dotenv
+                load_dotenv()
+                _env_loaded = True
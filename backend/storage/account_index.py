@@ -0,0 +1,110 @@
+import threading
+
+from storage.name_matcher import NameMatcher, rank_contacts
+
+
+def normalize_name(name: str):
+    """Normalize a name or alias for lookups"""
+    return " ".join(name.split()).lower()
+
+
+class AccountIndex:
+    """
+    Maintained lookup tables from normalized account name and from
+    per-user contact alias to account id, plus a fuzzy name matcher for
+    receivers that resolve to nothing as spoken.
+    """
+
+    def __init__(self, accounts: dict, known=None):
+        self.accounts = accounts
+        # Accounts contacts may point at, when not every account is in accounts
+        self.known = known if known is not None else accounts
+        self._by_name = {}
+        self._by_alias = {}
+        self._matcher = NameMatcher()
+        self._lock = threading.Lock()
+        for user_id, user_data in accounts.items():
+            self._index_account(user_id, user_data)
+
+    def _index_account(self, user_id: int, user_data: dict):
+        # First account registered under a name wins, matching the old scan order
+        self._by_name.setdefault(normalize_name(user_data["name"]), []).append(user_id)
+        self._matcher.add(user_id, user_data["name"])
+        self._by_alias[user_id] = {
+            normalize_name(alias): target_id
+            for alias, target_id in user_data.get("contacts", {}).items()
+        }
+
+    def add_account(self, user_id: int, user_data: dict):
+        """Insert a new account and index its name and contacts"""
+        with self._lock:
+            if user_id in self.accounts:
+                raise ValueError(f"Account {user_id} already exists")
+            user_data.setdefault("contacts", {})
+            self.accounts[user_id] = user_data
+            self._index_account(user_id, user_data)
+
+    def rename_account(self, user_id: int, new_name: str):
+        """Rename an account and move its name entry"""
+        with self._lock:
+            user_data = self.accounts[user_id]
+            old_key = normalize_name(user_data["name"])
+            user_data["name"] = new_name
+            holders = self._by_name.get(old_key, [])
+            if user_id in holders:
+                holders.remove(user_id)
+            if not holders:
+                self._by_name.pop(old_key, None)
+            self._by_name.setdefault(normalize_name(new_name), []).append(user_id)
+            self._matcher.add(user_id, new_name)
+
+    def set_contact(self, user_id: int, alias: str, target_id: int):
+        """Add or update a contact alias for a user"""
+        with self._lock:
+            if target_id not in self.known:
+                raise KeyError(target_id)
+            self.accounts[user_id].setdefault("contacts", {})[alias] = target_id
+            self._by_alias.setdefault(user_id, {})[normalize_name(alias)] = target_id
+
+    def remove_contact(self, user_id: int, alias: str):
+        """Remove a contact alias for a user"""
+        with self._lock:
+            self.accounts[user_id].get("contacts", {}).pop(alias, None)
+            self._by_alias.get(user_id, {}).pop(normalize_name(alias), None)
+
+    def resolve(self, receiver_name: str, sender_id: int = None):
+        """
+        Resolve a receiver to an account id.
+        The sender's contact aliases take priority over account names.
+        """
+        if sender_id is not None:
+            receiver_id = self.resolve_alias(receiver_name, sender_id)
+            if receiver_id is not None:
+                return receiver_id
+        holders = self._by_name.get(normalize_name(receiver_name))
+        return holders[0] if holders else None
+
+    def resolve_alias(self, alias: str, sender_id: int):
+        """The account a contact alias of the sender points at, or None"""
+        return self._by_alias.get(sender_id, {}).get(normalize_name(alias))
+
+    def match_contacts(self, receiver_name: str, sender_id: int):
+        """The sender's contacts closest to a receiver. Returns: ids of the best scoring contacts"""
+        contacts = []
+        for alias, target_id in list(self._by_alias.get(sender_id, {}).items()):
+            target = self.known.get(target_id)
+            contacts.append((alias, target_id, target["name"] if target is not None else None))
+        return rank_contacts(receiver_name, contacts)
+
+    def match(self, receiver_name: str, sender_id: int = None, limit: int = 5):
+        """
+        Accounts closest to a receiver that did not resolve exactly: the
+        sender's contacts first, then every account name. More than one id
+        means the receiver is ambiguous. Returns: up to limit ids, best first
+        """
+        if sender_id is not None:
+            ranked = self.match_contacts(receiver_name, sender_id)
+            if ranked:
+                return ranked[:limit]
+        with self._lock:
+            return self._matcher.match(receiver_name, limit)
@@ -0,0 +1,114 @@
+class StorageBackend:
+    """
+    Interface the balance, history and transfer services use to read and
+    mutate account state. Implementations must make transfer() atomic.
+    """
+
+    def account_exists(self, user_id: int):
+        raise NotImplementedError
+
+    def get_account(self, user_id: int):
+        """Return {"name", "email", "balance"} for an account, or None"""
+        raise NotImplementedError
+
+    def get_balance(self, user_id: int):
+        raise NotImplementedError
+
+    def get_version(self, user_id: int):
+        """
+        Return a value that changes whenever the account's balance or rendered
+        history may have changed, for caches keyed on it; cheap to read
+        """
+        raise NotImplementedError
+
+    def get_password(self, user_id: int):
+        """Return the stored credential (a password hash, or plaintext from old seeds)"""
+        raise NotImplementedError
+
+    def set_password(self, user_id: int, credential: str, expected: str = None):
+        """
+        Store a new credential. With expected, only replace it if the stored
+        one still equals expected. Returns: True if it was stored
+        """
+        raise NotImplementedError
+
+    def get_contacts(self, user_id: int):
+        """Return the {alias: account id} contacts of a user, or None"""
+        raise NotImplementedError
+
+    def resolve_receiver(self, receiver_name: str, sender_id: int = None):
+        """Resolve a contact alias of the sender or an account name to an id"""
+        raise NotImplementedError
+
+    def match_receivers(self, receiver_name: str, sender_id: int = None, limit: int = 5):
+        """
+        Accounts closest to a receiver that does not resolve exactly, by word
+        prefix or typo: the sender's contacts first, then every account name.
+        Returns: up to limit (id, name) pairs of the best match, several when ambiguous
+        """
+        raise NotImplementedError
+
+    def get_transactions(self, user_id: int, count: int = None):
+        """Return the transactions of a user, oldest first, or None"""
+        raise NotImplementedError
+
+    def get_transaction_page(self, user_id: int, limit: int, before: int = None,
+                             since: str = None, until: str = None, txn_type: str = None):
+        """
+        Return one page of transactions, or None for an unknown user:
+        {"transactions": rows oldest first, "next_before": key or None}.
+        Rows are the newest ones with a key below before, a timestamp in the
+        inclusive [since, until] range and the given type ("credit"/"debit").
+        """
+        raise NotImplementedError
+
+    def get_balance_at(self, user_id: int, at: str):
+        """
+        Return {"balance", "as_of"} for a user as of the timestamp at, or
+        None for an unknown user. as_of is the timestamp of the last
+        transaction at or before at, or None if there was none yet.
+        """
+        raise NotImplementedError
+
+    def get_totals(self, user_id: int, since: str = None, until: str = None):
+        """
+        Return {"credit", "debit"} totals of the transactions with a
+        timestamp in the inclusive [since, until] range, or None for an
+        unknown user.
+        """
+        raise NotImplementedError
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        """
+        Atomically move amount between two accounts.
+        Returns: dict with success, reason ("insufficient_balance",
+        "account_not_found", "shard_unavailable" or None) and the sender balance
+        """
+        raise NotImplementedError
+
+    def transfer_batch(self, sender_id: int, legs: list):
+        """
+        Atomically pay every (receiver_id, amount) leg from one account:
+        either all legs are applied or none. The total is checked against the
+        balance once.
+        Returns: dict with success, reason ("insufficient_balance",
+        "account_not_found", "invalid_receiver", "shard_unavailable" or None)
+        and the sender balance
+        """
+        raise NotImplementedError
+
+    def add_account(self, user_id: int, record: dict):
+        raise NotImplementedError
+
+    def rename_account(self, user_id: int, new_name: str):
+        raise NotImplementedError
+
+    def set_contact(self, user_id: int, alias: str, target_id: int):
+        raise NotImplementedError
+
+    def stats(self):
+        """Backend-specific counters for /health"""
+        return {}
+
+    def close(self):
+        pass
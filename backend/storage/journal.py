@@ -0,0 +1,199 @@
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+
+# Segment files are journal-<n>.log; a snapshot-<n>.snap covers every
+# segment before n
+SEGMENT_RE = re.compile(r"^journal-(\d{8})\.log$")
+
+# Each record is framed as (payload length, crc32 of payload) + payload
+FRAME = struct.Struct("<II")
+# Record types: ledger rows appended by one operation, a JSON account change,
+# or rows together with a JSON note that must be recovered with them
+ROWS = 0
+META = 1
+NOTED = 2
+# account id, row position, kind, amount, counterparty, balance after, timestamp
+ROW = struct.Struct("<qqbqqqq")
+NOTE_LENGTH = struct.Struct("<I")
+
+
+def segment_path(directory: str, segment: int):
+    return os.path.join(directory, f"journal-{segment:08d}.log")
+
+
+def list_segments(directory: str):
+    """Segment numbers in the directory, oldest first"""
+    found = (SEGMENT_RE.match(name) for name in os.listdir(directory))
+    return sorted(int(match.group(1)) for match in found if match)
+
+
+def encode_rows(rows: list):
+    return bytes((ROWS,)) + b"".join(ROW.pack(*row) for row in rows)
+
+
+def encode_noted_rows(rows: list, note: dict):
+    note = json.dumps(note, ensure_ascii=False).encode()
+    return bytes((NOTED,)) + NOTE_LENGTH.pack(len(note)) + note + b"".join(ROW.pack(*row) for row in rows)
+
+
+def encode_meta(change: dict):
+    return bytes((META,)) + json.dumps(change, ensure_ascii=False).encode()
+
+
+def decode(payload: bytes):
+    """Returns: (ROWS, list of row tuples), (META, dict) or (NOTED, (list of row tuples, dict))"""
+    if payload[0] == ROWS:
+        return ROWS, list(ROW.iter_unpack(payload[1:]))
+    if payload[0] == NOTED:
+        (length,) = NOTE_LENGTH.unpack_from(payload, 1)
+        start = 1 + NOTE_LENGTH.size
+        return NOTED, (list(ROW.iter_unpack(payload[start + length:])), json.loads(payload[start:start + length].decode()))
+    return META, json.loads(payload[1:].decode())
+
+
+def read_segment(path: str):
+    """
+    Yield the payloads of a segment in order. Stops at the first torn or
+    corrupt frame: the tail of a write that never reached the disk.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        start = offset + FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield payload
+        offset = start + length
+
+
+class Journal:
+    """
+    Append-only journal with group commit. append() only queues a record;
+    one writer thread writes everything queued since its last write and
+    fsyncs once for the lot, and wait() blocks until a record is on disk.
+    Under load many records share one fsync instead of each paying for its own.
+    """
+
+    def __init__(self, directory: str, segment: int, fsync: bool = True):
+        self.directory = directory
+        self.segment = segment
+        self.fsync = fsync
+        self._file = open(segment_path(directory, segment), "ab")
+        self._queue = []
+        self._appended = 0
+        self._durable = 0
+        self._error = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._synced = threading.Condition(self._lock)
+        self.records = 0
+        self.syncs = 0
+        self.bytes = 0
+        self._writer = threading.Thread(target=self._run, name="journal", daemon=True)
+        self._writer.start()
+
+    def append(self, payload: bytes):
+        """Queue a record. Returns: its sequence number, for wait()"""
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Journal is closed")
+            self._queue.append(frame)
+            self._appended += 1
+            self._work.notify()
+            return self._appended
+
+    def wait(self, sequence: int):
+        """Block until the record with this sequence number is durable"""
+        with self._lock:
+            while self._durable < sequence:
+                if self._error is not None:
+                    raise RuntimeError("Journal write failed") from self._error
+                self._synced.wait()
+
+    def rotate(self):
+        """
+        Start a new segment. Records appended before this call go to the old
+        one, and are on disk when it returns. Returns: the new segment number
+        """
+        with self._lock:
+            self.segment += 1
+            segment = self.segment
+            self._queue.append(segment)
+            self._work.notify()
+            sequence = self._appended
+        self.wait(sequence)
+        return segment
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._work.wait()
+                if not self._queue:
+                    return
+                items, self._queue = self._queue, []
+                upto = self._appended
+            try:
+                written = self._write(items)
+            except OSError as e:
+                with self._lock:
+                    self._error = e
+                    self._synced.notify_all()
+                return
+            with self._lock:
+                self._durable = upto
+                records = sum(1 for item in items if not isinstance(item, int))
+                self.records += records
+                self.bytes += written
+                self.syncs += 1 if records else 0
+                self._synced.notify_all()
+
+    def _write(self, items: list):
+        written = 0
+        batch = []
+        for item in items:
+            if isinstance(item, int):
+                # Rotation marker: finish the current segment first
+                written += self._flush(batch)
+                batch = []
+                self._file.close()
+                self._file = open(segment_path(self.directory, item), "ab")
+            else:
+                batch.append(item)
+        return written + self._flush(batch)
+
+    def _flush(self, frames: list):
+        data = b"".join(frames)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return len(data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "segment": self.segment,
+                "records": self.records,
+                "bytes": self.bytes,
+                "syncs": self.syncs,
+                "records_per_sync": round(self.records / self.syncs, 2) if self.syncs else None,
+                "queued": self._appended - self._durable,
+            }
+
+    def close(self):
+        """Write out everything queued and stop the writer"""
+        with self._lock:
+            self._closed = True
+            self._work.notify()
+        self._writer.join()
+        self._file.close()
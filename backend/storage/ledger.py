@@ -0,0 +1,257 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M"
+
+# Row kinds. Each kind fixes the transaction type and the description
+# template; the counterparty column holds an account id for SENT/RECEIVED
+# and a label id for the others.
+SENT = 0
+RECEIVED = 1
+PAID = 2
+RECEIVED_FROM = 3
+NOTE_DEBIT = 4
+NOTE_CREDIT = 5
+
+KIND_TYPES = ("debit", "credit", "debit", "credit", "debit", "credit")
+
+# Columns in the order snapshots store them, then the debit and credit positions
+COLUMNS = ("kind", "amount", "counterparty", "ts", "balance_after", "credit_total", "debit_total")
+
+_SENT_RE = re.compile(r"^Sent ₹(\d+) to (.+)$")
+_RECEIVED_RE = re.compile(r"^Received ₹(\d+) from (.+)$")
+_PAID_RE = re.compile(r"^Paid ₹(\d+) for (.+)$")
+
+
+def to_epoch(timestamp: str):
+    """Convert a "YYYY-MM-DD HH:MM" timestamp to epoch seconds"""
+    return int((datetime.strptime(timestamp, TIMESTAMP_FORMAT) - EPOCH).total_seconds())
+
+
+def from_epoch(seconds: int):
+    """Convert epoch seconds back to a "YYYY-MM-DD HH:MM" timestamp"""
+    return (EPOCH + timedelta(seconds=seconds)).strftime(TIMESTAMP_FORMAT)
+
+
+def now_epoch():
+    return int((datetime.now() - EPOCH).total_seconds())
+
+
+class LabelTable:
+    """Interned strings for non-account counterparties ("Salary", "groceries")"""
+
+    def __init__(self):
+        self._labels = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def intern(self, label: str):
+        label_id = self._ids.get(label)
+        if label_id is None:
+            with self._lock:
+                label_id = self._ids.get(label)
+                if label_id is None:
+                    label_id = len(self._labels)
+                    self._labels.append(label)
+                    self._ids[label] = label_id
+        return label_id
+
+    def __getitem__(self, label_id: int):
+        return self._labels[label_id]
+
+    def values(self):
+        """Every label, in id order"""
+        with self._lock:
+            return list(self._labels)
+
+
+class Ledger:
+    """
+    Append-only transaction ledger for one account, stored as typed columns.
+    Rows are kept in timestamp order and descriptions and timestamps are
+    only rendered to strings when rows are read.
+
+    Every row records the balance after it and running credit and debit
+    totals, so point-in-time balances and range totals are a bisection on
+    the time column plus two array reads.
+    """
+
+    def __init__(self, labels: LabelTable):
+        self.labels = labels
+        self.kind = array("b")
+        self.amount = array("q")
+        self.counterparty = array("q")
+        self.ts = array("q")
+        self.balance_after = array("q")
+        # Running totals through each row (prefix sums)
+        self.credit_total = array("q")
+        self.debit_total = array("q")
+        # Row positions per transaction type, for filtered pages
+        self.positions = {"debit": array("q"), "credit": array("q")}
+        # Published last so readers never see a half-written row
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, kind: int, amount: int, counterparty: int, balance_after: int, ts: int = None):
+        """Append one row; callers must hold the account lock"""
+        if ts is None:
+            ts = now_epoch()
+        if self._size and ts < self.ts[self._size - 1]:
+            # Keep the time column sorted even if the clock steps back
+            ts = self.ts[self._size - 1]
+        credit_total = self.credit_total[self._size - 1] if self._size else 0
+        debit_total = self.debit_total[self._size - 1] if self._size else 0
+        # Even kinds are debits
+        if kind % 2:
+            credit_total += amount
+        else:
+            debit_total += amount
+        self.kind.append(kind)
+        self.amount.append(amount)
+        self.counterparty.append(counterparty)
+        self.ts.append(ts)
+        self.balance_after.append(balance_after)
+        self.credit_total.append(credit_total)
+        self.debit_total.append(debit_total)
+        self.positions[KIND_TYPES[kind]].append(self._size)
+        self._size += 1
+
+    def append_record(self, record: dict, account_of):
+        """
+        Append a row in the database.db dict shape.
+        account_of maps a name to (account id, account name) or None and is
+        used to recognise transfers between accounts in the description.
+        """
+        amount = record["amount"]
+        description = record["description"]
+        is_debit = record["type"] == "debit"
+        kind, counterparty = None, None
+
+        match = (_SENT_RE if is_debit else _RECEIVED_RE).match(description)
+        if match and int(match.group(1)) == amount:
+            account = account_of(match.group(2))
+            if account is not None and account[1] == match.group(2):
+                kind, counterparty = (SENT if is_debit else RECEIVED), account[0]
+            elif not is_debit:
+                kind, counterparty = RECEIVED_FROM, self.labels.intern(match.group(2))
+        if kind is None and is_debit:
+            match = _PAID_RE.match(description)
+            if match and int(match.group(1)) == amount:
+                kind, counterparty = PAID, self.labels.intern(match.group(2))
+        if kind is None:
+            kind = NOTE_DEBIT if is_debit else NOTE_CREDIT
+            counterparty = self.labels.intern(description)
+
+        self.append(kind, amount, counterparty, record["balance_after"], to_epoch(record["timestamp"]))
+
+    def describe(self, i: int, name_of):
+        kind = self.kind[i]
+        amount = self.amount[i]
+        counterparty = self.counterparty[i]
+        if kind == SENT:
+            return f"Sent ₹{amount} to {name_of(counterparty)}"
+        if kind == RECEIVED:
+            return f"Received ₹{amount} from {name_of(counterparty)}"
+        if kind == PAID:
+            return f"Paid ₹{amount} for {self.labels[counterparty]}"
+        if kind == RECEIVED_FROM:
+            return f"Received ₹{amount} from {self.labels[counterparty]}"
+        return self.labels[counterparty]
+
+    def row(self, i: int, name_of):
+        """Render row i in the database.db dict shape"""
+        return {
+            "type": KIND_TYPES[self.kind[i]],
+            "amount": self.amount[i],
+            "description": self.describe(i, name_of),
+            "timestamp": from_epoch(self.ts[i]),
+            "balance_after": self.balance_after[i],
+        }
+
+    def rows(self, start: int, stop: int, name_of):
+        return [self.row(i, name_of) for i in range(start, stop)]
+
+    def page(self, limit: int, before: int = None, since: int = None, until: int = None, txn_type: str = None):
+        """
+        Find the newest rows older than position before, within the
+        inclusive epoch range [since, until] and of the given type.
+        Costs O(log n + limit) via bisection on the sorted time column.
+        Returns: (row positions oldest first, position to continue before or None)
+        """
+        size = self._size
+        start = bisect_left(self.ts, since, 0, size) if since is not None else 0
+        stop = bisect_right(self.ts, until, 0, size) if until is not None else size
+        if before is not None:
+            stop = min(stop, before)
+        if stop <= start:
+            return [], None
+
+        if txn_type is None:
+            first = max(start, stop - limit)
+            return list(range(first, stop)), (first if first > start else None)
+
+        positions = self.positions[txn_type]
+        count = len(positions)
+        lo = bisect_left(positions, start, 0, count)
+        hi = bisect_left(positions, stop, 0, count)
+        first = max(lo, hi - limit)
+        return list(positions[first:hi]), (positions[first] if first > lo else None)
+
+    def balance_at(self, ts: int):
+        """
+        Balance as of epoch second ts, in O(log n).
+        Returns: (balance, position of the last row at or before ts) or
+        (opening balance, None) before the first row, (None, None) when empty
+        """
+        size = self._size
+        i = bisect_right(self.ts, ts, 0, size) - 1
+        if i >= 0:
+            return self.balance_after[i], i
+        if not size:
+            return None, None
+        first = self.amount[0] if self.kind[0] % 2 else -self.amount[0]
+        return self.balance_after[0] - first, None
+
+    def totals(self, since: int = None, until: int = None):
+        """
+        Credit and debit totals of the rows in the inclusive epoch range
+        [since, until], from the running totals in O(log n).
+        Returns: (credit, debit)
+        """
+        size = self._size
+        start = bisect_left(self.ts, since, 0, size) if since is not None else 0
+        stop = bisect_right(self.ts, until, 0, size) if until is not None else size
+        if stop <= start:
+            return 0, 0
+        credit = self.credit_total[stop - 1] - (self.credit_total[start - 1] if start else 0)
+        debit = self.debit_total[stop - 1] - (self.debit_total[start - 1] if start else 0)
+        return credit, debit
+
+    def to_columns(self):
+        """Raw bytes of every column, for snapshots; callers must hold the account lock"""
+        arrays = [getattr(self, name) for name in COLUMNS] + [self.positions["debit"], self.positions["credit"]]
+        return [column.tobytes() for column in arrays]
+
+    @classmethod
+    def from_columns(cls, blobs: list, labels: LabelTable):
+        """Rebuild a ledger from to_columns() output"""
+        ledger = cls(labels)
+        arrays = [getattr(ledger, name) for name in COLUMNS] + [ledger.positions["debit"], ledger.positions["credit"]]
+        for column, blob in zip(arrays, blobs):
+            column.frombytes(blob)
+        ledger._size = len(ledger.kind)
+        return ledger
+
+    @classmethod
+    def from_records(cls, records: list, labels: LabelTable, account_of):
+        """Build a ledger from dict rows, ordering them by timestamp"""
+        ledger = cls(labels)
+        for record in sorted(records, key=lambda r: r["timestamp"]):
+            ledger.append_record(record, account_of)
+        return ledger
@@ -0,0 +1,332 @@
+import logging
+import os
+import threading
+import time
+
+from storage.account_index import AccountIndex
+from storage.base import StorageBackend
+from storage.journal import META, NOTED, Journal, decode, encode_meta, list_segments, read_segment, segment_path
+from storage.ledger import LabelTable, Ledger, from_epoch, to_epoch
+from storage.snapshot import list_snapshots, read_snapshot, snapshot_path, write_snapshot
+from storage.transfer_engine import TransferEngine
+
+logger = logging.getLogger("banking-assistant")
+
+
+def _end_of_minute(timestamp: str):
+    """Inclusive upper bound for a minute-resolution timestamp; ledger rows keep seconds"""
+    return to_epoch(timestamp) + 59
+
+
+class MemoryStorage(StorageBackend):
+    """
+    Storage over a dict in the database.db shape, mutated in place.
+    Each account's transaction list is replaced by a columnar Ledger.
+
+    Without journal_dir state is lost on restart. With it, every change is
+    written to a group-committed journal before the call returns, a
+    snapshot is taken every snapshot_interval seconds when there is
+    something new, and startup rebuilds the state from the newest snapshot
+    plus the journal after it; accounts is then only used on first start.
+    """
+
+    def __init__(self, accounts: dict, journal_dir: str = None, fsync: bool = True,
+                 snapshot_interval: float = 60):
+        self.labels = LabelTable()
+        # Renames change the descriptions rendered for counterparties
+        self.renames = 0
+        replay_from = None
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+            recovered = self._read_latest_snapshot(journal_dir)
+            if recovered is not None:
+                accounts, header = recovered
+                self._restore(header)
+                replay_from = header["segment"]
+
+        self.accounts = accounts
+        self.index = self._make_index(accounts)
+        for user_data in accounts.values():
+            user_data["transactions"] = self._to_ledger(user_data.get("transactions", []))
+        self.engine = TransferEngine(accounts)
+        self._change_lock = threading.Lock()
+        self.journal_dir = journal_dir
+        self.journal = None
+        self.recovery = None
+        if journal_dir:
+            self._open_journal(journal_dir, replay_from, fsync, snapshot_interval)
+
+    def _make_index(self, accounts: dict):
+        return AccountIndex(accounts)
+
+    def _snapshot_header(self):
+        """Fields besides the accounts a snapshot must keep"""
+        return {"renames": self.renames}
+
+    def _restore(self, header: dict):
+        self.renames = header["renames"]
+
+    def _account_of(self, name: str):
+        user_id = self.index.resolve(name)
+        return (user_id, self.accounts[user_id]["name"]) if user_id is not None else None
+
+    def _name_of(self, user_id: int):
+        return self.accounts[user_id]["name"]
+
+    def _to_ledger(self, records):
+        if isinstance(records, Ledger):
+            return records
+        return Ledger.from_records(records, self.labels, self._account_of)
+
+    def account_exists(self, user_id: int):
+        return user_id in self.accounts
+
+    def get_account(self, user_id: int):
+        user_data = self.accounts.get(user_id)
+        if user_data is None:
+            return None
+        return {
+            "name": user_data["name"],
+            "email": user_data.get("email"),
+            "balance": user_data["balance"],
+        }
+
+    def get_balance(self, user_id: int):
+        user_data = self.accounts.get(user_id)
+        return user_data["balance"] if user_data is not None else None
+
+    def get_version(self, user_id: int):
+        # The ledger is append-only and every balance change appends a row
+        user_data = self.accounts.get(user_id)
+        return (self.renames, len(user_data["transactions"])) if user_data is not None else None
+
+    def get_password(self, user_id: int):
+        user_data = self.accounts.get(user_id)
+        return user_data.get("password") if user_data is not None else None
+
+    def set_password(self, user_id: int, credential: str, expected: str = None):
+        user_data = self.accounts.get(user_id)
+        if user_data is None:
+            return False
+        with self.engine.locks.hold(user_id):
+            if expected is not None and user_data.get("password") != expected:
+                return False
+            user_data["password"] = credential
+            sequence = self._log_change({"op": "password", "user_id": user_id, "credential": credential})
+        self._wait(sequence)
+        return True
+
+    def get_contacts(self, user_id: int):
+        user_data = self.accounts.get(user_id)
+        return user_data.get("contacts", {}) if user_data is not None else None
+
+    def resolve_receiver(self, receiver_name: str, sender_id: int = None):
+        return self.index.resolve(receiver_name, sender_id)
+
+    def match_receivers(self, receiver_name: str, sender_id: int = None, limit: int = 5):
+        return [(user_id, self._name_of(user_id)) for user_id in self.index.match(receiver_name, sender_id, limit)]
+
+    def get_transactions(self, user_id: int, count: int = None):
+        user_data = self.accounts.get(user_id)
+        if user_data is None:
+            return None
+        ledger = user_data["transactions"]
+        stop = len(ledger)
+        start = max(0, stop - count) if count and count > 0 else 0
+        return ledger.rows(start, stop, self._name_of)
+
+    def get_transaction_page(self, user_id: int, limit: int, before: int = None,
+                             since: str = None, until: str = None, txn_type: str = None):
+        user_data = self.accounts.get(user_id)
+        if user_data is None:
+            return None
+        ledger = user_data["transactions"]
+        positions, next_before = ledger.page(
+            limit,
+            before=before,
+            since=to_epoch(since) if since else None,
+            until=_end_of_minute(until) if until else None,
+            txn_type=txn_type,
+        )
+        return {
+            "transactions": [ledger.row(i, self._name_of) for i in positions],
+            "next_before": next_before,
+        }
+
+    def get_balance_at(self, user_id: int, at: str):
+        user_data = self.accounts.get(user_id)
+        if user_data is None:
+            return None
+        ledger = user_data["transactions"]
+        balance, position = ledger.balance_at(_end_of_minute(at))
+        if balance is None:
+            return {"balance": user_data["balance"], "as_of": None}
+        return {"balance": balance, "as_of": from_epoch(ledger.ts[position]) if position is not None else None}
+
+    def get_totals(self, user_id: int, since: str = None, until: str = None):
+        user_data = self.accounts.get(user_id)
+        if user_data is None:
+            return None
+        credit, debit = user_data["transactions"].totals(
+            since=to_epoch(since) if since else None,
+            until=_end_of_minute(until) if until else None,
+        )
+        return {"credit": credit, "debit": debit}
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        return self.engine.transfer(sender_id, receiver_id, amount)
+
+    def transfer_batch(self, sender_id: int, legs: list):
+        return self.engine.transfer_batch(sender_id, legs)
+
+    def add_account(self, user_id: int, record: dict):
+        self._change({"op": "add_account", "user_id": user_id, "record": record})
+
+    def rename_account(self, user_id: int, new_name: str):
+        self._change({"op": "rename", "user_id": user_id, "name": new_name})
+
+    def set_contact(self, user_id: int, alias: str, target_id: int):
+        self._change({"op": "contact", "user_id": user_id, "alias": alias, "target_id": target_id})
+
+    def _change(self, change: dict):
+        """Apply an account change and journal it; the lock keeps both in the same order"""
+        # Encoded first: add_account replaces the record's transactions with a Ledger
+        payload = encode_meta(change) if self.journal is not None else None
+        with self._change_lock:
+            self._apply_change(change)
+            sequence = self.journal.append(payload) if payload is not None else None
+        self._wait(sequence)
+
+    def _apply_change(self, change: dict):
+        op, user_id = change["op"], change["user_id"]
+        if op == "add_account":
+            record = dict(change["record"])
+            record["transactions"] = self._to_ledger(record.get("transactions", []))
+            self.index.add_account(user_id, record)
+        elif op == "rename":
+            self.index.rename_account(user_id, change["name"])
+            self.renames += 1
+        elif op == "contact":
+            self.index.set_contact(user_id, change["alias"], change["target_id"])
+        elif op == "password":
+            self.accounts[user_id]["password"] = change["credential"]
+        else:
+            raise ValueError(f"Unknown journal change: {op}")
+
+    def _apply_note(self, note: dict):
+        """Replay the note journaled with a record's rows"""
+        raise ValueError(f"Unknown journal note: {note}")
+
+    def _log_change(self, change: dict):
+        return self.journal.append(encode_meta(change)) if self.journal is not None else None
+
+    def _wait(self, sequence):
+        if sequence is not None:
+            self.journal.wait(sequence)
+
+    def _read_latest_snapshot(self, directory: str):
+        """The newest readable snapshot as (accounts, header), or None"""
+        for segment in reversed(list_snapshots(directory)):
+            path = snapshot_path(directory, segment)
+            try:
+                return read_snapshot(path, self.labels)
+            except (ValueError, OSError) as e:
+                logger.warning("Skipping snapshot %s: %s", path, e)
+                self.labels = LabelTable()
+        return None
+
+    def _open_journal(self, directory: str, replay_from, fsync: bool, snapshot_interval: float):
+        started = time.perf_counter()
+        segments = [segment for segment in list_segments(directory) if replay_from is None or segment >= replay_from]
+        records = rows = 0
+        for segment in segments:
+            for payload in read_segment(segment_path(directory, segment)):
+                kind, body = decode(payload)
+                if kind == META:
+                    # Changes are idempotent except creating an account the snapshot already has
+                    if body["op"] != "add_account" or body["user_id"] not in self.accounts:
+                        self._apply_change(body)
+                else:
+                    if kind == NOTED:
+                        body, note = body
+                        self._apply_note(note)
+                    rows += sum(self._apply_row(*row) for row in body)
+                records += 1
+        self.recovery = {
+            "snapshot": replay_from,
+            "segments": len(segments),
+            "records": records,
+            "rows_applied": rows,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if replay_from is not None or segments:
+            logger.info("Recovered storage from %s: %s", directory, self.recovery)
+
+        # Never append after a possibly torn tail: start a new segment
+        last = max(segments + [replay_from or 0])
+        self.journal = Journal(directory, last + 1, fsync=fsync)
+        self.engine.journal = self.journal
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_records = 0
+        self._stopping = threading.Event()
+        if replay_from is None:
+            self.snapshot()
+        self._snapshotter = threading.Thread(
+            target=self._snapshot_loop, args=(snapshot_interval,), name="snapshots", daemon=True
+        )
+        self._snapshotter.start()
+
+    def _apply_row(self, account_id: int, position: int, kind: int, amount: int, counterparty: int,
+                   balance_after: int, ts: int):
+        """Replay one journaled ledger row. Returns: 1 if applied, 0 if the snapshot had it"""
+        user_data = self.accounts.get(account_id)
+        if user_data is None:
+            raise ValueError(f"Journal row for unknown account {account_id}")
+        ledger = user_data["transactions"]
+        if position < len(ledger):
+            return 0
+        if position > len(ledger):
+            raise ValueError(f"Journal is missing rows of account {account_id} before {position}")
+        ledger.append(kind, amount, counterparty, balance_after, ts)
+        user_data["balance"] = balance_after
+        return 1
+
+    def snapshot(self):
+        """
+        Write a snapshot and delete the journal segments and snapshots it
+        replaces. Returns: the snapshot path
+        """
+        with self._snapshot_lock:
+            records = self.journal.stats()["records"]
+            segment = self.journal.rotate()
+            path = write_snapshot(
+                self.journal_dir, segment, self.accounts, self.labels, self.engine.locks, self._snapshot_header()
+            )
+            for old in list_segments(self.journal_dir):
+                if old < segment:
+                    os.remove(segment_path(self.journal_dir, old))
+            for old in list_snapshots(self.journal_dir):
+                if old < segment:
+                    os.remove(snapshot_path(self.journal_dir, old))
+            self._snapshot_records = records
+            return path
+
+    def _snapshot_loop(self, interval: float):
+        while not self._stopping.wait(interval):
+            if self.journal.stats()["records"] <= self._snapshot_records:
+                continue
+            try:
+                self.snapshot()
+            except OSError as e:
+                logger.warning("Snapshot failed: %s", e)
+
+    def stats(self):
+        if self.journal is None:
+            return {"journal": None}
+        return {"journal": self.journal.stats(), "recovery": self.recovery}
+
+    def close(self):
+        if self.journal is not None:
+            self._stopping.set()
+            self._snapshotter.join()
+            self.journal.close()
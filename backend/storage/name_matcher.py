@@ -0,0 +1,227 @@
+import bisect
+import itertools
+
+# Prefix matches considered per query word ("jo" matches far more names than it should rank)
+MAX_PREFIX_TOKENS = 64
+# Accounts scored per lookup before giving up on finding fewer candidates
+MAX_CANDIDATES = 2000
+
+EXACT, PREFIX, TYPO = 0, 1, 2
+
+
+def tokenize(name: str):
+    return name.lower().split()
+
+
+def _deletes(token: str):
+    """The word with one letter left out, every way; indexed for words of three letters or more"""
+    if len(token) < 3:
+        return set()
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _max_typos(token: str):
+    return 1 if len(token) <= 4 else 2
+
+
+def edit_distance(a: str, b: str, limit: int):
+    """Edit distance counting a swap of neighbours as one edit, or None when above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, letter in enumerate(a, 1):
+        current = [i]
+        lowest = i
+        for j, other in enumerate(b, 1):
+            cost = previous[j - 1] + (letter != other)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if previous2 is not None and j > 1 and letter == b[j - 2] and a[i - 2] == other and previous2[j - 2] + 1 < cost:
+                cost = previous2[j - 2] + 1
+            current.append(cost)
+            if cost < lowest:
+                lowest = cost
+        if lowest > limit:
+            return None
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+def word_score(query: str, token: str):
+    """How well a query word matches a name word (lower is closer), or None"""
+    if query == token:
+        return EXACT
+    if len(query) >= 2 and token.startswith(query):
+        return PREFIX
+    if len(query) >= 3:
+        distance = edit_distance(query, token, _max_typos(query))
+        if distance is not None:
+            return TYPO + distance - 1
+    return None
+
+
+def name_score(query_tokens: list, name_tokens):
+    """Sum of each query word's best word score in the name, or None if a word matches nothing"""
+    total = 0
+    for query in query_tokens:
+        scores = [score for score in (word_score(query, token) for token in name_tokens) if score is not None]
+        if not scores:
+            return None
+        total += min(scores)
+    return total
+
+
+def _indexed_score(matches: list, name_tokens):
+    """name_score from the words each query word already matched in the index"""
+    total = 0
+    for found in matches:
+        scores = [found[token] for token in name_tokens if token in found]
+        if not scores:
+            return None
+        total += min(scores)
+    return total
+
+
+def rank_contacts(receiver_name: str, contacts):
+    """
+    Contacts closest to a receiver, by alias or by the contact's account name
+    contacts: (alias, target id, target name or None) each
+    Returns: ids of the best scoring contacts
+    """
+    query = tokenize(receiver_name)
+    best, ranked = None, []
+    for alias, target_id, target_name in contacts:
+        scores = [name_score(query, tokenize(alias))]
+        if target_name is not None:
+            scores.append(name_score(query, tokenize(target_name)))
+        scores = [score for score in scores if score is not None]
+        if not scores:
+            continue
+        score = min(scores)
+        if best is None or score < best:
+            best, ranked = score, []
+        if score == best and target_id not in ranked:
+            ranked.append(target_id)
+    return ranked
+
+
+class NameMatcher:
+    """
+    Fuzzy lookup of account names by word: every query word must match a
+    word of the name exactly, as a prefix or within one or two typos.
+    Postings are kept per distinct word rather than per account, with a
+    sorted word list for prefixes and each word's one-letter deletions for
+    typos: two words within an edit or a swap share a deletion. A lookup
+    touches a few dozen words, not every account.
+    Not thread-safe; AccountIndex serializes access.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._tokens = []
+        self._deletions = {}
+        self._names = {}
+
+    def add(self, user_id: int, name: str):
+        """Index an account's name, replacing any name indexed for it before"""
+        self.remove(user_id)
+        tokens = tuple(tokenize(name))
+        self._names[user_id] = tokens
+        for token in set(tokens):
+            holders = self._ids.get(token)
+            if holders is None:
+                holders = self._ids[token] = set()
+                bisect.insort(self._tokens, token)
+                for variant in _deletes(token):
+                    self._deletions.setdefault(variant, set()).add(token)
+            holders.add(user_id)
+
+    def remove(self, user_id: int):
+        for token in set(self._names.pop(user_id, ())):
+            holders = self._ids[token]
+            holders.discard(user_id)
+            if holders:
+                continue
+            del self._ids[token]
+            del self._tokens[bisect.bisect_left(self._tokens, token)]
+            for variant in _deletes(token):
+                self._deletions[variant].discard(token)
+
+    def _similar(self, query: str):
+        """Indexed words matching one query word. Returns: dict of word -> score"""
+        found = {}
+        if query in self._ids:
+            found[query] = EXACT
+        if len(query) >= 2:
+            start = bisect.bisect_right(self._tokens, query)
+            for token in self._tokens[start:start + MAX_PREFIX_TOKENS]:
+                if not token.startswith(query):
+                    break
+                found[token] = PREFIX
+        if found or len(query) < 3:
+            # Typos are only considered when nothing matches as typed
+            return found
+
+        # A missing letter, an extra letter, or a changed or swapped one;
+        # longer words may also take two extra letters or one extra and one changed
+        typos = _max_typos(query)
+        variants = _deletes(query)
+        if typos > 1:
+            variants |= {twice for variant in variants for twice in _deletes(variant)}
+        candidates = set(self._deletions.get(query, ()))
+        for variant in variants:
+            if variant in self._ids:
+                candidates.add(variant)
+            candidates.update(self._deletions.get(variant, ()))
+        for token in candidates:
+            distance = edit_distance(query, token, typos)
+            if distance is not None:
+                found[token] = TYPO + distance - 1
+        return found
+
+    def match(self, query: str, limit: int = 5):
+        """The best scoring accounts for a name, at most limit of them. Returns: list of ids"""
+        matches = [self._similar(token) for token in tokenize(query)]
+        if not matches or not all(matches):
+            return []
+        if len(matches) == 1:
+            return self._walk(matches[0], limit)
+
+        # Several words: intersect their accounts as sets, rarest word first
+        matches.sort(key=lambda found: sum(len(self._ids[token]) for token in found))
+        first = [self._ids[token] for token in matches[0]]
+        candidates = first[0] if len(first) == 1 else set().union(*first)
+        for found in matches[1:]:
+            candidates = set().union(*(self._ids[token] & candidates for token in found))
+            if not candidates:
+                return []
+        scored = sorted(
+            (_indexed_score(matches, self._names[user_id]), user_id)
+            for user_id in itertools.islice(candidates, MAX_CANDIDATES)
+        )
+        return [user_id for score, user_id in scored[:limit] if score == scored[0][0]]
+
+    def _walk(self, found: dict, limit: int):
+        """Accounts of one word's matches, closest words first, until the best are known"""
+        best, ranked, scanned = None, [], 0
+        for token in sorted(found, key=found.get):
+            if best is not None and (found[token] > best or len(ranked) >= limit):
+                break
+            for user_id in self._ids[token]:
+                # Accounts first reached through this word score at least its score
+                if len(ranked) >= limit and best <= found[token]:
+                    break
+                scanned += 1
+                if scanned > MAX_CANDIDATES:
+                    return ranked
+                score = _indexed_score([found], self._names[user_id])
+                if best is None or score < best:
+                    best, ranked = score, []
+                if score == best and user_id not in ranked and len(ranked) < limit:
+                    ranked.append(user_id)
+        return ranked
+
+    def stats(self):
+        return {"accounts": len(self._names), "words": len(self._ids)}
@@ -0,0 +1,346 @@
+"""
+Shard processes for BANK_STORAGE=sharded.
+
+Each shard owns the accounts whose id modulo the shard count is its
+number and serves them over a Unix socket. Start the shards, then any
+number of API workers against the same socket directory:
+    python -m storage.shard_server --shards 4 --socket-dir /tmp/bank-shards
+    BANK_STORAGE=sharded BANK_SHARD_DIR=/tmp/bank-shards BANK_SHARDS=4 uvicorn main:app --workers 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Listener
+
+from storage.account_index import AccountIndex
+from storage.memory import MemoryStorage
+from storage.sharded import ShardClient, ShardUnavailable, shard_of, shard_socket
+
+logger = logging.getLogger("banking-assistant")
+
+# Operations a client may call on a shard
+OPS = {
+    "account_exists", "get_account", "get_balance", "get_version", "get_password", "set_password",
+    "get_contacts", "resolve_receiver", "match_receivers", "get_transactions", "get_transaction_page",
+    "get_balance_at", "get_totals", "transfer", "transfer_batch", "add_account", "rename_account",
+    "set_name", "set_contact", "prepare_credits", "commit_credits", "stats",
+}
+RETRY_INTERVAL = 1.0
+
+
+class ShardStorage(MemoryStorage):
+    """
+    The accounts of one shard in memory, plus a directory of every
+    account's name so rows and receivers naming other shards' accounts
+    resolve locally.
+
+    A transfer to another shard's account is a two-phase commit run here,
+    on the sender's shard, while the sender's lock is held: each receiving
+    shard first votes that its receivers exist, then the debit is applied
+    here, journaled in one record with the credits it owes, then the
+    credits are sent to the receiving shards. A credit stays unsettled,
+    and is redelivered, until its shard has taken it; recovery picks the
+    unsettled ones up again.
+
+    Transactions are numbered per sender shard. A receiving shard journals
+    each number it applied with its credit rows and ignores it when it
+    comes again; every delivery also carries the sender's lowest unsettled
+    number, below which nothing can be redelivered and nothing is kept.
+    """
+
+    def __init__(self, shard: int, shard_count: int, accounts: dict, socket_dir: str,
+                 authkey: bytes = None, journal_dir: str = None, fsync: bool = True):
+        self.shard = shard
+        self.shard_count = shard_count
+        self.directory = AccountIndex({user_id: {"name": user_data["name"]} for user_id, user_data in accounts.items()})
+        self.peers = [
+            ShardClient(shard_socket(socket_dir, i), authkey) if i != shard else None for i in range(shard_count)
+        ]
+        self._txn_lock = threading.Lock()
+        self._next_txn = 1
+        # (txn, shard) -> credits owed to that shard, oldest first
+        self._unsettled = {}
+        # sender shard -> [lowest number still tracked, numbers applied from there up]
+        self._applied = {}
+        self._settler = None
+        self.cross_shard = 0
+        owned = {user_id: user_data for user_id, user_data in accounts.items() if shard_of(user_id, shard_count) == shard}
+        super().__init__(owned, journal_dir=journal_dir, fsync=fsync)
+        if self._unsettled:
+            self._start_settler()
+
+    def _make_index(self, accounts: dict):
+        return AccountIndex(accounts, known=self.directory.accounts)
+
+    def _snapshot_header(self):
+        names = {user_id: user_data["name"] for user_id, user_data in list(self.directory.accounts.items())}
+        with self._txn_lock:
+            unsettled = [[txn, shard, credits] for (txn, shard), credits in self._unsettled.items()]
+            applied = {sender: [below, sorted(done)] for sender, (below, done) in self._applied.items()}
+            next_txn = self._next_txn
+        return {**super()._snapshot_header(), "directory": names, "next_txn": next_txn,
+                "unsettled": unsettled, "applied": applied}
+
+    def _restore(self, header: dict):
+        super()._restore(header)
+        self.directory = AccountIndex({int(user_id): {"name": name} for user_id, name in header["directory"].items()})
+        self._next_txn = header["next_txn"]
+        self._unsettled = {(txn, shard): credits for txn, shard, credits in header["unsettled"]}
+        self._applied = {int(sender): [below, set(done)] for sender, (below, done) in header["applied"].items()}
+
+    def _apply_note(self, note: dict):
+        if "owes" in note:
+            # A debit: its credits are unsettled until a "settled" change says otherwise
+            txn = note["txn"]
+            with self._txn_lock:
+                self._next_txn = max(self._next_txn, txn + 1)
+                for shard, credits in note["owes"]:
+                    self._unsettled[(txn, shard)] = credits
+        else:
+            with self._txn_lock:
+                self._mark_applied(note["sender"], note["txn"], note["below"])
+
+    def _account_of(self, name: str):
+        user_id = self.directory.resolve(name)
+        return (user_id, self.directory.accounts[user_id]["name"]) if user_id is not None else None
+
+    def _name_of(self, user_id: int):
+        return self.directory.accounts[user_id]["name"]
+
+    def _apply_change(self, change: dict):
+        if change["op"] == "settled":
+            with self._txn_lock:
+                self._unsettled.pop((change["txn"], change["shard"]), None)
+            return
+        if change["op"] == "name":
+            user_id = change["user_id"]
+            if user_id in self.directory.accounts:
+                self.directory.rename_account(user_id, change["name"])
+            else:
+                self.directory.add_account(user_id, {"name": change["name"]})
+            self.renames += 1
+            return
+        super()._apply_change(change)
+        if change["op"] in ("add_account", "rename"):
+            name = change["record"]["name"] if change["op"] == "add_account" else change["name"]
+            self._apply_change({"op": "name", "user_id": change["user_id"], "name": name})
+
+    def set_name(self, user_id: int, name: str):
+        """Record the name of an account another shard owns"""
+        self._change({"op": "name", "user_id": user_id, "name": name})
+
+    def resolve_receiver(self, receiver_name: str, sender_id: int = None):
+        if sender_id is not None:
+            receiver_id = self.index.resolve_alias(receiver_name, sender_id)
+            if receiver_id is not None:
+                return receiver_id
+        return self.directory.resolve(receiver_name)
+
+    def match_receivers(self, receiver_name: str, sender_id: int = None, limit: int = 5):
+        ranked = self.index.match_contacts(receiver_name, sender_id)[:limit] if sender_id is not None else []
+        ranked = ranked or self.directory.match(receiver_name, limit=limit)
+        return [(user_id, self._name_of(user_id)) for user_id in ranked]
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        if shard_of(receiver_id, self.shard_count) == self.shard:
+            return super().transfer(sender_id, receiver_id, amount)
+        return self.transfer_batch(sender_id, [(receiver_id, amount)])
+
+    def transfer_batch(self, sender_id: int, legs: list):
+        remote = {}
+        for receiver_id, amount in legs:
+            shard = shard_of(receiver_id, self.shard_count)
+            if shard != self.shard:
+                remote.setdefault(shard, []).append((receiver_id, amount))
+            elif receiver_id not in self.accounts:
+                # With prepare the engine takes receivers it does not hold for remote ones
+                return {"success": False, "reason": "account_not_found", "balance": None}
+        if not remote:
+            return super().transfer_batch(sender_id, legs)
+
+        owes = [
+            [shard, [[receiver_id, sender_id, amount] for receiver_id, amount in shard_legs]]
+            for shard, shard_legs in remote.items()
+        ]
+        note = {}
+
+        def prepare():
+            # Phase one: every receiving shard votes while the sender is locked
+            for shard, shard_legs in remote.items():
+                try:
+                    vote = self.peers[shard].call("prepare_credits", [receiver_id for receiver_id, _ in shard_legs])
+                except ShardUnavailable:
+                    vote = None
+                if not vote:
+                    return "account_not_found" if vote is False else "shard_unavailable"
+            # Numbered and owed before the debit is journaled with them, so the
+            # lowest unsettled number never skips a transaction in flight
+            with self._txn_lock:
+                txn = self._next_txn
+                self._next_txn += 1
+                for shard, credits in owes:
+                    self._unsettled[(txn, shard)] = credits
+            note.update(txn=txn, owes=owes)
+            return None
+
+        outcome = self.engine.transfer_batch(sender_id, legs, prepare=prepare, note=note)
+        if outcome["success"]:
+            # Phase two: the debit is durable, so the credits must follow
+            with self._txn_lock:
+                self.cross_shard += 1
+            for shard, credits in owes:
+                if not self._commit(note["txn"], shard, credits):
+                    self._start_settler()
+        return outcome
+
+    def _commit(self, txn: int, shard: int, credits: list):
+        """Deliver one shard's credits and journal that they were taken. Returns: True if they were"""
+        with self._txn_lock:
+            if (txn, shard) not in self._unsettled:
+                return True
+            below = min(owed for owed, to in self._unsettled if to == shard)
+        try:
+            self.peers[shard].call("commit_credits", self.shard, txn, below, credits)
+        except Exception as e:
+            logger.warning("Credit %s to shard %s deferred: %s", txn, shard, e)
+            return False
+        self._change({"op": "settled", "user_id": None, "txn": txn, "shard": shard})
+        return True
+
+    def _start_settler(self):
+        with self._txn_lock:
+            if self._settler is None:
+                self._settler = threading.Thread(target=self._settle, name="settle", daemon=True)
+                self._settler.start()
+
+    def _settle(self):
+        """Redeliver unsettled credits until every receiving shard has taken them"""
+        while True:
+            time.sleep(RETRY_INTERVAL)
+            with self._txn_lock:
+                pending = list(self._unsettled.items())
+            for (txn, shard), credits in pending:
+                self._commit(txn, shard, credits)
+
+    def prepare_credits(self, receiver_ids: list):
+        """Phase one on a receiving shard: True if every receiver is an account here"""
+        return all(receiver_id in self.accounts for receiver_id in receiver_ids)
+
+    def commit_credits(self, sender: int, txn: int, below: int, credits: list):
+        """
+        Phase two on a receiving shard: apply (receiver_id, sender_id, amount)
+        credits of a sender shard's transaction once. below is the sender's
+        lowest unsettled transaction number
+        """
+        def accept():
+            with self._txn_lock:
+                if not self._mark_applied(sender, txn, below):
+                    return None
+            return {"sender": sender, "txn": txn, "below": below}
+
+        self.engine.credit(credits, accept)
+
+    def _mark_applied(self, sender: int, txn: int, below: int):
+        """Record a transaction as applied; the caller holds _txn_lock. Returns: False if it already was"""
+        state = self._applied.setdefault(sender, [0, set()])
+        if txn < state[0] or txn in state[1]:
+            return False
+        state[1].add(txn)
+        if below > state[0]:
+            state[0] = below
+            state[1] = {done for done in state[1] if done >= below}
+        return True
+
+    def stats(self):
+        with self._txn_lock:
+            shard_stats = {
+                "shard": self.shard,
+                "accounts": len(self.accounts),
+                "cross_shard_transfers": self.cross_shard,
+                "unsettled_credits": len(self._unsettled),
+                "applied_tracked": sum(len(done) for _, done in self._applied.values()),
+            }
+        return {**shard_stats, **super().stats()}
+
+
+def _handle(storage: ShardStorage, conn):
+    with conn:
+        while True:
+            try:
+                op, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            if op not in OPS:
+                conn.send(("error", "ValueError", f"Unknown shard operation: {op}"))
+                continue
+            try:
+                conn.send(("ok", getattr(storage, op)(*args)))
+            except Exception as e:
+                conn.send(("error", type(e).__name__, str(e)))
+
+
+def serve(shard: int, shard_count: int, accounts: dict, socket_dir: str, authkey: bytes = None,
+          journal_dir: str = None, fsync: bool = True):
+    """Run one shard until the process is stopped; one thread per client connection"""
+    path = shard_socket(socket_dir, shard)
+    if os.path.exists(path):
+        os.remove(path)
+    storage = ShardStorage(
+        shard, shard_count, accounts, socket_dir, authkey=authkey,
+        journal_dir=os.path.join(journal_dir, f"shard-{shard}") if journal_dir else None, fsync=fsync,
+    )
+    with Listener(path + ".tmp", family="AF_UNIX", authkey=authkey) as listener:
+        # Appear under the real name only once accepting connections
+        os.replace(path + ".tmp", path)
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle, args=(storage, conn), daemon=True).start()
+
+
+def launch(shard_count: int, accounts: dict, socket_dir: str, authkey: bytes = None,
+           journal_dir: str = None, fsync: bool = True, timeout: float = 60):
+    """Start one process per shard and wait until all of them accept connections. Returns: the processes"""
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    for shard in range(shard_count):
+        if os.path.exists(shard_socket(socket_dir, shard)):
+            os.remove(shard_socket(socket_dir, shard))
+    processes = [
+        multiprocessing.Process(
+            target=serve, args=(shard, shard_count, accounts, socket_dir, authkey, journal_dir, fsync),
+            name=f"shard-{shard}", daemon=True,
+        )
+        for shard in range(shard_count)
+    ]
+    for process in processes:
+        process.start()
+    deadline = time.monotonic() + timeout
+    while not all(os.path.exists(shard_socket(socket_dir, shard)) for shard in range(shard_count)):
+        if time.monotonic() > deadline or not all(process.is_alive() for process in processes):
+            for process in processes:
+                process.terminate()
+            raise RuntimeError("Shards failed to start")
+        time.sleep(0.05)
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", type=int, default=int(os.getenv("BANK_SHARDS", "4")))
+    parser.add_argument("--socket-dir", default=os.getenv("BANK_SHARD_DIR", "shards"))
+    parser.add_argument("--journal-dir", default=os.getenv("BANK_JOURNAL_DIR") or None,
+                        help="journal each shard under this directory")
+    args = parser.parse_args()
+
+    from database import db
+    authkey = os.getenv("BANK_SHARD_KEY", "").encode() or None
+    processes = launch(args.shards, db, args.socket_dir, authkey, args.journal_dir)
+    print(f"{args.shards} shards serving on {args.socket_dir}")
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
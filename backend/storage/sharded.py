@@ -0,0 +1,158 @@
+import os
+import queue
+from multiprocessing.connection import Client
+
+from storage.base import StorageBackend
+
+# Exceptions a shard may raise that are re-raised as themselves on the caller's side
+REMOTE_ERRORS = {"KeyError": KeyError, "ValueError": ValueError}
+
+
+class ShardUnavailable(Exception):
+    """A shard process could not be reached"""
+
+
+def shard_socket(socket_dir: str, shard: int):
+    return os.path.join(socket_dir, f"shard-{shard}.sock")
+
+
+def shard_of(user_id: int, shard_count: int):
+    """Accounts are partitioned by id"""
+    return user_id % shard_count
+
+
+class ShardClient:
+    """
+    Calls to one shard process over its Unix socket, on pooled connections
+    opened on demand. A request is an (op, args) tuple and the reply is
+    ("ok", result) or ("error", exception name, message).
+    """
+
+    def __init__(self, path: str, authkey: bytes = None):
+        self.path = path
+        self.authkey = authkey
+        self._pool = queue.LifoQueue()
+
+    def call(self, op: str, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = None
+        try:
+            if conn is None:
+                conn = Client(self.path, family="AF_UNIX", authkey=self.authkey)
+            conn.send((op, args))
+            reply = conn.recv()
+        except (OSError, EOFError) as e:
+            if conn is not None:
+                conn.close()
+            raise ShardUnavailable(f"{self.path}: {e}") from e
+        self._pool.put(conn)
+
+        if reply[0] == "ok":
+            return reply[1]
+        raise REMOTE_ERRORS.get(reply[1], RuntimeError)(reply[2])
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ShardedStorage(StorageBackend):
+    """
+    Storage over shard processes (storage/shard_server.py), each owning the
+    accounts whose id falls in its partition. Every call goes to the shard
+    that owns the account it is about; a transfer goes to the sender's
+    shard, which runs a two-phase commit with the receiver's shard when
+    they differ. Any number of API workers can share one set of shards.
+    """
+
+    def __init__(self, socket_dir: str, shard_count: int, authkey: bytes = None):
+        self.socket_dir = socket_dir
+        self.shard_count = shard_count
+        self.shards = [ShardClient(shard_socket(socket_dir, shard), authkey) for shard in range(shard_count)]
+
+    def _owner(self, user_id: int):
+        return self.shards[shard_of(user_id, self.shard_count)]
+
+    def account_exists(self, user_id: int):
+        return self._owner(user_id).call("account_exists", user_id)
+
+    def get_account(self, user_id: int):
+        return self._owner(user_id).call("get_account", user_id)
+
+    def get_balance(self, user_id: int):
+        return self._owner(user_id).call("get_balance", user_id)
+
+    def get_version(self, user_id: int):
+        return self._owner(user_id).call("get_version", user_id)
+
+    def get_password(self, user_id: int):
+        return self._owner(user_id).call("get_password", user_id)
+
+    def set_password(self, user_id: int, credential: str, expected: str = None):
+        return self._owner(user_id).call("set_password", user_id, credential, expected)
+
+    def get_contacts(self, user_id: int):
+        return self._owner(user_id).call("get_contacts", user_id)
+
+    def resolve_receiver(self, receiver_name: str, sender_id: int = None):
+        # Contacts live with the sender; every shard can resolve any account name
+        shard = self._owner(sender_id) if sender_id is not None else self.shards[0]
+        return shard.call("resolve_receiver", receiver_name, sender_id)
+
+    def match_receivers(self, receiver_name: str, sender_id: int = None, limit: int = 5):
+        shard = self._owner(sender_id) if sender_id is not None else self.shards[0]
+        return shard.call("match_receivers", receiver_name, sender_id, limit)
+
+    def get_transactions(self, user_id: int, count: int = None):
+        return self._owner(user_id).call("get_transactions", user_id, count)
+
+    def get_transaction_page(self, user_id: int, limit: int, before: int = None,
+                             since: str = None, until: str = None, txn_type: str = None):
+        return self._owner(user_id).call("get_transaction_page", user_id, limit, before, since, until, txn_type)
+
+    def get_balance_at(self, user_id: int, at: str):
+        return self._owner(user_id).call("get_balance_at", user_id, at)
+
+    def get_totals(self, user_id: int, since: str = None, until: str = None):
+        return self._owner(user_id).call("get_totals", user_id, since, until)
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        return self._owner(sender_id).call("transfer", sender_id, receiver_id, amount)
+
+    def transfer_batch(self, sender_id: int, legs: list):
+        return self._owner(sender_id).call("transfer_batch", sender_id, legs)
+
+    def add_account(self, user_id: int, record: dict):
+        self._owner(user_id).call("add_account", user_id, record)
+        self._broadcast_name(user_id, record["name"])
+
+    def rename_account(self, user_id: int, new_name: str):
+        self._owner(user_id).call("rename_account", user_id, new_name)
+        self._broadcast_name(user_id, new_name)
+
+    def _broadcast_name(self, user_id: int, name: str):
+        # Other shards keep every account's name to render rows and resolve receivers
+        for shard in self.shards:
+            if shard is not self._owner(user_id):
+                shard.call("set_name", user_id, name)
+
+    def set_contact(self, user_id: int, alias: str, target_id: int):
+        self._owner(user_id).call("set_contact", user_id, alias, target_id)
+
+    def stats(self):
+        shards = []
+        for shard in self.shards:
+            try:
+                shards.append(shard.call("stats"))
+            except ShardUnavailable:
+                shards.append({"available": False})
+        return {"shards": shards}
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
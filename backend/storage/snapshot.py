@@ -0,0 +1,115 @@
+import json
+import os
+import re
+import struct
+import zlib
+
+from storage.ledger import COLUMNS, Ledger
+
+SNAPSHOT_RE = re.compile(r"^snapshot-(\d{8})\.snap$")
+MAGIC = b"BANKSNP1"
+# Length prefix of every block after the magic
+BLOCK = struct.Struct("<Q")
+# Ledger columns plus the debit and credit position arrays
+BLOBS = len(COLUMNS) + 2
+
+
+def snapshot_path(directory: str, segment: int):
+    return os.path.join(directory, f"snapshot-{segment:08d}.snap")
+
+
+def list_snapshots(directory: str):
+    """Snapshot segment numbers in the directory, oldest first"""
+    found = (SNAPSHOT_RE.match(name) for name in os.listdir(directory))
+    return sorted(int(match.group(1)) for match in found if match)
+
+
+def write_snapshot(directory: str, segment: int, accounts: dict, labels, locks, header: dict = None):
+    """
+    Write every account as raw ledger columns plus its other fields as JSON,
+    after a header holding the storage's own fields.
+    Each account is copied under its own lock, so the file is not one
+    point in time: replaying the journal from segment on skips rows an
+    account already has. Written to a temporary file and renamed into place.
+    """
+    path = snapshot_path(directory, segment)
+    temp = path + ".tmp"
+    crc = 0
+    items = list(accounts.items())
+    with open(temp, "wb") as f:
+        def block(data: bytes):
+            nonlocal crc
+            for part in (BLOCK.pack(len(data)), data):
+                f.write(part)
+                crc = zlib.crc32(part, crc)
+
+        f.write(MAGIC)
+        crc = zlib.crc32(MAGIC, crc)
+        block(json.dumps({**(header or {}), "segment": segment, "accounts": len(items)}).encode())
+        for user_id, user_data in items:
+            with locks.hold(user_id):
+                # Contacts change under the index lock; copying a dict is atomic
+                fields = {
+                    key: dict(value) if isinstance(value, dict) else value
+                    for key, value in user_data.items() if key != "transactions"
+                }
+                blobs = user_data["transactions"].to_columns()
+            block(json.dumps({"id": user_id, "fields": fields}, ensure_ascii=False).encode())
+            for blob in blobs:
+                block(blob)
+        # Labels last: accounts copied above may have interned new ones
+        block(json.dumps(labels.values(), ensure_ascii=False).encode())
+        f.write(struct.pack("<I", crc))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    _sync_directory(directory)
+    return path
+
+
+def read_snapshot(path: str, labels):
+    """
+    Load a snapshot written by write_snapshot, interning its labels into
+    the empty LabelTable labels. Raises ValueError if it is corrupt.
+    Returns: (accounts dict, header dict)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC or len(data) < len(MAGIC) + 4:
+        raise ValueError(f"Not a snapshot: {path}")
+    if zlib.crc32(data[:-4]) != struct.unpack("<I", data[-4:])[0]:
+        raise ValueError(f"Corrupt snapshot: {path}")
+
+    view = memoryview(data)
+    offset = len(MAGIC)
+
+    def block():
+        nonlocal offset
+        (length,) = BLOCK.unpack_from(view, offset)
+        offset += BLOCK.size + length
+        return view[offset - length:offset]
+
+    header = json.loads(bytes(block()))
+    accounts = {}
+    for _ in range(header["accounts"]):
+        meta = json.loads(bytes(block()))
+        user_data = meta["fields"]
+        user_data["transactions"] = Ledger.from_columns([block() for _ in range(BLOBS)], labels)
+        accounts[meta["id"]] = user_data
+    for label in json.loads(bytes(block())):
+        labels.intern(label)
+    return accounts, header
+
+
+def _sync_directory(directory: str):
+    # Make the rename itself durable; not supported on every platform
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
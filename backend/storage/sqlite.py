@@ -0,0 +1,498 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from storage.account_index import normalize_name
+from storage.base import StorageBackend
+from storage.name_matcher import NameMatcher, rank_contacts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    email TEXT,
+    password TEXT,
+    balance INTEGER NOT NULL CHECK (balance >= 0)
+);
+CREATE INDEX IF NOT EXISTS idx_accounts_name_key ON accounts (name_key, id);
+
+CREATE TABLE IF NOT EXISTS contacts (
+    owner_id INTEGER NOT NULL REFERENCES accounts (id),
+    alias_key TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    target_id INTEGER NOT NULL REFERENCES accounts (id),
+    PRIMARY KEY (owner_id, alias_key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id INTEGER NOT NULL REFERENCES accounts (id),
+    type TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    balance_after INTEGER NOT NULL,
+    -- Running totals of the account through this row
+    credit_total INTEGER NOT NULL DEFAULT 0,
+    debit_total INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions (account_id, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_type ON transactions (account_id, type, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_time ON transactions (account_id, timestamp, id);
+"""
+
+# Statements are kept as constants so each pooled connection compiles them
+# once and reuses the prepared form from its statement cache.
+SQL_ACCOUNT = "SELECT name, email, balance FROM accounts WHERE id = ?"
+SQL_BALANCE = "SELECT balance FROM accounts WHERE id = ?"
+# Every balance change inserts a row, so the newest row id versions an account
+SQL_VERSION = "SELECT MAX(id) FROM transactions WHERE account_id = ?"
+SQL_PASSWORD = "SELECT password FROM accounts WHERE id = ?"
+SQL_SET_PASSWORD = "UPDATE accounts SET password = ? WHERE id = ?"
+SQL_SWAP_PASSWORD = "UPDATE accounts SET password = ? WHERE id = ? AND password = ?"
+SQL_EXISTS = "SELECT 1 FROM accounts WHERE id = ?"
+SQL_CONTACTS = "SELECT alias, target_id FROM contacts WHERE owner_id = ?"
+SQL_CONTACT = "SELECT target_id FROM contacts WHERE owner_id = ? AND alias_key = ?"
+SQL_BY_NAME = "SELECT id FROM accounts WHERE name_key = ? ORDER BY id LIMIT 1"
+SQL_CONTACT_NAMES = """
+    SELECT contacts.alias_key, contacts.target_id, accounts.name FROM contacts
+    JOIN accounts ON accounts.id = contacts.target_id WHERE contacts.owner_id = ?
+"""
+SQL_NAMES = "SELECT id, name FROM accounts"
+SQL_ALL_TRANSACTIONS = """
+    SELECT type, amount, description, timestamp, balance_after
+    FROM transactions WHERE account_id = ? ORDER BY id
+"""
+SQL_LAST_TRANSACTIONS = """
+    SELECT type, amount, description, timestamp, balance_after
+    FROM transactions WHERE account_id = ? ORDER BY id DESC LIMIT ?
+"""
+# Time bounds are turned into id bounds first so pages walk the id index
+SQL_FIRST_ID_SINCE = "SELECT MIN(id) FROM transactions WHERE account_id = ? AND timestamp >= ?"
+SQL_LAST_ID_UNTIL = "SELECT MAX(id) FROM transactions WHERE account_id = ? AND timestamp <= ?"
+SQL_PAGE = """
+    SELECT id, type, amount, description, timestamp, balance_after
+    FROM transactions WHERE account_id = ? AND id >= ? AND id < ?
+    ORDER BY id DESC LIMIT ?
+"""
+SQL_PAGE_BY_TYPE = """
+    SELECT id, type, amount, description, timestamp, balance_after
+    FROM transactions WHERE account_id = ? AND type = ? AND id >= ? AND id < ?
+    ORDER BY id DESC LIMIT ?
+"""
+SQL_INSERT_ACCOUNT = """
+    INSERT INTO accounts (id, name, name_key, email, password, balance)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_INSERT_CONTACT = """
+    INSERT OR REPLACE INTO contacts (owner_id, alias_key, alias, target_id)
+    VALUES (?, ?, ?, ?)
+"""
+SQL_INSERT_TRANSACTION = """
+    INSERT INTO transactions
+        (account_id, type, amount, description, timestamp, balance_after, credit_total, debit_total)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_LAST_TOTALS = """
+    SELECT credit_total, debit_total FROM transactions
+    WHERE account_id = ? ORDER BY id DESC LIMIT 1
+"""
+# Point-in-time lookups walk the (account_id, timestamp, id) index backwards
+SQL_ROW_AT = """
+    SELECT balance_after, timestamp, credit_total, debit_total FROM transactions
+    WHERE account_id = ? AND timestamp <= ? ORDER BY timestamp DESC, id DESC LIMIT 1
+"""
+SQL_ROW_BEFORE = """
+    SELECT credit_total, debit_total FROM transactions
+    WHERE account_id = ? AND timestamp < ? ORDER BY timestamp DESC, id DESC LIMIT 1
+"""
+SQL_FIRST_ROW = """
+    SELECT type, amount, balance_after FROM transactions
+    WHERE account_id = ? ORDER BY id LIMIT 1
+"""
+# Fills the running totals of databases created before those columns existed
+SQL_BACKFILL_TOTALS = """
+    UPDATE transactions SET credit_total = totals.credit, debit_total = totals.debit
+    FROM (
+        SELECT id,
+            SUM(CASE WHEN type = 'credit' THEN amount ELSE 0 END) OVER account AS credit,
+            SUM(CASE WHEN type = 'debit' THEN amount ELSE 0 END) OVER account AS debit
+        FROM transactions
+        WINDOW account AS (PARTITION BY account_id ORDER BY id)
+    ) AS totals
+    WHERE transactions.id = totals.id
+"""
+MAX_ID = 2 ** 63 - 1
+# Batch transfers look accounts up this many ids per statement
+BATCH_CHUNK = 500
+SQL_ACCOUNTS_IN = "SELECT id, name, balance FROM accounts WHERE id IN ({})"
+SQL_LAST_TOTALS_IN = """
+    SELECT account_id, credit_total, debit_total FROM transactions
+    WHERE id IN (SELECT MAX(id) FROM transactions WHERE account_id IN ({}) GROUP BY account_id)
+"""
+
+SQL_RENAME = "UPDATE accounts SET name = ?, name_key = ? WHERE id = ?"
+SQL_DEBIT = "UPDATE accounts SET balance = balance - ? WHERE id = ? AND balance >= ?"
+SQL_CREDIT = "UPDATE accounts SET balance = balance + ? WHERE id = ?"
+SQL_SET_BALANCE = "UPDATE accounts SET balance = ? WHERE id = ?"
+
+
+def _chunked_query(conn, sql: str, ids: list):
+    """Run sql with its IN list filled by ids, BATCH_CHUNK at a time"""
+    for start in range(0, len(ids), BATCH_CHUNK):
+        chunk = ids[start:start + BATCH_CHUNK]
+        yield from conn.execute(sql.format(",".join("?" * len(chunk))), chunk)
+
+
+def _row_to_transaction(row):
+    return {
+        "type": row[0],
+        "amount": row[1],
+        "description": row[2],
+        "timestamp": row[3],
+        "balance_after": row[4],
+    }
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    SQLite storage in WAL mode behind a small connection pool.
+    Several uvicorn workers can share one database file: readers never block
+    and transfers serialize on SQLite's write lock with BEGIN IMMEDIATE.
+    """
+
+    def __init__(self, path: str, pool_size: int = 8, seed: dict = None):
+        self.path = path
+        self._matcher = None
+        self._matcher_lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            if seed:
+                self._seed(conn, seed)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=64,
+            timeout=30,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @contextmanager
+    def _write(self):
+        """Run a block in an IMMEDIATE transaction on a pooled connection"""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _migrate(self, conn):
+        """Add the running total columns to a database from an older schema"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+        if "credit_total" in columns:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+        if "credit_total" not in columns:
+            conn.execute("ALTER TABLE transactions ADD COLUMN credit_total INTEGER NOT NULL DEFAULT 0")
+            conn.execute("ALTER TABLE transactions ADD COLUMN debit_total INTEGER NOT NULL DEFAULT 0")
+            conn.execute(SQL_BACKFILL_TOTALS)
+        conn.execute("COMMIT")
+
+    def _seed(self, conn, accounts: dict):
+        """Load the seed accounts into an empty database"""
+        conn.execute("BEGIN IMMEDIATE")
+        # Checked inside the write transaction so concurrent workers seed once
+        if conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] > 0:
+            conn.execute("ROLLBACK")
+            return
+        for user_id, user_data in accounts.items():
+            self._insert_account(conn, user_id, user_data)
+        for user_id, user_data in accounts.items():
+            for alias, target_id in user_data.get("contacts", {}).items():
+                conn.execute(SQL_INSERT_CONTACT, (user_id, normalize_name(alias), alias, target_id))
+            rows = []
+            credit_total = debit_total = 0
+            for t in sorted(user_data.get("transactions", []), key=lambda t: t["timestamp"]):
+                if t["type"] == "credit":
+                    credit_total += t["amount"]
+                else:
+                    debit_total += t["amount"]
+                rows.append((
+                    user_id, t["type"], t["amount"], t["description"], t["timestamp"],
+                    t["balance_after"], credit_total, debit_total,
+                ))
+            conn.executemany(SQL_INSERT_TRANSACTION, rows)
+        conn.execute("COMMIT")
+
+    def _insert_account(self, conn, user_id: int, record: dict):
+        conn.execute(SQL_INSERT_ACCOUNT, (
+            user_id,
+            record["name"],
+            normalize_name(record["name"]),
+            record.get("email"),
+            record.get("password"),
+            record.get("balance", 0),
+        ))
+
+    def account_exists(self, user_id: int):
+        with self._connection() as conn:
+            return conn.execute(SQL_EXISTS, (user_id,)).fetchone() is not None
+
+    def get_account(self, user_id: int):
+        with self._connection() as conn:
+            row = conn.execute(SQL_ACCOUNT, (user_id,)).fetchone()
+        if row is None:
+            return None
+        return {"name": row[0], "email": row[1], "balance": row[2]}
+
+    def get_balance(self, user_id: int):
+        with self._connection() as conn:
+            row = conn.execute(SQL_BALANCE, (user_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def get_version(self, user_id: int):
+        with self._connection() as conn:
+            return conn.execute(SQL_VERSION, (user_id,)).fetchone()[0]
+
+    def get_password(self, user_id: int):
+        with self._connection() as conn:
+            row = conn.execute(SQL_PASSWORD, (user_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_password(self, user_id: int, credential: str, expected: str = None):
+        with self._write() as conn:
+            if expected is None:
+                return conn.execute(SQL_SET_PASSWORD, (credential, user_id)).rowcount > 0
+            return conn.execute(SQL_SWAP_PASSWORD, (credential, user_id, expected)).rowcount > 0
+
+    def get_contacts(self, user_id: int):
+        with self._connection() as conn:
+            if conn.execute(SQL_EXISTS, (user_id,)).fetchone() is None:
+                return None
+            return dict(conn.execute(SQL_CONTACTS, (user_id,)).fetchall())
+
+    def resolve_receiver(self, receiver_name: str, sender_id: int = None):
+        key = normalize_name(receiver_name)
+        with self._connection() as conn:
+            if sender_id is not None:
+                row = conn.execute(SQL_CONTACT, (sender_id, key)).fetchone()
+                if row is not None:
+                    return row[0]
+            row = conn.execute(SQL_BY_NAME, (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def match_receivers(self, receiver_name: str, sender_id: int = None, limit: int = 5):
+        with self._connection() as conn:
+            ranked = []
+            if sender_id is not None:
+                ranked = rank_contacts(receiver_name, conn.execute(SQL_CONTACT_NAMES, (sender_id,)).fetchall())
+            if not ranked:
+                ranked = self._match_names(conn, receiver_name, limit)
+            names = {row[0]: row[1] for row in _chunked_query(conn, SQL_ACCOUNTS_IN, ranked[:limit])}
+        return [(user_id, names[user_id]) for user_id in ranked[:limit] if user_id in names]
+
+    def _match_names(self, conn, receiver_name: str, limit: int):
+        """
+        Match against every account name in memory, loaded on first use. The
+        matcher follows accounts added and renamed through this process;
+        other workers' changes appear after a restart, while exact lookups
+        always go to the database.
+        """
+        with self._matcher_lock:
+            if self._matcher is None:
+                self._matcher = NameMatcher()
+                for user_id, name in conn.execute(SQL_NAMES):
+                    self._matcher.add(user_id, name)
+            return self._matcher.match(receiver_name, limit)
+
+    def _index_name(self, user_id: int, name: str):
+        with self._matcher_lock:
+            if self._matcher is not None:
+                self._matcher.add(user_id, name)
+
+    def get_transactions(self, user_id: int, count: int = None):
+        with self._connection() as conn:
+            if conn.execute(SQL_EXISTS, (user_id,)).fetchone() is None:
+                return None
+            if count and count > 0:
+                rows = conn.execute(SQL_LAST_TRANSACTIONS, (user_id, count)).fetchall()
+                rows.reverse()
+            else:
+                rows = conn.execute(SQL_ALL_TRANSACTIONS, (user_id,)).fetchall()
+        return [_row_to_transaction(row) for row in rows]
+
+    def get_transaction_page(self, user_id: int, limit: int, before: int = None,
+                             since: str = None, until: str = None, txn_type: str = None):
+        with self._connection() as conn:
+            if conn.execute(SQL_EXISTS, (user_id,)).fetchone() is None:
+                return None
+            low, high = 0, before if before is not None else MAX_ID
+            if since:
+                first = conn.execute(SQL_FIRST_ID_SINCE, (user_id, since)).fetchone()[0]
+                low = first if first is not None else MAX_ID
+            if until:
+                last = conn.execute(SQL_LAST_ID_UNTIL, (user_id, until)).fetchone()[0]
+                high = min(high, last + 1 if last is not None else 0)
+            # One extra row tells whether an older page exists
+            if txn_type is None:
+                rows = conn.execute(SQL_PAGE, (user_id, low, high, limit + 1)).fetchall()
+            else:
+                rows = conn.execute(SQL_PAGE_BY_TYPE, (user_id, txn_type, low, high, limit + 1)).fetchall()
+        next_before = rows[limit - 1][0] if len(rows) > limit else None
+        rows = rows[:limit]
+        rows.reverse()
+        return {
+            "transactions": [_row_to_transaction(row[1:]) for row in rows],
+            "next_before": next_before,
+        }
+
+    def get_balance_at(self, user_id: int, at: str):
+        with self._connection() as conn:
+            account = conn.execute(SQL_BALANCE, (user_id,)).fetchone()
+            if account is None:
+                return None
+            row = conn.execute(SQL_ROW_AT, (user_id, at)).fetchone()
+            if row is not None:
+                return {"balance": row[0], "as_of": row[1]}
+            first = conn.execute(SQL_FIRST_ROW, (user_id,)).fetchone()
+        if first is None:
+            return {"balance": account[0], "as_of": None}
+        # Before the first transaction: undo it to get the opening balance
+        txn_type, amount, balance_after = first
+        return {"balance": balance_after - amount if txn_type == "credit" else balance_after + amount, "as_of": None}
+
+    def get_totals(self, user_id: int, since: str = None, until: str = None):
+        with self._connection() as conn:
+            if conn.execute(SQL_EXISTS, (user_id,)).fetchone() is None:
+                return None
+            if until:
+                end = conn.execute(SQL_ROW_AT, (user_id, until)).fetchone()
+                end = end[2:] if end is not None else None
+            else:
+                end = conn.execute(SQL_LAST_TOTALS, (user_id,)).fetchone()
+            start = conn.execute(SQL_ROW_BEFORE, (user_id, since)).fetchone() if since else None
+        end = end or (0, 0)
+        start = start or (0, 0)
+        return {"credit": max(0, end[0] - start[0]), "debit": max(0, end[1] - start[1])}
+
+    def _next_totals(self, conn, user_id: int, txn_type: str, amount: int):
+        last = conn.execute(SQL_LAST_TOTALS, (user_id,)).fetchone() or (0, 0)
+        if txn_type == "credit":
+            return last[0] + amount, last[1]
+        return last[0], last[1] + amount
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        with self._write() as conn:
+            sender = conn.execute(SQL_ACCOUNT, (sender_id,)).fetchone()
+            receiver = conn.execute(SQL_ACCOUNT, (receiver_id,)).fetchone()
+            if sender is None or receiver is None:
+                return {"success": False, "reason": "account_not_found", "balance": None}
+
+            if conn.execute(SQL_DEBIT, (amount, sender_id, amount)).rowcount == 0:
+                return {"success": False, "reason": "insufficient_balance", "balance": sender[2]}
+            conn.execute(SQL_CREDIT, (amount, receiver_id))
+
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            sender_balance = conn.execute(SQL_BALANCE, (sender_id,)).fetchone()[0]
+            receiver_balance = conn.execute(SQL_BALANCE, (receiver_id,)).fetchone()[0]
+            conn.execute(SQL_INSERT_TRANSACTION, (
+                sender_id, "debit", amount, f"Sent ₹{amount} to {receiver[0]}", timestamp, sender_balance,
+                *self._next_totals(conn, sender_id, "debit", amount),
+            ))
+            conn.execute(SQL_INSERT_TRANSACTION, (
+                receiver_id, "credit", amount, f"Received ₹{amount} from {sender[0]}", timestamp, receiver_balance,
+                *self._next_totals(conn, receiver_id, "credit", amount),
+            ))
+            return {"success": True, "reason": None, "balance": sender_balance}
+
+    def transfer_batch(self, sender_id: int, legs: list):
+        total = sum(amount for _, amount in legs)
+        with self._write() as conn:
+            sender = conn.execute(SQL_ACCOUNT, (sender_id,)).fetchone()
+            if sender is None:
+                return {"success": False, "reason": "account_not_found", "balance": None}
+            receiver_ids = sorted({receiver_id for receiver_id, _ in legs})
+            if sender_id in receiver_ids:
+                return {"success": False, "reason": "invalid_receiver", "balance": sender[2]}
+            receivers = {row[0]: row for row in _chunked_query(conn, SQL_ACCOUNTS_IN, receiver_ids)}
+            if len(receivers) < len(receiver_ids):
+                return {"success": False, "reason": "account_not_found", "balance": None}
+            if conn.execute(SQL_DEBIT, (total, sender_id, total)).rowcount == 0:
+                return {"success": False, "reason": "insufficient_balance", "balance": sender[2]}
+
+            # The write lock is held, so balances and running totals can be
+            # carried forward here and written back in two executemany calls
+            balances = {receiver_id: row[2] for receiver_id, row in receivers.items()}
+            totals = {receiver_id: (0, 0) for receiver_id in receiver_ids}
+            totals.update((row[0], (row[1], row[2])) for row in _chunked_query(conn, SQL_LAST_TOTALS_IN, receiver_ids))
+            sender_balance = sender[2]
+            sender_credit, sender_debit = conn.execute(SQL_LAST_TOTALS, (sender_id,)).fetchone() or (0, 0)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            rows = []
+            for receiver_id, amount in legs:
+                sender_balance -= amount
+                sender_debit += amount
+                rows.append((
+                    sender_id, "debit", amount, f"Sent ₹{amount} to {receivers[receiver_id][1]}", timestamp,
+                    sender_balance, sender_credit, sender_debit,
+                ))
+                balances[receiver_id] += amount
+                credit, debit = totals[receiver_id]
+                totals[receiver_id] = (credit + amount, debit)
+                rows.append((
+                    receiver_id, "credit", amount, f"Received ₹{amount} from {sender[0]}", timestamp,
+                    balances[receiver_id], credit + amount, debit,
+                ))
+            conn.executemany(SQL_SET_BALANCE, [(balance, receiver_id) for receiver_id, balance in balances.items()])
+            conn.executemany(SQL_INSERT_TRANSACTION, rows)
+            return {"success": True, "reason": None, "balance": sender_balance}
+
+    def add_account(self, user_id: int, record: dict):
+        with self._write() as conn:
+            if conn.execute(SQL_EXISTS, (user_id,)).fetchone() is not None:
+                raise ValueError(f"Account {user_id} already exists")
+            self._insert_account(conn, user_id, record)
+            for alias, target_id in record.get("contacts", {}).items():
+                conn.execute(SQL_INSERT_CONTACT, (user_id, normalize_name(alias), alias, target_id))
+        self._index_name(user_id, record["name"])
+
+    def rename_account(self, user_id: int, new_name: str):
+        with self._write() as conn:
+            if conn.execute(SQL_RENAME, (new_name, normalize_name(new_name), user_id)).rowcount == 0:
+                raise KeyError(user_id)
+        self._index_name(user_id, new_name)
+
+    def set_contact(self, user_id: int, alias: str, target_id: int):
+        with self._write() as conn:
+            if conn.execute(SQL_EXISTS, (target_id,)).fetchone() is None:
+                raise KeyError(target_id)
+            conn.execute(SQL_INSERT_CONTACT, (user_id, normalize_name(alias), alias, target_id))
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
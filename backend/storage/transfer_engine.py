@@ -0,0 +1,161 @@
+import threading
+from contextlib import contextmanager
+
+from storage.journal import encode_noted_rows, encode_rows
+from storage.ledger import RECEIVED, SENT, now_epoch
+
+
+class AccountLocks:
+    """
+    One lock per account, acquired in ascending id order so that
+    concurrent multi-account operations can never deadlock.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, user_id: int):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            with self._guard:
+                lock = self._locks.setdefault(user_id, threading.Lock())
+        return lock
+
+    @contextmanager
+    def hold(self, *user_ids: int):
+        """Hold the locks of every given account for the duration of the block"""
+        locks = [self.get(user_id) for user_id in sorted(set(user_ids))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+class TransferEngine:
+    """
+    Applies balance transfers atomically under per-account locks.
+    Accounts hold their history as a Ledger under "transactions".
+    With a journal, the rows of each transfer are queued to it while the
+    locks are held, so conflicting transfers are journaled in the order
+    they were applied, and the call returns once they are durable.
+    """
+
+    def __init__(self, accounts: dict, journal=None):
+        self.accounts = accounts
+        self.locks = AccountLocks()
+        self.journal = journal
+
+    def _post(self, rows: list, account_id: int, account: dict, kind: int, amount: int,
+              counterparty: int, ts: int):
+        """Append one ledger row at the account's current balance; callers hold its lock"""
+        ledger = account["transactions"]
+        position = len(ledger)
+        ledger.append(kind, amount, counterparty, account["balance"], ts)
+        if self.journal is not None:
+            rows.append((account_id, position, kind, amount, counterparty, account["balance"], ledger.ts[position]))
+
+    def _log(self, rows: list, note: dict = None):
+        if not rows:
+            return None
+        return self.journal.append(encode_noted_rows(rows, note) if note else encode_rows(rows))
+
+    def _wait(self, sequence):
+        if sequence is not None:
+            self.journal.wait(sequence)
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        """
+        Move amount from sender to receiver.
+        The balance check and both ledger writes happen under the locks of
+        the two accounts, so concurrent transfers cannot overdraw or lose updates.
+        Returns: dict with success flag, reason on failure and the new sender balance
+        """
+        sender = self.accounts.get(sender_id)
+        receiver = self.accounts.get(receiver_id)
+        if sender is None or receiver is None:
+            return {"success": False, "reason": "account_not_found", "balance": None}
+
+        with self.locks.hold(sender_id, receiver_id):
+            if sender["balance"] < amount:
+                return {"success": False, "reason": "insufficient_balance", "balance": sender["balance"]}
+
+            ts = now_epoch()
+            rows = []
+            sender["balance"] -= amount
+            self._post(rows, sender_id, sender, SENT, amount, receiver_id, ts)
+            receiver["balance"] += amount
+            self._post(rows, receiver_id, receiver, RECEIVED, amount, sender_id, ts)
+            sequence = self._log(rows)
+            balance = sender["balance"]
+
+        self._wait(sequence)
+        return {"success": True, "reason": None, "balance": balance}
+
+    def transfer_batch(self, sender_id: int, legs: list, prepare=None, note: dict = None):
+        """
+        Move every (receiver_id, amount) leg out of the sender's account, all or nothing.
+        The locks of the sender and all receivers are taken once, in id order,
+        and the total is checked against the balance once before any leg is applied.
+
+        With prepare, receivers this engine does not hold are remote: once
+        the balance check passes, prepare() is called under the locks and
+        returns None to go ahead or a failure reason, and only the debit of
+        a remote leg is applied here. note, which prepare may fill in, is
+        journaled in the same record as the rows.
+        Returns: dict with success flag, reason on failure and the new sender balance
+        """
+        sender = self.accounts.get(sender_id)
+        receivers = [self.accounts.get(receiver_id) for receiver_id, _ in legs]
+        if sender is None or (prepare is None and any(receiver is None for receiver in receivers)):
+            return {"success": False, "reason": "account_not_found", "balance": None}
+        if any(receiver_id == sender_id for receiver_id, _ in legs):
+            return {"success": False, "reason": "invalid_receiver", "balance": sender["balance"]}
+        total = sum(amount for _, amount in legs)
+        local = (receiver_id for (receiver_id, _), receiver in zip(legs, receivers) if receiver is not None)
+
+        with self.locks.hold(sender_id, *local):
+            if sender["balance"] < total:
+                return {"success": False, "reason": "insufficient_balance", "balance": sender["balance"]}
+            reason = prepare() if prepare is not None else None
+            if reason is not None:
+                return {"success": False, "reason": reason, "balance": sender["balance"]}
+
+            ts = now_epoch()
+            rows = []
+            for (receiver_id, amount), receiver in zip(legs, receivers):
+                sender["balance"] -= amount
+                self._post(rows, sender_id, sender, SENT, amount, receiver_id, ts)
+                if receiver is not None:
+                    receiver["balance"] += amount
+                    self._post(rows, receiver_id, receiver, RECEIVED, amount, sender_id, ts)
+            # One record, so a batch is recovered whole or not at all
+            sequence = self._log(rows, note)
+            balance = sender["balance"]
+
+        self._wait(sequence)
+        return {"success": True, "reason": None, "balance": balance}
+
+    def credit(self, credits: list, accept=None):
+        """
+        Apply the receiving side of remote legs: (receiver_id, sender_id, amount) each.
+        With accept, it is called under the receivers' locks and returns a note
+        to journal with the rows, or None to skip the credit.
+        Returns: True if the credit was applied
+        """
+        with self.locks.hold(*(receiver_id for receiver_id, _, _ in credits)):
+            note = accept() if accept is not None else None
+            if accept is not None and note is None:
+                return False
+            ts = now_epoch()
+            rows = []
+            for receiver_id, sender_id, amount in credits:
+                receiver = self.accounts[receiver_id]
+                receiver["balance"] += amount
+                self._post(rows, receiver_id, receiver, RECEIVED, amount, sender_id, ts)
+            sequence = self._log(rows, note)
+        self._wait(sequence)
+        return True
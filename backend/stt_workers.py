@@ -0,0 +1,336 @@
+# backend/stt_workers.py
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import multiprocessing
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+
+from settings import load_env
+
+logger = logging.getLogger("banking-assistant")
+
+# How often the watcher looks for new workers, and the least time between restarts
+WATCH_INTERVAL = 1.0
+
+
+class STTOverloaded(Exception):
+    """No worker can take another session, or a worker queue is full"""
+
+
+class STTWorkerLost(Exception):
+    """The worker decoding a session died; the session's audio so far is lost"""
+
+
+def _worker_main(requests, results, pool_size: int):
+    """Worker process: load the model once, then decode chunks for the sessions pinned here"""
+    import vosk_stt
+
+    try:
+        vosk_stt.get_model()
+    except Exception as e:
+        results.put(("ready", os.getpid(), repr(e)))
+        return
+    results.put(("ready", os.getpid(), None))
+
+    recognizers = vosk_stt.RecognizerPool(size=pool_size)
+    sessions = {}
+    while True:
+        op, seq, session_id, payload = requests.get()
+        if op == "stop":
+            break
+        if op == "close":
+            session = sessions.pop(session_id, None)
+            if session:
+                session.close()
+            continue
+
+        started = time.perf_counter()
+        try:
+            session = sessions.get(session_id)
+            if session is None:
+                session = sessions[session_id] = vosk_stt.StreamingSession(recognizers, timeout=0)
+            audio_before = session.audio_seconds
+            event = session.feed(payload) if op == "feed" else session.finish()
+            results.put(("result", seq, event, None, session.audio_seconds - audio_before, time.perf_counter() - started))
+        except Exception as e:
+            results.put(("result", seq, None, repr(e), 0.0, time.perf_counter() - started))
+
+    for session in sessions.values():
+        session.close()
+
+
+class _Worker:
+    def __init__(self, process, requests):
+        self.process = process
+        self.requests = requests
+        self.lost = False
+        self.active_sessions = 0
+        self.queue_depth = 0
+        self.audio_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def stats(self):
+        return {
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "active_sessions": self.active_sessions,
+            "queue_depth": self.queue_depth,
+            "real_time_factor": _rtf(self.decode_seconds, self.audio_seconds),
+        }
+
+
+def _rtf(decode_seconds: float, audio_seconds: float):
+    return round(decode_seconds / audio_seconds, 4) if audio_seconds else None
+
+
+class STTSession:
+    """
+    Handle for one audio stream pinned to a worker. feed() and finish()
+    return futures resolving to the transcript event (or None).
+    """
+
+    def __init__(self, pool, worker: _Worker, session_id: int):
+        self.pool = pool
+        self.worker = worker
+        self.session_id = session_id
+        self.closed = False
+
+    def feed(self, chunk: bytes, timeout: float = 2.0):
+        return self.pool._submit(self.worker, "feed", self.session_id, chunk, timeout)
+
+    def finish(self, timeout: float = 2.0):
+        return self.pool._submit(self.worker, "finish", self.session_id, None, timeout)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.pool._close_session(self.worker, self.session_id)
+
+
+class STTWorkerPool:
+    """
+    Speech recognition on worker processes, each with its own copy of the
+    Vosk model. Sessions are pinned to the least loaded worker so one
+    recognizer sees the whole stream. Admission control refuses new sessions
+    once every worker holds sessions_per_worker of them, and each worker's
+    request queue is bounded so a slow worker pushes back on its callers.
+    Workers start on the first session (or an explicit start()). A worker
+    that dies fails its sessions' pending requests with STTWorkerLost and
+    is replaced by a new one, which starts with all its session slots free.
+    """
+
+    def __init__(self, workers: int = None, sessions_per_worker: int = None, queue_size: int = None):
+        self.workers = workers or int(os.getenv("STT_WORKERS", "0")) or os.cpu_count() or 1
+        self.sessions_per_worker = sessions_per_worker or int(os.getenv("STT_SESSIONS_PER_WORKER", "8"))
+        self.queue_size = queue_size or self.sessions_per_worker * 4
+        self._workers = []
+        self._context = None
+        self._results = None
+        self._futures = {}
+        self._seq = itertools.count(1)
+        self._session_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.overloaded = 0
+        self.restarts = 0
+
+    @property
+    def started(self):
+        return bool(self._workers)
+
+    def start(self, timeout: float = 120.0):
+        """Spawn the workers and wait until each has loaded the model"""
+        with self._start_lock:
+            if self._workers:
+                return
+            self._context = multiprocessing.get_context("spawn")
+            self._results = self._context.Queue()
+            workers = [self._spawn() for _ in range(self.workers)]
+
+            errors = []
+            deadline = time.monotonic() + timeout
+            for _ in workers:
+                try:
+                    _, _, error = self._results.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    errors.append("worker did not load the model in time")
+                    break
+                if error:
+                    errors.append(error)
+            if errors:
+                for worker in workers:
+                    worker.process.terminate()
+                raise RuntimeError(f"STT workers failed to start: {errors[0]}")
+
+            self._workers = workers
+            threading.Thread(target=self._collect, daemon=True).start()
+            threading.Thread(target=self._watch, daemon=True).start()
+
+    def _spawn(self):
+        requests = self._context.Queue(maxsize=self.queue_size)
+        process = self._context.Process(
+            target=_worker_main, args=(requests, self._results, self.sessions_per_worker), daemon=True
+        )
+        process.start()
+        return _Worker(process, requests)
+
+    def open_session(self):
+        """Pin a new stream to the least loaded worker; raises STTOverloaded when all are full"""
+        self.start()
+        with self._lock:
+            worker = min(self._workers, key=lambda w: w.active_sessions)
+            if worker.active_sessions >= self.sessions_per_worker:
+                self.rejected += 1
+                raise STTOverloaded("All speech workers are at capacity")
+            worker.active_sessions += 1
+            self.admitted += 1
+            return STTSession(self, worker, next(self._session_ids))
+
+    def _submit(self, worker: _Worker, op: str, session_id: int, payload, timeout: float):
+        future = Future()
+        seq = next(self._seq)
+        with self._lock:
+            if worker.lost:
+                raise STTWorkerLost("Speech worker stopped")
+            self._futures[seq] = (future, worker)
+            worker.queue_depth += 1
+        try:
+            if timeout:
+                worker.requests.put((op, seq, session_id, payload), timeout=timeout)
+            else:
+                worker.requests.put_nowait((op, seq, session_id, payload))
+        except queue.Full:
+            with self._lock:
+                self._futures.pop(seq, None)
+                worker.queue_depth -= 1
+                self.overloaded += 1
+            raise STTOverloaded("Speech worker queue is full")
+        return future
+
+    def _close_session(self, worker: _Worker, session_id: int):
+        with self._lock:
+            # A lost worker's slots were freed when it was replaced
+            if worker.lost:
+                return
+            worker.active_sessions -= 1
+        worker.requests.put(("close", None, session_id, None))
+
+    def _collect(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            if message[0] == "ready":
+                # A replacement worker; one that cannot load the model exits and is replaced again
+                if message[2]:
+                    logger.warning("Speech worker %s failed to start: %s", message[1], message[2])
+                continue
+            _, seq, event, error, audio_seconds, decode_seconds = message
+            with self._lock:
+                entry = self._futures.pop(seq, None)
+                if entry is None:
+                    # Already failed: its worker died after sending it
+                    continue
+                future, worker = entry
+                worker.queue_depth -= 1
+                worker.audio_seconds += audio_seconds
+                worker.decode_seconds += decode_seconds
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(event)
+
+    def _watch(self):
+        """Replace workers whose process has exited"""
+        while True:
+            with self._lock:
+                workers = list(self._workers)
+            if not workers:
+                return
+            wait([worker.process.sentinel for worker in workers], timeout=WATCH_INTERVAL)
+            for worker in workers:
+                if not worker.process.is_alive():
+                    self._replace(worker)
+
+    def _replace(self, worker: _Worker):
+        with self._lock:
+            if worker not in self._workers:
+                # Stopped by shutdown()
+                return
+            worker.lost = True
+            lost = [seq for seq, (_, owner) in self._futures.items() if owner is worker]
+            futures = [self._futures.pop(seq)[0] for seq in lost]
+        logger.warning("Speech worker %s exited with %s; failing %s sessions' requests and restarting it",
+                       worker.process.pid, worker.process.exitcode, worker.active_sessions)
+        for future in futures:
+            future.set_exception(STTWorkerLost("Speech worker stopped"))
+        replacement = self._spawn()
+        with self._lock:
+            if worker in self._workers:
+                self._workers[self._workers.index(worker)] = replacement
+                self.restarts += 1
+                return
+        replacement.requests.put(("stop", None, None, None))
+
+    def stats(self):
+        with self._lock:
+            audio = sum(w.audio_seconds for w in self._workers)
+            decode = sum(w.decode_seconds for w in self._workers)
+            return {
+                "started": self.started,
+                "workers": self.workers,
+                "sessions_per_worker": self.sessions_per_worker,
+                "active_sessions": sum(w.active_sessions for w in self._workers),
+                "queue_depth": sum(w.queue_depth for w in self._workers),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "overloaded": self.overloaded,
+                "restarts": self.restarts,
+                "audio_seconds": round(audio, 3),
+                "real_time_factor": _rtf(decode, audio),
+                "per_worker": [w.stats() for w in self._workers],
+            }
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.requests.put(("stop", None, None, None))
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if workers:
+            self._results.put(None)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_stt_pool():
+    """Return the process-wide STT worker pool; workers still start on the first session"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                load_env()
+                _pool = STTWorkerPool()
+    return _pool
+
+
+def stt_pool_stats():
+    """Pool statistics for /health without creating the pool"""
+    return _pool.stats() if _pool is not None else {"started": False}
+
+
+def shutdown_stt_pool():
+    if _pool is not None:
+        _pool.shutdown()
@@ -0,0 +1,139 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.dataset import make_accounts
+from database import set_storage
+from services import transfer_service
+from services.credentials import CredentialService, PasswordHasher, set_credentials
+from services.idempotency import IdempotencyConflict, IdempotencyInProgress, IdempotencyStore
+from services.transfer_service import send_money
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+ACCOUNTS = 10
+BALANCE = 1000
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = IdempotencyStore()
+    monkeypatch.setattr(transfer_service, "transfer_requests", store)
+    return store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    accounts = make_accounts(ACCOUNTS, BALANCE)
+    if request.param == "memory":
+        storage = MemoryStorage(accounts)
+    else:
+        storage = SQLiteStorage(str(tmp_path / "bank.db"), seed=accounts)
+    # A cheap KDF: the seed passwords are rehashed on first use
+    credentials = CredentialService(hasher=PasswordHasher(n=2 ** 4))
+    set_storage(storage)
+    set_credentials(credentials)
+    yield storage
+    set_credentials(None)
+    set_storage(None)
+    credentials.shutdown()
+    storage.close()
+
+
+def test_concurrent_retries_transfer_once(store, storage):
+    rng = random.Random(7)
+    keyed = []
+    for i in range(40):
+        sender_id, receiver_id = rng.sample(range(1, ACCOUNTS + 1), 2)
+        keyed.append((f"key-{i}", sender_id, receiver_id, rng.randint(1, 400)))
+    jobs = [job for job in keyed for _ in range(6)]
+    rng.shuffle(jobs)
+
+    def attempt(job):
+        key, sender_id, receiver_id, amount = job
+        return key, send_money(sender_id, amount, f"User {receiver_id}", f"pass{sender_id}", idempotency_key=key)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(attempt, jobs))
+
+    by_key = {}
+    for key, result in outcomes:
+        by_key.setdefault(key, []).append(result)
+    for key, results in by_key.items():
+        first = [result for result in results if not result.get("replayed")]
+        assert len(first) == 1, f"{key} executed {len(first)} times"
+        assert all(result["message"] == first[0]["message"] for result in results)
+
+    succeeded = sum(1 for results in by_key.values() if results[0]["success"])
+    assert succeeded > 0
+    rows = sum(len(storage.get_transactions(user_id)) for user_id in range(1, ACCOUNTS + 1))
+    assert rows == 2 * succeeded
+    assert sum(storage.get_balance(user_id) for user_id in range(1, ACCOUNTS + 1)) == ACCOUNTS * BALANCE
+    assert store.stats()["in_flight"] == 0
+
+
+def test_key_reused_for_another_transfer(store, storage):
+    assert send_money(1, 10, "User 2", "pass1", idempotency_key="k")["success"]
+    conflict = send_money(1, 20, "User 2", "pass1", idempotency_key="k")
+    assert not conflict["success"]
+    assert "different transfer" in conflict["message"]
+    # Keys are per user
+    assert send_money(3, 20, "User 2", "pass3", idempotency_key="k")["success"]
+    assert storage.get_balance(1) == BALANCE - 10
+
+
+def test_claim_complete_replay():
+    store = IdempotencyStore()
+    claim, replay = store.claim("k", (10, "ravi"))
+    assert replay is None
+    store.complete(claim, {"success": True})
+    assert store.claim("k", (10, "ravi")) == (None, {"success": True})
+    assert store.outcome("k") == {"success": True}
+    assert store.outcome("other") is None
+    with pytest.raises(IdempotencyConflict):
+        store.claim("k", (20, "ravi"))
+
+
+def test_released_claim_runs_again():
+    store = IdempotencyStore()
+    claim, _ = store.claim("k", (10, "ravi"))
+    store.release(claim)
+    again, replay = store.claim("k", (10, "ravi"))
+    assert again is not None and again is not claim and replay is None
+    assert store.stats()["in_flight"] == 1
+
+
+def test_retry_waits_for_running_claim():
+    store = IdempotencyStore()
+    claim, _ = store.claim("k", (10, "ravi"))
+    answers = []
+    retry = threading.Thread(target=lambda: answers.append(store.claim("k", (10, "ravi"))))
+    retry.start()
+    store.complete(claim, {"success": True})
+    retry.join(timeout=5)
+    assert answers == [(None, {"success": True})]
+
+
+def test_running_claim_survives_eviction():
+    store = IdempotencyStore(max_size=2, wait_timeout=0.05)
+    running, _ = store.claim("running", (10, "ravi"))
+    for i in range(10):
+        claim, _ = store.claim(i, (10, "ravi"))
+        store.complete(claim, {"success": True})
+    assert store.stats()["evictions"] == 8
+    with pytest.raises(IdempotencyInProgress):
+        store.claim("running", (10, "ravi"))
+    store.complete(running, {"success": False})
+    assert store.claim("running", (10, "ravi")) == (None, {"success": False})
+
+
+def test_expired_outcome_runs_again():
+    store = IdempotencyStore(ttl=0)
+    claim, _ = store.claim("k", (10, "ravi"))
+    store.complete(claim, {"success": True})
+    assert store.outcome("k") is None
+    again, replay = store.claim("k", (10, "ravi"))
+    assert again is not None and replay is None
+    assert store.stats()["expirations"] == 1
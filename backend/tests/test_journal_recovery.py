@@ -0,0 +1,141 @@
+import os
+import random
+import shutil
+
+import pytest
+
+from benchmarks.dataset import make_accounts
+from storage.journal import list_segments, segment_path
+from storage.memory import MemoryStorage
+
+ACCOUNTS = 20
+
+
+def open_storage(directory, accounts=None):
+    return MemoryStorage(accounts or {}, journal_dir=str(directory), fsync=False, snapshot_interval=3600)
+
+
+def state(storage):
+    return {
+        user_id: (
+            storage.get_balance(user_id),
+            storage.get_transactions(user_id),
+            storage.get_account(user_id)["name"],
+            storage.get_contacts(user_id),
+            storage.get_password(user_id),
+        )
+        for user_id in storage.accounts
+    }
+
+
+def run_transfers(storage, count: int, seed: int):
+    """Returns: how many of the transfers succeeded"""
+    rng = random.Random(seed)
+    succeeded = 0
+    for _ in range(count):
+        sender_id, receiver_id = rng.sample(range(1, ACCOUNTS + 1), 2)
+        succeeded += storage.transfer(sender_id, receiver_id, rng.randint(1, 300))["success"]
+    return succeeded
+
+
+def crash(storage, directory, tmp_path):
+    """Copy the journal directory of a live storage, as a restart after a crash would find it"""
+    copy = tmp_path / f"crashed-{len(os.listdir(tmp_path))}"
+    shutil.copytree(directory, copy)
+    return copy
+
+
+@pytest.fixture
+def live(tmp_path):
+    directory = tmp_path / "journal"
+    storage = open_storage(directory, make_accounts(ACCOUNTS, balance=1000, transactions=5))
+    yield storage, directory
+    storage.close()
+
+
+def test_replays_journal(live, tmp_path):
+    storage, directory = live
+    succeeded = run_transfers(storage, 500, seed=1)
+    assert storage.transfer_batch(1, [(2, 5), (3, 5)])["success"]
+    expected = state(storage)
+
+    recovered = open_storage(crash(storage, directory, tmp_path))
+    try:
+        assert state(recovered) == expected
+        # Everything after the snapshot taken on first start
+        assert recovered.recovery["records"] == succeeded + 1
+        assert recovered.recovery["rows_applied"] == 2 * succeeded + 4
+    finally:
+        recovered.close()
+
+
+def test_snapshot_then_journal(live, tmp_path):
+    storage, directory = live
+    run_transfers(storage, 300, seed=2)
+    storage.snapshot()
+    succeeded = run_transfers(storage, 50, seed=3)
+    expected = state(storage)
+
+    recovered = open_storage(crash(storage, directory, tmp_path))
+    try:
+        assert state(recovered) == expected
+        assert recovered.recovery["records"] == succeeded
+        # Recovering again, now from the recovered storage's own snapshot
+        run_transfers(recovered, 50, seed=4)
+        expected = state(recovered)
+    finally:
+        recovered.close()
+    reopened = open_storage(recovered.journal_dir)
+    try:
+        assert state(reopened) == expected
+    finally:
+        reopened.close()
+
+
+def test_account_changes_survive(live, tmp_path):
+    storage, directory = live
+    storage.add_account(ACCOUNTS + 1, {
+        "name": "Asha Rao", "email": "asha@example.com", "password": "secret",
+        "balance": 250, "contacts": {}, "transactions": [],
+    })
+    storage.transfer(ACCOUNTS + 1, 1, 50)
+    storage.snapshot()
+    storage.rename_account(1, "Ravi Kumar")
+    storage.set_contact(1, "asha", ACCOUNTS + 1)
+    storage.set_password(ACCOUNTS + 1, "rehashed", expected="secret")
+    expected = state(storage)
+
+    recovered = open_storage(crash(storage, directory, tmp_path))
+    try:
+        assert state(recovered) == expected
+        assert recovered.resolve_receiver("asha", 1) == ACCOUNTS + 1
+        assert recovered.resolve_receiver("ravi kumar") == 1
+    finally:
+        recovered.close()
+
+
+def test_torn_tail_drops_only_the_last_record(live, tmp_path):
+    storage, directory = live
+    run_transfers(storage, 100, seed=5)
+    expected = state(storage)
+    storage.transfer_batch(1, [(2, 7), (3, 7), (4, 7)])
+
+    copy = crash(storage, directory, tmp_path)
+    last = segment_path(str(copy), list_segments(str(copy))[-1])
+    with open(last, "r+b") as f:
+        f.truncate(os.path.getsize(last) - 3)
+
+    recovered = open_storage(copy)
+    try:
+        # The batch was one record: none of its legs survive
+        assert state(recovered) == expected
+        recovered.transfer(5, 6, 1)
+        expected = state(recovered)
+    finally:
+        recovered.close()
+    # New writes went to a fresh segment, after the torn one
+    reopened = open_storage(copy)
+    try:
+        assert state(reopened) == expected
+    finally:
+        reopened.close()
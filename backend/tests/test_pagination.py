@@ -0,0 +1,73 @@
+import pytest
+
+from benchmarks.dataset import make_accounts
+from database import set_storage
+from services.history_service import get_transaction_page
+from storage.memory import MemoryStorage
+from storage.sqlite import SQLiteStorage
+
+HISTORY = 95
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    accounts = make_accounts(3, transactions=HISTORY)
+    if request.param == "memory":
+        storage = MemoryStorage(accounts)
+    else:
+        storage = SQLiteStorage(str(tmp_path / "bank.db"), seed=accounts)
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+    storage.close()
+
+
+def all_pages(user_id: int, **filters):
+    pages = []
+    cursor = None
+    while True:
+        page = get_transaction_page(user_id, cursor=cursor, **filters)
+        pages.append(page["transactions"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_history_newest_first(storage):
+    history = storage.get_transactions(1)
+    pages = all_pages(1, limit=20)
+    assert [len(page) for page in pages] == [20, 20, 20, 20, 15]
+    # Pages run newest first, rows within a page oldest first
+    assert [row for page in reversed(pages) for row in page] == history
+
+
+def test_page_size_is_clamped(storage):
+    assert len(get_transaction_page(1, limit=1000)["transactions"]) == HISTORY
+    assert len(get_transaction_page(1, limit=0)["transactions"]) == 20
+
+
+def test_filters(storage):
+    history = storage.get_transactions(1)
+    debits = [row for page in reversed(all_pages(1, limit=7, txn_type="debit")) for row in page]
+    assert debits == [row for row in history if row["type"] == "debit"]
+
+    since, until = history[10]["timestamp"], history[40]["timestamp"]
+    window = [row for page in reversed(all_pages(1, limit=8, since=since, until=until)) for row in page]
+    assert window == [row for row in history if since <= row["timestamp"] <= until]
+
+
+def test_new_rows_do_not_shift_later_pages(storage):
+    first = get_transaction_page(1, limit=10)
+    storage.transfer(2, 1, 5)
+    second = get_transaction_page(1, cursor=first["next_cursor"], limit=10)
+    assert second["transactions"][-1] == storage.get_transactions(1)[HISTORY - 11]
+
+
+def test_rejects_malformed_input(storage):
+    with pytest.raises(ValueError):
+        get_transaction_page(1, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        get_transaction_page(1, txn_type="refund")
+    with pytest.raises(ValueError):
+        get_transaction_page(1, since="yesterday")
+    assert get_transaction_page(99) is None
@@ -0,0 +1,191 @@
+import copy
+import random
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.dataset import make_accounts
+from storage import shard_server
+from storage.shard_server import ShardStorage, launch
+from storage.sharded import ShardedStorage, ShardUnavailable, shard_of
+
+ACCOUNTS = 20
+BALANCE = 1000
+
+
+class Peer:
+    """In-process stand-in for the socket client of another shard"""
+
+    def __init__(self):
+        self.target = None
+        self.fail = False
+
+    def call(self, op: str, *args):
+        if self.target is None or (self.fail and op == "commit_credits"):
+            raise ShardUnavailable("shard down")
+        return getattr(self.target, op)(*args)
+
+
+class Cluster:
+    """Two shards calling each other directly, each journaling to its own directory"""
+
+    def __init__(self, tmp_path):
+        self.tmp_path = tmp_path
+        self.accounts = make_accounts(ACCOUNTS, balance=BALANCE)
+        self.shards = []
+        self.opened = []
+        for shard in range(2):
+            self.shards.append(self.open(shard, tmp_path / f"shard-{shard}"))
+        self.connect()
+
+    def open(self, shard: int, journal_dir):
+        storage = ShardStorage(shard, 2, copy.deepcopy(self.accounts), "/nonexistent",
+                               journal_dir=str(journal_dir), fsync=False)
+        self.opened.append(storage)
+        return storage
+
+    def connect(self):
+        for storage in self.shards:
+            storage.peers[1 - storage.shard].target = self.shards[1 - storage.shard]
+
+    def crash(self, shard: int):
+        """Restart a shard from a copy of its journal directory, as after a crash"""
+        old = self.shards[shard]
+        # Returns once everything journaled so far is on disk
+        old.journal.rotate()
+        copy_dir = self.tmp_path / f"shard-{shard}-{len(self.opened)}"
+        shutil.copytree(old.journal_dir, copy_dir)
+        for peer in old.peers:
+            if peer is not None:
+                peer.target = None
+        self.shards[shard] = self.open(shard, copy_dir)
+        self.connect()
+        return self.shards[shard]
+
+    def owner(self, user_id: int):
+        return self.shards[shard_of(user_id, 2)]
+
+    def transfer(self, sender_id: int, receiver_id: int, amount: int):
+        return self.owner(sender_id).transfer(sender_id, receiver_id, amount)
+
+    def settled(self, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+        while any(storage.stats()["unsettled_credits"] for storage in self.shards):
+            assert time.monotonic() < deadline, "credits never settled"
+            time.sleep(0.02)
+
+    def total(self):
+        return sum(self.owner(user_id).get_balance(user_id) for user_id in range(1, ACCOUNTS + 1))
+
+    def close(self):
+        for storage in self.opened:
+            for peer in storage.peers:
+                if peer is not None:
+                    peer.target = None
+            storage.close()
+
+
+@pytest.fixture
+def cluster(monkeypatch, tmp_path):
+    monkeypatch.setattr(shard_server, "ShardClient", lambda path, authkey=None: Peer())
+    monkeypatch.setattr(shard_server, "RETRY_INTERVAL", 0.02)
+    cluster = Cluster(tmp_path)
+    yield cluster
+    cluster.close()
+
+
+def test_cross_shard_transfers_conserve_money(cluster):
+    rng = random.Random(7)
+    jobs = [(*rng.sample(range(1, ACCOUNTS + 1), 2), rng.randint(1, 300)) for _ in range(2000)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = list(pool.map(lambda job: cluster.transfer(*job), jobs))
+    cluster.settled()
+
+    succeeded = sum(1 for outcome in outcomes if outcome["success"])
+    crossed = sum(storage.stats()["cross_shard_transfers"] for storage in cluster.shards)
+    assert 0 < crossed < succeeded
+    assert cluster.total() == ACCOUNTS * BALANCE
+    rows = sum(len(cluster.owner(user_id).get_transactions(user_id)) for user_id in range(1, ACCOUNTS + 1))
+    assert rows == 2 * succeeded
+    assert all(cluster.owner(user_id).get_balance(user_id) >= 0 for user_id in range(1, ACCOUNTS + 1))
+
+
+def test_receiver_votes_no(cluster):
+    sender = cluster.shards[0]
+    assert sender.transfer(2, 99, 10)["reason"] == "account_not_found"
+    cluster.shards[0].peers[1].target = None
+    assert sender.transfer(2, 1, 10)["reason"] == "shard_unavailable"
+    assert sender.get_balance(2) == BALANCE
+    assert sender.get_transactions(2) == []
+
+
+def test_undelivered_credit_is_redelivered_after_sender_crash(cluster):
+    cluster.shards[0].peers[1].fail = True
+    assert cluster.transfer(2, 1, 100)["success"]
+    assert cluster.shards[0].stats()["unsettled_credits"] == 1
+    assert cluster.total() == ACCOUNTS * BALANCE - 100
+
+    recovered = cluster.crash(0)
+    assert recovered.get_balance(2) == BALANCE - 100
+    cluster.settled()
+    assert cluster.shards[1].get_balance(1) == BALANCE + 100
+    assert cluster.total() == ACCOUNTS * BALANCE
+
+
+def test_redelivery_after_receiver_restart_is_ignored(cluster):
+    for _ in range(3):
+        assert cluster.transfer(2, 1, 10)["success"]
+    cluster.settled()
+    receiver = cluster.crash(1)
+    assert receiver.get_balance(1) == BALANCE + 30
+
+    # Every transaction number so far, redelivered after the restart
+    for txn in (1, 2, 3):
+        receiver.commit_credits(0, txn, 1, [[1, 2, 10]])
+    assert receiver.get_balance(1) == BALANCE + 30
+    assert cluster.total() == ACCOUNTS * BALANCE
+
+
+def test_snapshot_keeps_transaction_state(cluster):
+    for _ in range(3):
+        assert cluster.transfer(4, 3, 5)["success"]
+    cluster.settled()
+    for storage in cluster.shards:
+        storage.snapshot()
+    cluster.shards[0].peers[1].fail = True
+    assert cluster.transfer(4, 3, 5)["success"]
+
+    sender = cluster.crash(0)
+    receiver = cluster.crash(1)
+    assert sender.recovery["snapshot"] is not None
+    assert receiver.recovery["snapshot"] is not None
+    cluster.settled()
+    # Numbering carries on after the snapshot, so old numbers stay ignored
+    assert cluster.transfer(4, 3, 5)["success"]
+    cluster.settled()
+    receiver.commit_credits(0, 2, 1, [[3, 4, 5]])
+    assert receiver.get_balance(3) == BALANCE + 25
+    assert cluster.total() == ACCOUNTS * BALANCE
+
+
+def test_shard_processes(tmp_path):
+    socket_dir = str(tmp_path / "sockets")
+    processes = launch(2, make_accounts(ACCOUNTS, balance=BALANCE), socket_dir)
+    storage = ShardedStorage(socket_dir, 2)
+    try:
+        rng = random.Random(7)
+        succeeded = 0
+        for _ in range(200):
+            sender_id, receiver_id = rng.sample(range(1, ACCOUNTS + 1), 2)
+            succeeded += storage.transfer(sender_id, receiver_id, rng.randint(1, 300))["success"]
+        while any(shard["unsettled_credits"] for shard in storage.stats()["shards"]):
+            time.sleep(0.02)
+        assert succeeded > 0
+        assert sum(storage.get_balance(user_id) for user_id in range(1, ACCOUNTS + 1)) == ACCOUNTS * BALANCE
+    finally:
+        storage.close()
+        for process in processes:
+            process.terminate()
+            process.join()
@@ -0,0 +1,77 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.dataset import make_accounts
+from storage.memory import MemoryStorage
+from storage.transfer_engine import TransferEngine
+
+
+def make_engine(count: int, balance: int = 1000):
+    accounts = MemoryStorage(make_accounts(count, balance)).accounts
+    return TransferEngine(accounts), accounts
+
+
+def total(accounts: dict):
+    return sum(account["balance"] for account in accounts.values())
+
+
+def test_concurrent_transfers_conserve_money():
+    engine, accounts = make_engine(20, balance=500)
+    before = total(accounts)
+    rng = random.Random(7)
+    jobs = [(*rng.sample(range(1, 21), 2), rng.randint(1, 300)) for _ in range(5000)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(lambda job: engine.transfer(*job), jobs))
+
+    succeeded = sum(1 for outcome in outcomes if outcome["success"])
+    assert 0 < succeeded < len(jobs)
+    assert total(accounts) == before
+    assert all(account["balance"] >= 0 for account in accounts.values())
+    assert sum(len(account["transactions"]) for account in accounts.values()) == 2 * succeeded
+
+
+def test_insufficient_balance_leaves_accounts_untouched():
+    engine, accounts = make_engine(2, balance=100)
+    outcome = engine.transfer(1, 2, 101)
+    assert outcome == {"success": False, "reason": "insufficient_balance", "balance": 100}
+    assert accounts[2]["balance"] == 100
+    assert len(accounts[1]["transactions"]) == len(accounts[2]["transactions"]) == 0
+
+
+def test_unknown_account():
+    engine, _ = make_engine(2)
+    assert engine.transfer(1, 3, 10)["reason"] == "account_not_found"
+
+
+def test_opposing_transfers_do_not_deadlock():
+    engine, accounts = make_engine(3, balance=10 ** 6)
+    before = total(accounts)
+
+    def work(pairs):
+        for sender_id, receiver_id in pairs * 2000:
+            engine.transfer(sender_id, receiver_id, 1)
+            engine.transfer_batch(sender_id, [(receiver_id, 1), (6 - sender_id - receiver_id, 1)])
+
+    threads = [
+        threading.Thread(target=work, args=(pairs,))
+        for pairs in ([(1, 2), (2, 3)], [(2, 1), (3, 2)], [(3, 1), (1, 3)])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not any(thread.is_alive() for thread in threads), "transfers deadlocked"
+    assert total(accounts) == before
+
+
+def test_batch_is_all_or_nothing():
+    engine, accounts = make_engine(3, balance=100)
+    outcome = engine.transfer_batch(1, [(2, 60), (3, 60)])
+    assert outcome["reason"] == "insufficient_balance"
+    assert [accounts[i]["balance"] for i in (1, 2, 3)] == [100, 100, 100]
+
+    assert engine.transfer_batch(1, [(2, 60), (3, 40)])["success"]
+    assert [accounts[i]["balance"] for i in (1, 2, 3)] == [0, 160, 140]
+    assert engine.transfer_batch(1, [(1, 0)])["reason"] == "invalid_receiver"
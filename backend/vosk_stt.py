@@ -1,15 +1,168 @@
-from vosk import Model, KaldiRecognizer
-import sounddevice as sd
+# backend/vosk_stt.py
 import json
+import os
+import queue
+import threading
+import wave
+
+from settings import load_env
+
+SAMPLE_RATE = 16000
+
+_model = None
+_model_lock = threading.Lock()
+_pool = None
+
+
+def get_model():
+    """Load the Vosk model on first use; every recognizer shares it"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from vosk import Model
+                load_env()
+                _model = Model(os.getenv("VOSK_MODEL_PATH", "vosk-model-small-en-us-0.15"))
+    return _model
+
+
+def get_recognizer_pool():
+    """Return the in-process recognizer pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _model_lock:
+            if _pool is None:
+                load_env()
+                _pool = RecognizerPool()
+    return _pool
+
+
+class RecognizerPool:
+    """
+    KaldiRecognizer instances over the shared model. Recognizers are created
+    on demand up to size, reset when released and reused by the next stream.
+    """
+
+    def __init__(self, size: int = None, sample_rate: int = SAMPLE_RATE):
+        self.size = size or int(os.getenv("STT_POOL_SIZE", "4"))
+        self.sample_rate = sample_rate
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def acquire(self, timeout: float = 5.0):
+        """Take an idle recognizer, create one, or wait; raises TimeoutError when all stay busy"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+            else:
+                self.waits += 1
+        if create:
+            try:
+                from vosk import KaldiRecognizer
+                return KaldiRecognizer(get_model(), self.sample_rate)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("All speech recognizers are busy")
+
+    def release(self, recognizer):
+        recognizer.Reset()
+        self._idle.put(recognizer)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+            "waits": self.waits,
+        }
+
+
+class StreamingSession:
+    """
+    One audio stream on a pooled recognizer. feed() takes 16-bit mono PCM
+    chunks and returns a partial or final transcript event (or None);
+    finish() flushes the current utterance. close() returns the recognizer.
+    """
+
+    def __init__(self, pool: RecognizerPool = None, timeout: float = 5.0):
+        self.pool = pool or get_recognizer_pool()
+        self.recognizer = self.pool.acquire(timeout)
+        self.audio_seconds = 0.0
+        self._last_partial = ""
+
+    def feed(self, chunk: bytes):
+        self.audio_seconds += len(chunk) / (2 * self.pool.sample_rate)
+        if self.recognizer.AcceptWaveform(chunk):
+            return self._final(self.recognizer.Result())
+        partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        if partial and partial != self._last_partial:
+            self._last_partial = partial
+            return {"type": "partial", "text": partial}
+        return None
+
+    def finish(self):
+        return self._final(self.recognizer.FinalResult())
+
+    def _final(self, result: str):
+        self._last_partial = ""
+        text = json.loads(result).get("text", "")
+        return {"type": "final", "text": text} if text else None
+
+    def close(self):
+        if self.recognizer is not None:
+            self.pool.release(self.recognizer)
+            self.recognizer = None
+
+
+def transcribe_wav(path: str, chunk_frames: int = 4000, pool: RecognizerPool = None):
+    """
+    Stream a 16 kHz mono 16-bit WAV file through a session.
+    Returns: list of transcript events in order
+    """
+    events = []
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError(f"{path}: expected 16 kHz mono 16-bit PCM")
+        session = StreamingSession(pool)
+        try:
+            while True:
+                data = wav.readframes(chunk_frames)
+                if not data:
+                    break
+                event = session.feed(data)
+                if event:
+                    events.append(event)
+            event = session.finish()
+            if event:
+                events.append(event)
+        finally:
+            session.close()
+    return events
 
-model = Model("vosk-model-small-en-us-0.15")
-recognizer = KaldiRecognizer(model, 16000)
 
 def listen_offline():
-    with sd.RawInputStream(samplerate=16000, blocksize=8000, dtype="int16", channels=1) as stream:
-        while True:
-            data = stream.read(4000)[0]
-            if recognizer.AcceptWaveform(data):
-                result = recognizer.Result()
-                text = json.loads(result)["text"]
-                return text
+    """Listen on the default microphone until one utterance is recognized"""
+    import sounddevice as sd
+
+    session = StreamingSession()
+    try:
+        with sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=8000, dtype="int16", channels=1) as stream:
+            while True:
+                data = stream.read(4000)[0]
+                event = session.feed(bytes(data))
+                if event and event["type"] == "final":
+                    return event["text"]
+    finally:
+        session.close()
@@ -0,0 +1,78 @@
+# backend/warmup.py
+import logging
+import os
+import threading
+import time
+
+from settings import load_env
+
+logger = logging.getLogger("banking-assistant")
+
+
+def _warm_storage():
+    from database import get_storage
+    get_storage()
+
+
+def _warm_nlu():
+    from nlu.deepseek_service import get_deepseek_nlu
+    get_deepseek_nlu().warm_up()
+
+
+def _warm_stt():
+    from stt_workers import get_stt_pool
+    get_stt_pool().start()
+
+
+STEPS = {"storage": _warm_storage, "nlu": _warm_nlu, "stt": _warm_stt}
+
+
+class Warmup:
+    """
+    Builds the components named in BANK_WARMUP (comma separated: storage,
+    nlu, stt) on a background thread, so a new worker answers /health at
+    once and reports /ready when they are loaded. Anything not listed is
+    still built lazily on first use.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.done = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def start(self, steps=None):
+        load_env()
+        if steps is None:
+            steps = [s.strip() for s in os.getenv("BANK_WARMUP", "").split(",") if s.strip()]
+        unknown = [s for s in steps if s not in STEPS]
+        if unknown:
+            raise ValueError(f"Unknown BANK_WARMUP step: {', '.join(unknown)}")
+        self.steps = steps
+        if steps:
+            threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        for name in self.steps:
+            started = time.perf_counter()
+            try:
+                STEPS[name]()
+            except Exception as e:
+                logger.warning("Warm-up of %s failed: %s", name, e)
+                with self._lock:
+                    self.errors[name] = str(e)
+                continue
+            with self._lock:
+                self.done[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def status(self):
+        with self._lock:
+            return {
+                "ready": all(name in self.done for name in self.steps),
+                "warmed_ms": dict(self.done),
+                "pending": [n for n in self.steps if n not in self.done and n not in self.errors],
+                "errors": dict(self.errors),
+            }
+
+
+warmup = Warmup()
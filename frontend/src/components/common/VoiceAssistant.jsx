@@ -37,7 +37,7 @@ export default function VoiceAssistant({ show, onClose, onNavigate, userId }) {
     };
   };
 
-  const sendToBackend = async (text, pwd = null) => {
+  const sendToBackend = async (text, pwd = null, confirmationToken = null) => {
     try {
       const res = await fetch("http://localhost:8000/assistant", {
         method: "POST",
@@ -46,6 +46,7 @@ export default function VoiceAssistant({ show, onClose, onNavigate, userId }) {
           user_id: userId,
           message: text,
           password: pwd,
+          confirmation_token: confirmationToken,
         }),
       });
 
@@ -69,7 +70,7 @@ export default function VoiceAssistant({ show, onClose, onNavigate, userId }) {
 
       // Handle password requirement for money transfers
       if (data.data?.require_password) {
-        setPendingAction({ text });
+        setPendingAction({ text, token: data.data.confirmation_token });
         setPendingMessage(data);
         setShowPasswordPrompt(true);
       } else {
@@ -91,7 +92,7 @@ export default function VoiceAssistant({ show, onClose, onNavigate, userId }) {
   const handlePasswordSubmit = (e) => {
     e.preventDefault();
     if (pendingAction && password) {
-      sendToBackend(pendingAction.text, password);
+      sendToBackend(pendingAction.text, password, pendingAction.token);
       setPassword("");
     }
   };